@@ -1,279 +1,862 @@
-"""
-analysis.py
-Exploratory analysis for the Baghdad food delivery demo.
-Outputs:
-- CSVs in ./outputs
-- Figures in ./figures
-Notes are concise and practical for a portfolio or take-home task.
-"""
-
-import os
-import numpy as np
-import pandas as pd
-from sqlalchemy import create_engine
-import matplotlib.pyplot as plt
-
-# ---- DB connection ----
-USER = "root"
-PASSWORD = "TRooNT007"  # <- set your MySQL root password
-HOST = "127.0.0.1"
-PORT = 3307
-DB   = "food_delivery"
-
-engine = create_engine(f"mysql+mysqlconnector://{USER}:{PASSWORD}@{HOST}:{PORT}/{DB}")
-
-# ---- output folders ----
-os.makedirs("outputs", exist_ok=True)
-os.makedirs("figures", exist_ok=True)
-
-# ---- load tables ----
-orders = pd.read_sql("SELECT * FROM orders", engine)
-vendors = pd.read_sql("SELECT * FROM vendors", engine)
-drivers = pd.read_sql("SELECT * FROM drivers", engine)
-customers = pd.read_sql("SELECT * FROM customers", engine)
-
-# ---- feature engineering ----
-orders["order_datetime"] = pd.to_datetime(orders["order_datetime"])
-orders["date"]   = orders["order_datetime"].dt.date
-orders["hour"]   = orders["order_datetime"].dt.hour
-orders["dow"]    = orders["order_datetime"].dt.day_name()
-orders["week"]   = orders["order_datetime"].dt.isocalendar().week.astype(int)
-orders["month"]  = orders["order_datetime"].dt.to_period("M").astype(str)
-orders["is_weekend"] = orders["dow"].isin(["Friday","Saturday","Sunday"])  # adjust if needed
-
-deliv = orders[orders["status"]=="delivered"].copy()
-deliv["revenue"] = deliv["subtotal"] + deliv["delivery_fee"] + deliv["tip"]
-deliv_v = deliv.merge(vendors, on="vendor_id", how="left", suffixes=("", "_vendor"))
-
-def pct(x: float) -> str:
-    return f"{100*x:.2f}%"
-
-def section(title: str):
-    print("\n" + title)
-    print("-" * len(title))
-
-# --------------------------
-# Global KPIs
-# --------------------------
-section("Global KPIs")
-total_orders        = len(orders)
-delivered_orders    = len(deliv)
-canceled_orders     = (orders["status"]=="canceled").sum()
-returned_orders     = (orders["status"]=="returned").sum()
-cancel_rate         = canceled_orders / total_orders if total_orders else 0
-return_rate         = returned_orders / total_orders if total_orders else 0
-avg_delivery_min    = round(deliv["delivery_minutes"].mean(), 2) if delivered_orders else 0
-p95_delivery_min    = round(deliv["delivery_minutes"].quantile(0.95), 2) if delivered_orders else 0
-total_revenue       = round(deliv["revenue"].sum(), 2)
-aov                 = round(deliv["revenue"].mean(), 2) if delivered_orders else 0
-avg_distance        = round(deliv["distance_km"].mean(), 2) if delivered_orders else 0
-
-print(f"Total Orders: {total_orders}")
-print(f"Delivered: {delivered_orders}  |  Canceled: {canceled_orders} ({pct(cancel_rate)})  |  Returned: {returned_orders} ({pct(return_rate)})")
-print(f"Avg Delivery Time: {avg_delivery_min} min  |  P95: {p95_delivery_min} min")
-print(f"Total Revenue: ${total_revenue}  |  AOV: ${aov}")
-print(f"Avg Distance: {avg_distance} km")
-
-for sla in [25, 30, 35, 40]:
-    sla_ok = (deliv["delivery_minutes"] <= sla).mean() if delivered_orders else 0
-    print(f"SLA ≤ {sla} min: {pct(sla_ok)}")
-
-# --------------------------
-# Time series
-# --------------------------
-section("Time Series")
-daily = deliv.groupby("date").agg(
-    orders=("order_id","count"),
-    revenue=("revenue","sum"),
-    avg_minutes=("delivery_minutes","mean")
-).reset_index()
-daily.to_csv("outputs/daily_kpis.csv", index=False)
-print("saved: outputs/daily_kpis.csv")
-
-plt.figure(figsize=(10,4))
-plt.plot(pd.to_datetime(daily["date"]), daily["orders"])
-plt.title("Daily Orders"); plt.xlabel("Date"); plt.ylabel("Orders")
-plt.tight_layout(); plt.savefig("figures/daily_orders.png"); plt.close()
-
-plt.figure(figsize=(10,4))
-plt.plot(pd.to_datetime(daily["date"]), daily["revenue"])
-plt.title("Daily Revenue"); plt.xlabel("Date"); plt.ylabel("Revenue")
-plt.tight_layout(); plt.savefig("figures/daily_revenue.png"); plt.close()
-
-hourly = deliv.groupby("hour").size()
-plt.figure(figsize=(8,4))
-hourly.plot(kind="bar")
-plt.title("Orders by Hour"); plt.xlabel("Hour"); plt.ylabel("Orders")
-plt.tight_layout(); plt.savefig("figures/orders_by_hour.png"); plt.close()
-
-dow_counts = deliv["dow"].value_counts()
-plt.figure(figsize=(7,4))
-dow_counts.loc[["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"]].plot(kind="bar")
-plt.title("Orders by Day of Week"); plt.xlabel("Day"); plt.ylabel("Orders")
-plt.tight_layout(); plt.savefig("figures/orders_by_dow.png"); plt.close()
-
-# --------------------------
-# Area (dropoff) analysis
-# --------------------------
-section("Area Analysis (Dropoff)")
-area_kpis = (deliv.groupby("dropoff_area")
-             .agg(orders=("order_id","count"),
-                  avg_minutes=("delivery_minutes","mean"),
-                  p95_minutes=("delivery_minutes", lambda s: s.quantile(0.95)),
-                  sla30=("delivery_minutes", lambda s: (s<=30).mean()),
-                  revenue=("revenue","sum"))
-             .sort_values("orders", ascending=False))
-area_kpis["sla30"] = (area_kpis["sla30"]*100).round(2).astype(str) + "%"
-area_kpis["avg_minutes"] = area_kpis["avg_minutes"].round(2)
-area_kpis["p95_minutes"] = area_kpis["p95_minutes"].round(2)
-area_kpis["revenue"]     = area_kpis["revenue"].round(2)
-print(area_kpis.head(12).to_string())
-area_kpis.to_csv("outputs/area_kpis.csv")
-print("saved: outputs/area_kpis.csv")
-
-plt.figure(figsize=(10,4))
-area_kpis.sort_values("avg_minutes").head(12)["avg_minutes"].plot(kind="bar")
-plt.title("Avg Delivery Minutes by Dropoff Area (Top 12 fastest)")
-plt.xlabel("Area"); plt.ylabel("Avg Minutes")
-plt.tight_layout(); plt.savefig("figures/avg_minutes_by_area.png"); plt.close()
-
-# --------------------------
-# Vendor analysis
-# --------------------------
-section("Vendor Analysis")
-vend = deliv_v.groupby(["vendor_id","vendor_name","area","cuisine"]).agg(
-    orders=("order_id","count"),
-    revenue=("revenue","sum"),
-    avg_minutes=("delivery_minutes","mean"),
-    sla30=("delivery_minutes", lambda s: (s<=30).mean())
-).reset_index()
-vend["revenue"] = vend["revenue"].round(2)
-vend["avg_minutes"] = vend["avg_minutes"].round(2)
-vend["sla30"] = (vend["sla30"]*100).round(2).astype(str) + "%"
-
-top_vendors_orders = vend.sort_values("orders", ascending=False).head(15)
-print("\nTop Vendors by Orders:")
-print(top_vendors_orders[["vendor_name","area","cuisine","orders","avg_minutes","sla30","revenue"]].to_string(index=False))
-top_vendors_orders.to_csv("outputs/top_vendors_by_orders.csv", index=False)
-
-plt.figure(figsize=(10,4))
-(vend.sort_values("revenue", ascending=False).head(10)
-     .set_index("vendor_name")["revenue"]).plot(kind="bar")
-plt.title("Top 10 Vendors by Revenue"); plt.xlabel("Vendor"); plt.ylabel("Revenue")
-plt.tight_layout(); plt.savefig("figures/top10_vendors_revenue.png"); plt.close()
-
-# --------------------------
-# Cuisine analysis
-# --------------------------
-section("Cuisine Analysis")
-cui = deliv_v.groupby("cuisine").agg(
-    orders=("order_id","count"),
-    revenue=("revenue","sum"),
-    avg_minutes=("delivery_minutes","mean"),
-    sla30=("delivery_minutes", lambda s: (s<=30).mean())
-).sort_values("orders", ascending=False)
-cui["revenue"] = cui["revenue"].round(2)
-cui["avg_minutes"] = cui["avg_minutes"].round(2)
-cui["sla30"] = (cui["sla30"]*100).round(2).astype(str) + "%"
-print(cui.to_string())
-cui.to_csv("outputs/cuisine_kpis.csv")
-
-plt.figure(figsize=(8,4))
-cui["orders"].head(10).plot(kind="bar")
-plt.title("Top Cuisines by Orders"); plt.xlabel("Cuisine"); plt.ylabel("Orders")
-plt.tight_layout(); plt.savefig("figures/top_cuisines_orders.png"); plt.close()
-
-# --------------------------
-# Driver performance
-# --------------------------
-section("Driver Performance")
-drv = (deliv.groupby("driver_id")
-       .agg(orders=("order_id","count"),
-            avg_rating=("driver_rating","mean"),
-            avg_minutes=("delivery_minutes","mean"),
-            avg_distance=("distance_km","mean"))
-       .reset_index())
-drv = drv.merge(drivers, on="driver_id", how="left")
-drv["efficiency_min_per_km"] = (drv["avg_minutes"] / drv["avg_distance"]).round(2)
-drv["avg_minutes"]  = drv["avg_minutes"].round(2)
-drv["avg_distance"] = drv["avg_distance"].round(2)
-drv["avg_rating"]   = drv["avg_rating"].round(2)
-
-best_drivers = drv[drv["orders"]>=20].sort_values(["avg_rating","orders"], ascending=[False,False]).head(10)
-print("\nTop Drivers (orders>=20):")
-print(best_drivers[["driver_name","orders","avg_rating","avg_minutes","avg_distance","efficiency_min_per_km"]].to_string(index=False))
-best_drivers.to_csv("outputs/top_drivers.csv", index=False)
-
-# --------------------------
-# Customer behavior
-# --------------------------
-section("Customer Behavior")
-cust_orders = deliv.groupby("customer_id").agg(
-    orders=("order_id","count"),
-    revenue=("revenue","sum"),
-    first_order=("order_datetime","min"),
-    last_order=("order_datetime","max")
-).reset_index()
-cust_orders = cust_orders.merge(customers, on="customer_id", how="left")
-cust_orders["revenue"] = cust_orders["revenue"].round(2)
-repeat_rate = (cust_orders["orders"]>=2).mean() if len(cust_orders) else 0
-print(f"Unique Customers (delivered): {len(cust_orders)} | Repeat Customers (>=2 orders): {pct(repeat_rate)}")
-cust_orders.sort_values("orders", ascending=False).head(15).to_csv("outputs/top_customers.csv", index=False)
-
-plt.figure(figsize=(8,4))
-cust_orders["orders"].value_counts().sort_index().plot(kind="bar")
-plt.title("Orders per Customer (Frequency)"); plt.xlabel("# Orders per Customer"); plt.ylabel("# Customers")
-plt.tight_layout(); plt.savefig("figures/orders_per_customer_dist.png"); plt.close()
-
-# --------------------------
-# Distance vs time relationship + simple linear fit
-# --------------------------
-section("Distance vs Delivery Minutes (Fit)")
-x = deliv["distance_km"].values
-y = deliv["delivery_minutes"].values
-if len(x) > 5:
-    slope, intercept = np.polyfit(x, y, 1)
-    print(f"minutes ≈ {slope:.2f} * distance_km + {intercept:.2f}")
-    plt.figure(figsize=(6,4))
-    plt.scatter(x, y, s=8, alpha=0.4)
-    xs = np.linspace(x.min(), x.max(), 100)
-    plt.plot(xs, slope*xs + intercept)
-    plt.title("Distance vs Delivery Minutes (linear fit)")
-    plt.xlabel("Distance (km)"); plt.ylabel("Delivery Minutes")
-    plt.tight_layout(); plt.savefig("figures/distance_vs_minutes_fit.png"); plt.close()
-
-    # Simple outlier scan based on residual z-score
-    residuals = y - (slope*x + intercept)
-    std = residuals.std() if residuals.std() != 0 else 1.0
-    z = (residuals - residuals.mean()) / std
-    tmp = deliv_v.copy()
-    tmp["residual_z"] = z
-    worst = tmp.sort_values("residual_z", ascending=False).head(15)
-    cols = ["order_id","vendor_name","area","distance_km","delivery_minutes","residual_z"]
-    worst[cols].to_csv("outputs/outliers_slow_deliveries.csv", index=False)
-    print("saved: outputs/outliers_slow_deliveries.csv")
-    print(worst[cols].to_string(index=False))
-
-# --------------------------
-# Peak hour per area
-# --------------------------
-section("Peak Hour per Area")
-peak_area = (deliv_v.groupby(["area","hour"])["order_id"].count()
-             .reset_index(name="orders")
-             .sort_values(["area","orders"], ascending=[True,False])
-             .groupby("area").head(1))
-peak_area.to_csv("outputs/peak_hour_per_area.csv", index=False)
-print(peak_area.to_string(index=False))
-
-# --------------------------
-# Top vendors per area
-# --------------------------
-section("Top Vendors per Area (Top 3)")
-va = (deliv_v.groupby(["area","vendor_name"])["order_id"].count()
-      .reset_index(name="orders")
-      .sort_values(["area","orders"], ascending=[True,False]))
-top3 = va.groupby("area").head(3)
-top3.to_csv("outputs/top3_vendors_per_area.csv", index=False)
-print(top3.to_string(index=False))
-
-print("\nDone. CSVs in outputs/, figures in figures/.")
+"""
+analysis.py
+Exploratory analysis for the Baghdad food delivery demo.
+Outputs:
+- CSVs in ./outputs
+- Figures in ./figures
+Notes are concise and practical for a portfolio or take-home task.
+
+Run with --stream to read `orders` in compact, column-pruned chunks
+(see streaming.py) instead of loading the whole table into memory, or with
+--incremental to fold only orders newer than the last run into persisted
+aggregates (see incremental.py). --sql pushes every aggregation down to the
+database (see sql_backend.py); --verify-sql also checks every requested
+output table against an in-memory run on the same database before
+reporting. --snapshot reads the tables from a local Parquet snapshot that
+is synced from the database only when it changed (see snapshot.py).
+--parallel N runs the streaming scan over date ranges in N processes and
+merges the partial aggregates (see partitioned.py).
+Figures are rendered after all sections, in parallel
+(see figures.py); --no-figures skips them for KPI-only runs.
+Every section is timed (wall/CPU/DB time, memory, rows) into
+outputs/run_report.json with a summary table at the end (see
+run_report.py); --profile DIR adds a cProfile dump per section.
+Customer cohorts, retention, order gaps and RFM segments come from
+cohorts.py; --incremental keeps that state too (--cohort-state).
+The area-pair ETA model (pickup x dropoff x hour bucket, see eta.py) is
+saved (--eta-model) for batch predictions with `python eta.py`.
+
+The module is also a library. Every table is a lazily computed, memoized
+attribute of an `Analysis`, built from the tables it depends on (load ->
+features -> deliv -> per-section tables -> CSV/figure outputs),
+and only the `orders` columns the requested outputs need are read:
+
+    from analysis import Analysis, make_engine
+    run = Analysis(make_engine(), outputs=["area_kpis", "top_drivers"])
+    run.area_kpis            # computed on first access, then cached
+    run.run()                # print, write the CSVs, render figures
+
+From the command line: python analysis.py --outputs area_kpis top_drivers
+Connection settings come from db.ini / FOOD_DB_* variables (see db.py);
+the tables are read concurrently over a connection pool, and
+--read-partitions N splits the orders read into N order_id ranges.
+For near-real-time SLA / cancel-rate alerting on new orders, see monitor.py.
+"""
+
+import argparse
+import os
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from calendar_dim import DOW_NAMES, IRAQ_WEEKEND, add_calendar_features
+from cohorts import DEFAULT_COHORT_STATE_PATH, CohortEngine, refresh_cohorts, scan_cohorts
+from db import concat_orders, db_settings, make_engine, order_queries, read_concurrently
+from dimensions import DimensionLookup
+from eta import DEFAULT_ETA_MODEL_PATH, LEVELS, REFERENCE_KM, EtaModel
+from figures import FigureQueue, render_all
+from groupby_engine import KpiEngine
+from incremental import DEFAULT_STATE_PATH, refresh
+from outliers import SlowDeliveryModel, TopN, scan_slowest
+from partitioned import scan_partitioned
+from ranking import top_k
+from run_report import DEFAULT_REPORT_PATH, RunReport
+from sketches import QuantileSketch
+from snapshot import DEFAULT_SNAPSHOT_DIR, load_tables
+from sql_backend import sql_cohorts, sql_tables
+from streaming import DEFAULT_CHUNKSIZE, ORDER_COLUMNS, columns_for, scan_orders
+
+MODES = ("memory", "stream", "parallel", "incremental", "sql")
+
+# output name -> (section title, streaming.SECTION_COLUMNS sections it reads), in report order
+OUTPUTS = {
+    "global_kpis":              ("Global KPIs", ["global"]),
+    "daily_kpis":               ("Time Series", ["time_series"]),
+    "area_kpis":                ("Area Analysis (Dropoff)", ["area"]),
+    "top_vendors_by_orders":    ("Vendor Analysis", ["vendor"]),
+    "cuisine_kpis":             ("Cuisine Analysis", ["cuisine"]),
+    "top_drivers":              ("Driver Performance", ["driver"]),
+    "top_customers":            ("Customer Behavior", ["customer"]),
+    "customer_cohorts":         ("Customer Cohorts and Retention", ["cohorts"]),
+    "outliers_slow_deliveries": ("Distance vs Delivery Minutes (Fit)", ["distance_fit", "outliers"]),
+    "eta_area_pairs":           ("Area-Pair ETA Model", ["eta"]),
+    "peak_hour_per_area":       ("Peak Hour per Area", ["peak_hour"]),
+    "top3_vendors_per_area":    ("Top Vendors per Area (Top 3)", ["top_vendors_area"]),
+}
+# In-memory tables read by several outputs; run() builds the ones shared by the
+# requested outputs in their own stage, so no output section is timed for them.
+SHARED_TABLES = {
+    "vendor_lookup": ["top_vendors_by_orders", "cuisine_kpis", "outliers_slow_deliveries",
+                      "peak_hour_per_area", "top3_vendors_per_area"],
+    "vend_stats":    ["top_vendors_by_orders", "cuisine_kpis"],
+}
+# Columns of outliers_slow_deliveries.csv
+WORST_COLUMNS = ["order_id", "vendor_name", "area", "distance_km", "delivery_minutes", "residual_z"]
+# The in-memory path counts order_id and needs minutes/revenue for the shared KpiEngine.
+MEMORY_COLUMNS = ["order_id", "status", "delivery_minutes", "subtotal", "delivery_fee", "tip"]
+
+
+def pct(x: float) -> str:
+    return f"{100*x:.2f}%"
+
+
+def _same_frame(a: pd.DataFrame, b: pd.DataFrame, keys, rtol: float) -> str:
+    """Why two output tables differ ("" if they match), rows matched on `keys` or the index."""
+    if keys is None:
+        a, b = a.sort_index(), b.sort_index()
+        if not a.index.astype(str).equals(b.index.astype(str)):
+            return "different groups"
+    else:
+        a = a.sort_values(keys).reset_index(drop=True)
+        b = b.sort_values(keys).reset_index(drop=True)
+        if len(a) != len(b):
+            return f"{len(a)} vs {len(b)} rows"
+    if not a.columns.astype(str).equals(b.columns.astype(str)):
+        return "different columns"
+    for col in a.columns:
+        x, y = a[col], b[col]
+        if pd.api.types.is_numeric_dtype(x) and pd.api.types.is_numeric_dtype(y):
+            ok = np.isclose(x.to_numpy("float64"), y.to_numpy("float64"), rtol=rtol, equal_nan=True)
+        else:
+            ok = (x.astype(str).values == y.astype(str).values)
+        if not ok.all():
+            return f"column {col!r} differs in {int((~ok).sum())} rows"
+    return ""
+
+
+class Analysis:
+    """One analysis run over `engine`.
+
+    `mode` is "memory" (load orders into pandas), "stream", "parallel"
+    (stream date partitions in `workers` processes, see partitioned.py),
+    "incremental" or "sql" (pre-aggregated tables, see the modules of the
+    same names).
+    `outputs` limits the run, and the orders columns read, to a subset of
+    OUTPUTS. Table attributes are computed on first access and cached.
+    """
+
+    def __init__(self, engine, mode: str = "memory", outputs=None, snapshot_dir: str = None,
+                 offline: bool = False, chunksize: int = DEFAULT_CHUNKSIZE, workers: int = None,
+                 state_path: str = DEFAULT_STATE_PATH, cohort_state_path: str = DEFAULT_COHORT_STATE_PATH,
+                 eta_model_path: str = DEFAULT_ETA_MODEL_PATH, full_refresh: bool = False,
+                 read_partitions: int = 1, load_workers: int = None,
+                 verify_sql: bool = False, weekend=IRAQ_WEEKEND, outlier_by: str = None,
+                 robust_outliers: bool = False, report: RunReport = None,
+                 out_dir: str = "outputs", fig_dir: str = "figures"):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+        unknown = set(outputs or ()) - set(OUTPUTS)
+        if unknown:
+            raise ValueError(f"unknown outputs: {sorted(unknown)}")
+        self.engine = engine
+        self.mode = mode
+        self.outputs = [o for o in OUTPUTS if o in set(outputs)] if outputs else list(OUTPUTS)
+        self.snapshot_dir = snapshot_dir
+        self.offline = offline
+        self.chunksize = chunksize
+        self.workers = workers
+        self.state_path = state_path
+        self.cohort_state_path = cohort_state_path
+        self.eta_model_path = eta_model_path
+        self.full_refresh = full_refresh
+        self.read_partitions = read_partitions
+        self.load_workers = load_workers
+        self.verify_sql = verify_sql
+        self.weekend = tuple(weekend)
+        self.outlier_by = outlier_by
+        self.robust_outliers = robust_outliers
+        self.report = report or RunReport(engine)
+        self.out_dir = out_dir
+        self.figs = FigureQueue(fig_dir)
+
+    @property
+    def pre_aggregated(self) -> bool:
+        # These modes report from pre-aggregated tables rather than order rows.
+        return self.mode != "memory"
+
+    def section(self, title: str, rows_in: int = None):
+        print("\n" + title)
+        print("-" * len(title))
+        self.report.stage(title, rows_in=rows_in)
+
+    def _csv(self, name: str) -> str:
+        return os.path.join(self.out_dir, name)
+
+    # --------------------------
+    # Loads
+    # --------------------------
+    @cached_property
+    def order_columns(self) -> list:
+        """The orders columns the requested outputs read (in-memory mode)."""
+        wanted = set(MEMORY_COLUMNS) | set(columns_for(s for o in self.outputs for s in OUTPUTS[o][1]))
+        if "outliers_slow_deliveries" in self.outputs and self.outlier_by:
+            wanted.add("order_datetime" if self.outlier_by == "hour" else self.outlier_by)
+        return [c for c in ORDER_COLUMNS if c in wanted]
+
+    @cached_property
+    def _tables(self) -> dict:
+        """The dimensions (and orders in memory mode), from the snapshot or read concurrently (see db.py)."""
+        tables = ["vendors", "drivers", "customers"] + (["orders"] if not self.pre_aggregated else [])
+        if self.snapshot_dir:
+            return load_tables(self.engine, self.snapshot_dir, check=not self.offline, tables=tables,
+                               columns={"orders": self.order_columns})
+        queries = {t: f"SELECT * FROM {t}" for t in tables if t != "orders"}
+        if "orders" in tables:
+            queries.update(order_queries(self.engine, self.order_columns, self.read_partitions))
+        frames = read_concurrently(self.engine, queries, workers=self.load_workers)
+        if "orders" in tables:
+            frames["orders"] = concat_orders(frames, self.order_columns)
+        return frames
+
+    def _dimension(self, table: str) -> pd.DataFrame:
+        return self._tables[table]
+
+    @cached_property
+    def vendors(self) -> pd.DataFrame:
+        return self._dimension("vendors")
+
+    @cached_property
+    def drivers(self) -> pd.DataFrame:
+        return self._dimension("drivers")
+
+    @cached_property
+    def customers(self) -> pd.DataFrame:
+        return self._dimension("customers")
+
+    @cached_property
+    def agg(self) -> dict:
+        """Pre-aggregated tables (stream/parallel/incremental/sql modes)."""
+        vendors, drivers, customers = self.vendors, self.drivers, self.customers
+        if self.mode == "sql":
+            return sql_tables(self.engine, vendors, drivers, customers, outlier_model=self.outlier_model,
+                              eta_model=self.eta_model)
+        if self.mode == "parallel":
+            return scan_partitioned(self.engine, vendors, drivers, customers, workers=self.workers,
+                                    chunksize=self.chunksize, outlier_model=self.outlier_model,
+                                    eta_model=self.eta_model)
+        if self.mode == "incremental":
+            state = refresh(self.engine, self.state_path, chunksize=self.chunksize, full=self.full_refresh,
+                            outlier_model=self.outlier_model, eta_model=self.eta_model)
+            return state.tables(vendors, drivers, customers)
+        # Orders never materialize: every section reads pre-aggregated tables.
+        return scan_orders(self.engine, vendors, drivers, customers, chunksize=self.chunksize,
+                           outlier_model=self.outlier_model, eta_model=self.eta_model)
+
+    @cached_property
+    def outlier_model(self) -> SlowDeliveryModel:
+        """The per-group / robust slow-delivery model the pre-aggregated modes fold with
+        the other aggregates; None for the default global model."""
+        if "outliers_slow_deliveries" not in self.outputs:
+            return None
+        if self.outlier_by is None and not self.robust_outliers:
+            return None
+        return SlowDeliveryModel(by=self.outlier_by, robust=self.robust_outliers)
+
+    @cached_property
+    def eta_model(self) -> EtaModel:
+        """The ETA model the pre-aggregated modes fold with the other aggregates."""
+        return EtaModel() if "eta_area_pairs" in self.outputs else None
+
+    @cached_property
+    def raw_orders(self) -> pd.DataFrame:
+        return self._tables["orders"]
+
+    # --------------------------
+    # Feature engineering
+    # --------------------------
+    @cached_property
+    def orders(self) -> pd.DataFrame:
+        orders = self.raw_orders
+        if "order_datetime" in orders:
+            # day/date/hour/dow/week/month/is_weekend from the calendar dimension
+            orders["order_datetime"] = pd.to_datetime(orders["order_datetime"])
+            add_calendar_features(orders, weekend=self.weekend)
+        return orders
+
+    @cached_property
+    def deliv(self) -> pd.DataFrame:
+        orders = self.orders
+        deliv = orders[orders["status"]=="delivered"].copy()
+        deliv["revenue"] = deliv["subtotal"] + deliv["delivery_fee"] + deliv["tip"]
+        return deliv
+
+    # Dimension attributes are attached to aggregated rows by id (see dimensions.py),
+    # never merged into the delivered orders themselves.
+    @cached_property
+    def vendor_lookup(self) -> DimensionLookup:
+        return DimensionLookup(self.vendors, "vendor_id")
+
+    @cached_property
+    def driver_lookup(self) -> DimensionLookup:
+        return DimensionLookup(self.drivers, "driver_id")
+
+    @cached_property
+    def customer_lookup(self) -> DimensionLookup:
+        return DimensionLookup(self.customers, "customer_id")
+
+    @cached_property
+    def kpi(self) -> KpiEngine:
+        # One engine for every per-group KPI: keys are factorized once and
+        # each statistic is a bincount over the codes.
+        return KpiEngine(self.deliv["delivery_minutes"], self.deliv["revenue"])
+
+    @cached_property
+    def delivered_rows(self) -> int:
+        """Rows each section aggregates (already folded into `agg` in the pre-aggregated modes)."""
+        return self.agg["delivered_orders"] if self.pre_aggregated else len(self.deliv)
+
+    # --------------------------
+    # Section tables
+    # --------------------------
+    @cached_property
+    def global_kpis(self) -> dict:
+        if self.pre_aggregated:
+            agg = self.agg
+            g = dict(
+                total_orders=agg["total_orders"],
+                delivered_orders=agg["delivered_orders"],
+                canceled_orders=agg["canceled_orders"],
+                returned_orders=agg["returned_orders"],
+                avg_delivery_min=round(agg["avg_delivery_min"], 2),
+                p95_delivery_min=round(agg["p95_delivery_min"], 2),
+                total_revenue=round(agg["total_revenue"], 2),
+                aov=round(agg["aov"], 2),
+                avg_distance=round(agg["avg_distance"], 2),
+                sla={sla: agg["sla"][sla] for sla in [25, 30, 35, 40]},
+            )
+        else:
+            orders, deliv = self.orders, self.deliv
+            delivered_orders = len(deliv)
+            kpi_totals = self.kpi.totals()
+            g = dict(
+                total_orders=len(orders),
+                delivered_orders=delivered_orders,
+                canceled_orders=(orders["status"]=="canceled").sum(),
+                returned_orders=(orders["status"]=="returned").sum(),
+                avg_delivery_min=round(deliv["delivery_minutes"].mean(), 2) if delivered_orders else 0,
+                p95_delivery_min=round(deliv["delivery_minutes"].quantile(0.95), 2) if delivered_orders else 0,
+                total_revenue=round(deliv["revenue"].sum(), 2),
+                aov=round(deliv["revenue"].mean(), 2) if delivered_orders else 0,
+                avg_distance=round(deliv["distance_km"].mean(), 2) if delivered_orders else 0,
+                sla={sla: kpi_totals[f"sla{sla}"] if delivered_orders else 0 for sla in [25, 30, 35, 40]},
+            )
+        g["cancel_rate"] = g["canceled_orders"] / g["total_orders"] if g["total_orders"] else 0
+        g["return_rate"] = g["returned_orders"] / g["total_orders"] if g["total_orders"] else 0
+        return g
+
+    @cached_property
+    def daily(self) -> pd.DataFrame:
+        if self.pre_aggregated:
+            daily = self.agg["daily"]
+        else:
+            daily = self.kpi.by(self.deliv["date"])[["orders","revenue","avg_minutes"]]
+            daily.insert(0, "date", daily.index.date)
+            daily = daily.reset_index(drop=True)
+        return daily
+
+    @cached_property
+    def hourly(self) -> pd.Series:
+        return self.agg["hourly"] if self.pre_aggregated else self.kpi.by(self.deliv["hour"])["orders"]
+
+    @cached_property
+    def dow_counts(self) -> pd.Series:
+        return self.agg["dow_counts"] if self.pre_aggregated else self.kpi.by(self.deliv["dow"])["orders"]
+
+    @cached_property
+    def area_kpis(self) -> pd.DataFrame:
+        if self.pre_aggregated:
+            area_kpis = self.agg["area_kpis"]
+        else:
+            deliv = self.deliv
+            area_p95 = QuantileSketch()
+            area_p95.update(deliv["delivery_minutes"], groups=deliv["dropoff_area"])
+            area_kpis = (self.kpi.by(deliv["dropoff_area"])[["orders","avg_minutes","sla30","revenue"]]
+                         .sort_values("orders", ascending=False))
+            area_kpis.insert(2, "p95_minutes", area_p95.quantile(0.95))
+        area_kpis["sla30"] = (area_kpis["sla30"]*100).round(2).astype(str) + "%"
+        area_kpis["avg_minutes"] = area_kpis["avg_minutes"].round(2)
+        area_kpis["p95_minutes"] = area_kpis["p95_minutes"].round(2)
+        area_kpis["revenue"]     = area_kpis["revenue"].round(2)
+        return area_kpis
+
+    @cached_property
+    def vend_stats(self) -> pd.DataFrame:
+        """Unrounded per-vendor KPIs with vendor attributes (in-memory mode)."""
+        vend_stats = self.kpi.by(self.deliv["vendor_id"]).reset_index()
+        vend_stats = vend_stats[self.vendor_lookup.mask(vend_stats["vendor_id"])].reset_index(drop=True)
+        attrs = self.vendor_lookup.take(vend_stats["vendor_id"], ["vendor_name","area","cuisine"])
+        return pd.concat([vend_stats[["vendor_id"]], attrs, vend_stats.drop(columns="vendor_id")], axis=1)
+
+    @cached_property
+    def vend(self) -> pd.DataFrame:
+        if self.pre_aggregated:
+            vend = self.agg["vend"]
+        else:
+            vend = self.vend_stats[["vendor_id","vendor_name","area","cuisine","orders","revenue","avg_minutes","sla30"]].copy()
+        vend["revenue"] = vend["revenue"].round(2)
+        vend["avg_minutes"] = vend["avg_minutes"].round(2)
+        vend["sla30"] = (vend["sla30"]*100).round(2).astype(str) + "%"
+        return vend
+
+    @cached_property
+    def cui(self) -> pd.DataFrame:
+        if self.pre_aggregated:
+            cui = self.agg["cui"]
+        else:
+            vend_stats = self.vend_stats
+            cui = (KpiEngine.rollup(vend_stats.drop(columns=["vendor_id","vendor_name","area","cuisine"]),
+                                    vend_stats["cuisine"].values)
+                   [["orders","revenue","avg_minutes","sla30"]]
+                   .rename_axis("cuisine")
+                   .sort_values("orders", ascending=False))
+        cui["revenue"] = cui["revenue"].round(2)
+        cui["avg_minutes"] = cui["avg_minutes"].round(2)
+        cui["sla30"] = (cui["sla30"]*100).round(2).astype(str) + "%"
+        return cui
+
+    @cached_property
+    def drv(self) -> pd.DataFrame:
+        if self.pre_aggregated:
+            drv = self.agg["drv"]
+        else:
+            deliv = self.deliv
+            drv = self.kpi.by(deliv["driver_id"], sums={"rating": deliv["driver_rating"], "distance": deliv["distance_km"]})
+            drv = pd.DataFrame({
+                "orders": drv["orders"],
+                "avg_rating": drv["rating"] / drv["rating_n"].where(drv["rating_n"] > 0),
+                "avg_minutes": drv["avg_minutes"],
+                "avg_distance": drv["distance"] / drv["distance_n"],
+            }).reset_index()
+            drv = self.driver_lookup.attach(drv)
+        drv["efficiency_min_per_km"] = (drv["avg_minutes"] / drv["avg_distance"]).round(2)
+        drv["avg_minutes"]  = drv["avg_minutes"].round(2)
+        drv["avg_distance"] = drv["avg_distance"].round(2)
+        drv["avg_rating"]   = drv["avg_rating"].round(2)
+        return drv
+
+    @cached_property
+    def cust_orders(self) -> pd.DataFrame:
+        if self.pre_aggregated:
+            cust_orders = self.agg["cust_orders"]
+        else:
+            cust_orders = self.deliv.groupby("customer_id").agg(
+                orders=("order_id","count"),
+                revenue=("revenue","sum"),
+                first_order=("order_datetime","min"),
+                last_order=("order_datetime","max")
+            ).reset_index()
+            cust_orders = self.customer_lookup.attach(cust_orders)
+        cust_orders["revenue"] = cust_orders["revenue"].round(2)
+        return cust_orders
+
+    @cached_property
+    def cohorts(self) -> CohortEngine:
+        """Cohort, retention, order-gap and RFM state (see cohorts.py).
+
+        The streaming modes fold a narrow scan of delivered orders in time order;
+        incremental mode persists it and only folds orders past its watermark, and
+        sql mode builds it from per-(customer, month) aggregates pushed down to the database.
+        """
+        if not self.pre_aggregated:
+            cohorts = CohortEngine(self.customers)
+            cohorts.update(self.deliv)
+            return cohorts
+        if self.mode == "sql":
+            return sql_cohorts(self.engine, self.customers)
+        if self.mode == "incremental":
+            return refresh_cohorts(self.engine, self.customers, self.cohort_state_path,
+                                   chunksize=self.chunksize, full=self.full_refresh)
+        return scan_cohorts(self.engine, self.customers, chunksize=self.chunksize)
+
+    @cached_property
+    def fit(self) -> dict:
+        """Distance -> minutes linear fit: slope, intercept, scatter x/y and the slowest orders; None if too few points."""
+        if self.pre_aggregated:
+            # x/y are a uniform sample for the scatter; the fit itself used every order.
+            fit = self.agg["fit"]
+            x, y = (fit["x"], fit["y"]) if fit else (np.array([]), np.array([]))
+        else:
+            fit = None
+            x = self.deliv["distance_km"].to_numpy("float64")
+            y = self.deliv["delivery_minutes"].to_numpy("float64")
+        if not (fit or len(x) > 5):
+            return None
+        # Outliers: residual z-scores under a global (default), per-area or per-hour
+        # model with classical or robust scale, worst 15 by partial selection (outliers.py)
+        custom = self.outlier_by is not None or self.robust_outliers
+        if fit and not custom:
+            slope, intercept, worst = fit["slope"], fit["intercept"], fit["worst"]
+        elif fit:
+            # the model came with the aggregates; one pass bounded by its threshold ranks the orders
+            worst = scan_slowest(self.engine, self.agg["outlier_model"], chunksize=self.chunksize)
+            slope, intercept = fit["slope"], fit["intercept"]
+            worst = self.vendor_lookup.attach(worst, columns=["vendor_name","area"])
+        else:
+            model = SlowDeliveryModel(by=self.outlier_by, robust=self.robust_outliers)
+            model.update(self.deliv)
+            slope, intercept = model.lines().loc[0, ["slope", "intercept"]]
+            top = TopN(15)
+            top.update(self.deliv, model.score(self.deliv))
+            worst = self.vendor_lookup.attach(top.result(), columns=["vendor_name","area"])
+        return {"slope": slope, "intercept": intercept, "x": x, "y": y, "worst": worst}
+
+    @cached_property
+    def eta(self) -> EtaModel:
+        """Area-pair ETA model fitted on every delivered order (see eta.py); the
+        pre-aggregated modes fold its cell sums with the other aggregates."""
+        if self.pre_aggregated:
+            return self.agg["eta"]
+        model = EtaModel()
+        model.update(self.deliv)
+        return model.fit()
+
+    @cached_property
+    def peak_area(self) -> pd.DataFrame:
+        if self.pre_aggregated:
+            return self.agg["peak_area"]
+        vh = self.deliv.groupby(["vendor_id","hour"]).size().reset_index(name="orders")
+        vh = self.vendor_lookup.attach(vh, columns=["area"])
+        vh = vh.groupby(["area","hour"])["orders"].sum().reset_index()
+        return top_k(vh, ["orders","hour"], k=1, by="area", ascending=[False,True])
+
+    @cached_property
+    def top3(self) -> pd.DataFrame:
+        if self.pre_aggregated:
+            return self.agg["top3"]
+        va = self.kpi.by(self.deliv["vendor_id"])[["orders"]].reset_index()
+        va = self.vendor_lookup.attach(va, columns=["area","vendor_name"])
+        va = va.groupby(["area","vendor_name"])["orders"].sum().reset_index()
+        return top_k(va, ["orders","vendor_name"], k=3, by="area", ascending=[False,True])
+
+    # --------------------------
+    # Outputs (print, CSV, figures)
+    # --------------------------
+    def _out_global_kpis(self):
+        g = self.global_kpis
+        print(f"Total Orders: {g['total_orders']}")
+        print(f"Delivered: {g['delivered_orders']}  |  Canceled: {g['canceled_orders']} ({pct(g['cancel_rate'])})  |  Returned: {g['returned_orders']} ({pct(g['return_rate'])})")
+        print(f"Avg Delivery Time: {g['avg_delivery_min']} min  |  P95: {g['p95_delivery_min']} min")
+        print(f"Total Revenue: ${g['total_revenue']}  |  AOV: ${g['aov']}")
+        print(f"Avg Distance: {g['avg_distance']} km")
+        for sla, sla_ok in g["sla"].items():
+            print(f"SLA ≤ {sla} min: {pct(sla_ok)}")
+        return 1
+
+    def _out_daily_kpis(self):
+        daily = self.daily
+        daily.to_csv(self._csv("daily_kpis.csv"), index=False)
+        print("saved: outputs/daily_kpis.csv")
+
+        self.figs.add("daily_orders", "line", "Daily Orders", "Date", "Orders", figsize=(10,4),
+                      x=daily["date"], y=daily["orders"])
+        self.figs.add("daily_revenue", "line", "Daily Revenue", "Date", "Revenue", figsize=(10,4),
+                      x=daily["date"], y=daily["revenue"])
+        self.figs.add("orders_by_hour", "bar", "Orders by Hour", "Hour", "Orders", figsize=(8,4), series=self.hourly)
+        self.figs.add("orders_by_dow", "bar", "Orders by Day of Week", "Day", "Orders", figsize=(7,4),
+                      series=self.dow_counts.loc[DOW_NAMES])
+        return len(daily)
+
+    def _out_area_kpis(self):
+        area_kpis = self.area_kpis
+        print(area_kpis.head(12).to_string())
+        area_kpis.to_csv(self._csv("area_kpis.csv"))
+        print("saved: outputs/area_kpis.csv")
+
+        self.figs.add("avg_minutes_by_area", "bar", "Avg Delivery Minutes by Dropoff Area (Top 12 fastest)",
+                      "Area", "Avg Minutes", figsize=(10,4),
+                      series=top_k(area_kpis, "avg_minutes", k=12, ascending=True)["avg_minutes"])
+        return len(area_kpis)
+
+    def _out_top_vendors_by_orders(self):
+        vend = self.vend
+        top_vendors_orders = top_k(vend, ["orders","vendor_id"], k=15, ascending=[False,True])
+        print("\nTop Vendors by Orders:")
+        print(top_vendors_orders[["vendor_name","area","cuisine","orders","avg_minutes","sla30","revenue"]].to_string(index=False))
+        top_vendors_orders.to_csv(self._csv("top_vendors_by_orders.csv"), index=False)
+
+        self.figs.add("top10_vendors_revenue", "bar", "Top 10 Vendors by Revenue", "Vendor", "Revenue", figsize=(10,4),
+                      series=(top_k(vend, ["revenue","vendor_id"], k=10, ascending=[False,True])
+                                  .set_index("vendor_name")["revenue"]))
+        return len(vend)
+
+    def _out_cuisine_kpis(self):
+        cui = self.cui
+        print(cui.to_string())
+        cui.to_csv(self._csv("cuisine_kpis.csv"))
+
+        self.figs.add("top_cuisines_orders", "bar", "Top Cuisines by Orders", "Cuisine", "Orders", figsize=(8,4),
+                      series=cui["orders"].head(10))
+        return len(cui)
+
+    def _out_top_drivers(self):
+        drv = self.drv
+        best_drivers = top_k(drv[drv["orders"]>=20], ["avg_rating","orders","driver_id"], k=10, ascending=[False,False,True])
+        print("\nTop Drivers (orders>=20):")
+        print(best_drivers[["driver_name","orders","avg_rating","avg_minutes","avg_distance","efficiency_min_per_km"]].to_string(index=False))
+        best_drivers.to_csv(self._csv("top_drivers.csv"), index=False)
+        return len(drv)
+
+    def _out_top_customers(self):
+        cust_orders = self.cust_orders
+        repeat_rate = (cust_orders["orders"]>=2).mean() if len(cust_orders) else 0
+        print(f"Unique Customers (delivered): {len(cust_orders)} | Repeat Customers (>=2 orders): {pct(repeat_rate)}")
+        top_k(cust_orders, ["orders","customer_id"], k=15, ascending=[False,True]).to_csv(self._csv("top_customers.csv"), index=False)
+
+        self.figs.add("orders_per_customer_dist", "bar", "Orders per Customer (Frequency)",
+                      "# Orders per Customer", "# Customers", figsize=(8,4),
+                      series=cust_orders["orders"].value_counts().sort_index())
+        return len(cust_orders)
+
+    def _out_customer_cohorts(self):
+        cohorts = self.cohorts
+        retention = cohorts.retention()
+        print("Retention by first-order month (share of the cohort ordering N months later):")
+        print(retention.iloc[:, :7].to_string())
+        retention.to_csv(self._csv("cohort_retention.csv"))
+        cohorts.retention(by="signup").to_csv(self._csv("signup_cohort_retention.csv"))
+        cohorts.cohort_revenue().to_csv(self._csv("cohort_revenue.csv"))
+        gaps = cohorts.order_gaps()
+        gaps.to_csv(self._csv("order_gaps.csv"), index=False)
+        print(f"Days between orders: median {cohorts.gap_quantile(0.5):.0f} | p90 {cohorts.gap_quantile(0.9):.0f}")
+        segments = cohorts.rfm_segments()
+        print(segments.to_string())
+        segments.to_csv(self._csv("rfm_segments.csv"))
+        print("saved: outputs/cohort_retention.csv, signup_cohort_retention.csv, cohort_revenue.csv, "
+              "order_gaps.csv, rfm_segments.csv")
+
+        self.figs.add("days_between_orders", "bar", "Days Between Consecutive Orders",
+                      "Days", "Orders", figsize=(10,4), series=gaps.set_index("days")["orders"])
+        return len(retention)
+
+    def _out_outliers_slow_deliveries(self):
+        fit = self.fit
+        if fit is None:
+            return 0
+        print(f"minutes ≈ {fit['slope']:.2f} * distance_km + {fit['intercept']:.2f}")
+        self.figs.add_fit("distance_vs_minutes_fit", fit["x"], fit["y"], fit["slope"], fit["intercept"],
+                          title="Distance vs Delivery Minutes (linear fit)",
+                          xlabel="Distance (km)", ylabel="Delivery Minutes", figsize=(6,4))
+        worst = fit["worst"][WORST_COLUMNS]
+        worst.to_csv(self._csv("outliers_slow_deliveries.csv"), index=False)
+        print("saved: outputs/outliers_slow_deliveries.csv")
+        print(worst.to_string(index=False))
+        return len(worst)
+
+    def _out_eta_area_pairs(self):
+        model = self.eta
+        if not model.fitted:
+            print("not enough delivered orders for an ETA model")
+            return 0
+        path = model.save(self.eta_model_path)
+        table = model.table()
+        table[["slope","intercept","scale"]] = table[["slope","intercept","scale"]].round(4)
+        table.to_csv(self._csv("eta_area_pairs.csv"), index=False)
+        levels = table["source"].value_counts().reindex(list(LEVELS), fill_value=0)
+        print("cells by fitted level: " + ", ".join(f"{level} {n}" for level, n in levels.items()))
+        rmse = model.rmse()
+        print(f"in-sample RMSE: global line {rmse['global']:.2f} min, area-pair model {rmse['area_pair']:.2f} min")
+        matrix = model.matrix(REFERENCE_KM).round(1)
+        matrix.to_csv(self._csv("eta_matrix.csv"))
+        print(f"expected minutes at {REFERENCE_KM:g} km (pickup x dropoff):")
+        print(matrix.to_string())
+        print(f"saved: outputs/eta_area_pairs.csv, outputs/eta_matrix.csv, model {path}")
+
+        self.figs.add("eta_matrix", "heatmap", f"Expected Delivery Minutes at {REFERENCE_KM:g} km",
+                      "Dropoff area", "Pickup area", figsize=(9,7), frame=matrix, label="Minutes")
+        return len(table)
+
+    def _out_peak_hour_per_area(self):
+        peak_area = self.peak_area
+        peak_area.to_csv(self._csv("peak_hour_per_area.csv"), index=False)
+        print(peak_area.to_string(index=False))
+        return len(peak_area)
+
+    def _out_top3_vendors_per_area(self):
+        top3 = self.top3
+        top3.to_csv(self._csv("top3_vendors_per_area.csv"), index=False)
+        print(top3.to_string(index=False))
+        return len(top3)
+
+    # --------------------------
+    # Verification
+    # --------------------------
+    def output_tables(self, name: str) -> dict:
+        """The tables output `name` reports, as {label: (frame, sort keys)}; keys None
+        matches rows by index. Empty when the output has nothing to report."""
+        if name == "global_kpis":
+            g = dict(self.global_kpis)
+            g.update({f"sla{t}": v for t, v in g.pop("sla").items()})
+            return {name: (pd.Series(g, dtype="float64").to_frame("value"), None)}
+        if name == "daily_kpis":
+            return {name: (self.daily, ["date"]),
+                    "orders_by_hour": (self.hourly.to_frame("orders"), None),
+                    "orders_by_dow": (self.dow_counts.to_frame("orders"), None)}
+        if name == "customer_cohorts":
+            cohorts = self.cohorts
+            return {"cohort_retention": (cohorts.retention(), None),
+                    "signup_cohort_retention": (cohorts.retention(by="signup"), None),
+                    "cohort_revenue": (cohorts.cohort_revenue(), None),
+                    "order_gaps": (cohorts.order_gaps(), ["days"]),
+                    "rfm_segments": (cohorts.rfm_segments(), None)}
+        if name == "outliers_slow_deliveries":
+            fit = self.fit
+            if fit is None:
+                return {}
+            line = pd.Series({"slope": fit["slope"], "intercept": fit["intercept"]}).to_frame("value")
+            return {"distance_fit": (line, None), name: (fit["worst"][WORST_COLUMNS], ["order_id"])}
+        if name == "eta_area_pairs":
+            model = self.eta
+            if not model.fitted:
+                return {}
+            return {name: (model.table(), ["pickup_area", "dropoff_area", "hour_bucket"]),
+                    "eta_matrix": (model.matrix(REFERENCE_KM), None)}
+        table, keys = {
+            "area_kpis":             ("area_kpis", None),
+            "top_vendors_by_orders": ("vend", ["vendor_id"]),
+            "cuisine_kpis":          ("cui", None),
+            "top_drivers":           ("drv", ["driver_id"]),
+            "top_customers":         ("cust_orders", ["customer_id"]),
+            "peak_hour_per_area":    ("peak_area", ["area", "orders"]),
+            "top3_vendors_per_area": ("top3", ["area", "orders"]),
+        }[name]  # rankings match on (group, value): the database may break ties differently
+        return {name: (getattr(self, table), keys)}
+
+    def verify(self, rtol: float = 1e-6) -> list:
+        """Compare every requested output table with an in-memory run on the same
+        engine; returns mismatch messages."""
+        ref = Analysis(self.engine, outputs=self.outputs, read_partitions=self.read_partitions,
+                       load_workers=self.load_workers, weekend=self.weekend, outlier_by=self.outlier_by,
+                       robust_outliers=self.robust_outliers, out_dir=self.out_dir)
+        problems = []
+        for name in self.outputs:
+            ours, theirs = self.output_tables(name), ref.output_tables(name)
+            for label in sorted(set(ours) ^ set(theirs)):
+                problems.append(f"{label}: only one run produced it")
+            for label in [t for t in ours if t in theirs]:
+                msg = _same_frame(ours[label][0], theirs[label][0], ours[label][1], rtol)
+                if msg:
+                    problems.append(f"{label}: {msg}")
+        return problems
+
+    # --------------------------
+    # Run
+    # --------------------------
+    def run(self, figures: bool = True, figure_workers: int = None) -> list:
+        """Produce the requested outputs in report order; returns the figure paths rendered."""
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.report.stage("Load tables")
+        if self.pre_aggregated:
+            self.agg
+            if self.verify_sql:
+                self.section("SQL Backend Verification")
+                problems = self.verify()
+                for p in problems:
+                    print(f"MISMATCH {p}")
+                if problems:
+                    raise SystemExit(f"{self.mode} mode disagrees with the in-memory run in {len(problems)} checks")
+                print(f"{self.mode} mode matches the in-memory run")
+        else:
+            self.report.rows(out=len(self.raw_orders))
+            self.report.stage("Feature engineering", rows_in=len(self.raw_orders))
+            self.kpi
+            self.report.rows(out=len(self.deliv))
+            shared = [t for t, users in SHARED_TABLES.items() if len(set(users) & set(self.outputs)) > 1]
+            if shared:
+                self.report.stage("Shared tables")
+                for table in shared:
+                    getattr(self, table)
+
+        for name in self.outputs:
+            self.section(OUTPUTS[name][0], rows_in=self.delivered_rows)
+            self.report.rows(out=getattr(self, f"_out_{name}")())
+
+        if not figures:
+            return []
+        self.report.stage("Render figures", rows_in=len(self.figs.jobs))
+        paths = render_all(self.figs, workers=figure_workers)
+        self.report.rows(out=len(paths))
+        return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Baghdad food delivery analysis")
+    parser.add_argument("--outputs", nargs="+", choices=list(OUTPUTS), default=None, metavar="NAME",
+                        help=f"only produce these outputs (default: all of {', '.join(OUTPUTS)})")
+    parser.add_argument("--stream", action="store_true",
+                        help="aggregate orders chunk by chunk instead of loading the full table")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help="rows per chunk in --stream/--parallel/--incremental mode")
+    parser.add_argument("--parallel", type=int, nargs="?", const=0, default=None, metavar="WORKERS",
+                        help="stream date partitions of orders in WORKERS processes (default: one per CPU)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="update persisted aggregates with orders past the stored watermark")
+    parser.add_argument("--state", default=DEFAULT_STATE_PATH,
+                        help="aggregate state file for --incremental")
+    parser.add_argument("--cohort-state", default=DEFAULT_COHORT_STATE_PATH,
+                        help="cohort/retention state file for --incremental")
+    parser.add_argument("--eta-model", default=DEFAULT_ETA_MODEL_PATH,
+                        help="where the fitted area-pair ETA model is saved")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="with --incremental, discard the stored state and rebuild it")
+    parser.add_argument("--sql", action="store_true",
+                        help="compute every section with GROUP BY queries in the database")
+    parser.add_argument("--verify-sql", action="store_true",
+                        help="with --sql, compare every output table with an in-memory run and stop on mismatch")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="load tables from the local Parquet snapshot, syncing new rows first")
+    parser.add_argument("--snapshot-dir", default=DEFAULT_SNAPSHOT_DIR,
+                        help="snapshot location for --snapshot")
+    parser.add_argument("--offline", action="store_true",
+                        help="with --snapshot, skip the staleness check and never query the database")
+    parser.add_argument("--db-config", default=None, metavar="INI",
+                        help="database settings file (default: db.ini or $FOOD_DB_CONFIG; FOOD_DB_* variables override)")
+    parser.add_argument("--read-partitions", type=int, default=1, metavar="N",
+                        help="read orders as N order_id ranges in parallel (in-memory mode)")
+    parser.add_argument("--load-workers", type=int, default=None,
+                        help="concurrent table reads (default: the connection pool size)")
+    parser.add_argument("--no-figures", action="store_true",
+                        help="skip figure rendering (headless KPI-only run)")
+    parser.add_argument("--figure-workers", type=int, default=None,
+                        help="processes used to render figures (default: one per figure, up to the CPU count)")
+    parser.add_argument("--weekend", nargs="+", default=list(IRAQ_WEEKEND), metavar="DAY",
+                        help=f"weekend day names for the is_weekend feature (default: {' '.join(IRAQ_WEEKEND)})")
+    parser.add_argument("--outlier-model", choices=("global", "area", "hour"), default="global",
+                        help="fit the slow-delivery model globally or per dropoff area / hour")
+    parser.add_argument("--robust-outliers", action="store_true",
+                        help="scale residuals by median/MAD instead of mean/std")
+    parser.add_argument("--report", default=DEFAULT_REPORT_PATH,
+                        help="where to write the per-section timing/memory report (JSON)")
+    parser.add_argument("--profile", metavar="DIR", default=None,
+                        help="write a cProfile dump per section into DIR")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also record the tracemalloc peak per section (slower)")
+    args = parser.parse_args(argv)
+    args.sql = args.sql or args.verify_sql
+    mode = ("sql" if args.sql else "incremental" if args.incremental else
+            "parallel" if args.parallel is not None else "stream" if args.stream else "memory")
+
+    engine = make_engine(db_settings(args.db_config))
+    report = RunReport(engine, profile_dir=args.profile, trace_memory=args.trace_memory)
+    analysis = Analysis(engine, mode=mode, outputs=args.outputs,
+                        snapshot_dir=args.snapshot_dir if args.snapshot else None, offline=args.offline,
+                        chunksize=args.chunksize, workers=args.parallel or None, state_path=args.state,
+                        cohort_state_path=args.cohort_state, eta_model_path=args.eta_model,
+                        full_refresh=args.full_refresh,
+                        read_partitions=args.read_partitions, load_workers=args.load_workers,
+                        verify_sql=args.verify_sql, weekend=args.weekend,
+                        outlier_by={"global": None, "area": "dropoff_area", "hour": "hour"}[args.outlier_model],
+                        robust_outliers=args.robust_outliers, report=report)
+    analysis.run(figures=not args.no_figures, figure_workers=args.figure_workers)
+    if args.no_figures:
+        print("\nDone. CSVs in outputs/ (figures skipped).")
+    else:
+        print("\nDone. CSVs in outputs/, figures in figures/.")
+
+    report.finish()
+    print(f"\nRun report: {report.write(args.report)}")
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+bench_eta.py
+Benchmark: area-pair ETA by per-cell refits (groupby(pickup, dropoff,
+hour bucket).apply(np.polyfit) and a merge of the fitted lines back onto the
+orders to predict) vs eta.EtaModel (one bincount pass into the cell sums, a
+vectorized fit, lookup-table predictions). Both fit every cell on its own
+orders (the datasets are large enough that no cell falls back), and the
+predictions are checked to agree.
+
+    python -m benchmarks.bench_eta --sizes 1000000 5000000
+"""
+
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_groupby import timed
+from eta import EtaModel
+from order_generator import generate_block, vendor_names
+
+
+def make_delivered(n: int, seed: int = 101) -> pd.DataFrame:
+    meta = [(i + 1, cuisine, area) for i, (_, cuisine, area) in enumerate(vendor_names())]
+    orders = generate_block(np.random.default_rng(seed), n, np.arange(1, 5001), np.arange(1, 301), meta,
+                            datetime(2025, 1, 1), days=30)
+    deliv = orders[orders["status"] == "delivered"].reset_index(drop=True)
+    for col in ("pickup_area", "dropoff_area"):
+        deliv[col] = deliv[col].astype("category")
+    deliv["hour"] = deliv["order_datetime"].dt.hour
+    return deliv
+
+
+def legacy(deliv: pd.DataFrame, bucket_of_hour: np.ndarray) -> np.ndarray:
+    keys = [deliv["pickup_area"], deliv["dropoff_area"], pd.Series(bucket_of_hour[deliv["hour"]], name="bucket")]
+    lines = (deliv.groupby(keys, observed=True)[["distance_km", "delivery_minutes"]]
+             .apply(lambda g: pd.Series(np.polyfit(g["distance_km"], g["delivery_minutes"], 1),
+                                        index=["slope", "intercept"]))
+             .reset_index())
+    rows = pd.DataFrame({"pickup_area": deliv["pickup_area"], "dropoff_area": deliv["dropoff_area"],
+                         "bucket": keys[2]}).merge(lines, on=["pickup_area", "dropoff_area", "bucket"], how="left")
+    return rows["slope"].to_numpy() * deliv["distance_km"].to_numpy() + rows["intercept"].to_numpy()
+
+
+def engine(deliv: pd.DataFrame) -> np.ndarray:
+    model = EtaModel()
+    model.update(deliv)
+    return model.fit().predict(deliv)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[2])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 5_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    bucket_of_hour = EtaModel().bucket_of_hour
+    print(f"{'orders':>12} {'refit s':>9} {'model s':>9} {'speedup':>8} {'predict s':>10} {'max diff':>9}")
+    for n in args.sizes:
+        deliv = make_delivered(n)
+        diff = np.abs(legacy(deliv, bucket_of_hour) - engine(deliv)).max()
+        if not diff < 1e-6:
+            raise AssertionError(f"EtaModel disagrees with the per-cell refit at n={n}: {diff}")
+        t_legacy = timed(legacy, deliv, bucket_of_hour, repeat=args.repeat)
+        t_engine = timed(engine, deliv, repeat=args.repeat)
+        model = EtaModel()
+        model.update(deliv)
+        t_predict = timed(model.fit().predict, deliv, repeat=args.repeat)
+        print(f"{len(deliv):>12,} {t_legacy:>9.3f} {t_engine:>9.3f} {t_legacy / t_engine:>7.1f}x "
+              f"{t_predict:>10.3f} {diff:>9.1e}")
+
+
+if __name__ == "__main__":
+    main()
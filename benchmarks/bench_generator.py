@@ -0,0 +1,69 @@
+"""
+bench_generator.py
+Benchmark: the original per-row order loop vs order_generator's vectorized
+blocks, in generated rows/sec (no database involved).
+
+    python -m benchmarks.bench_generator --orders 1000000 --legacy-orders 100000
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from order_generator import BAGHDAD_AREAS, HOUR_WEIGHTS, generate_orders, vendor_names
+
+
+def legacy_orders(n, customer_ids, driver_ids, vendor_meta):
+    orders = []
+    base_dt = datetime.now() - timedelta(days=120)
+    for _ in range(n):
+        cust_id = random.choice(customer_ids)
+        drv_id = random.choice(driver_ids)
+        vendor_id, vendor_cuisine, vendor_area = random.choice(vendor_meta)
+        hour = random.choices(population=list(range(24)), weights=HOUR_WEIGHTS, k=1)[0]
+        day_offset = random.randint(0, 119)
+        minute = random.randint(0, 59)
+        order_dt = (base_dt + timedelta(days=day_offset)).replace(hour=hour, minute=minute, second=0, microsecond=0)
+        dropoff_area = random.choice(BAGHDAD_AREAS)
+        while dropoff_area == vendor_area:
+            dropoff_area = random.choice(BAGHDAD_AREAS)
+        distance = round(random.uniform(0.8, 10.0), 2)
+        delivery_min = max(10, int(distance * random.uniform(4.2, 7.2) + random.randint(-3, 7)))
+        subtotal = round(random.uniform(4.0, 30.0), 2)
+        delivery_fee = round(max(1.0, distance * random.uniform(0.2, 0.8)), 2)
+        tip = round(max(0.0, random.gauss(1.0, 1.0)), 2)
+        status = random.choices(["delivered", "canceled", "returned"], weights=[92, 6, 2], k=1)[0]
+        driver_rating = round(min(5.0, max(1.0, random.gauss(4.4, 0.5))), 2) if status == "delivered" else None
+        orders.append((cust_id, drv_id, vendor_id, vendor_cuisine, order_dt, vendor_area, dropoff_area,
+                       distance, delivery_min, subtotal, delivery_fee, tip, driver_rating, status))
+    return orders
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[2])
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--legacy-orders", type=int, default=100_000)
+    parser.add_argument("--block-size", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    customer_ids = list(range(1, 501))
+    driver_ids = list(range(1, 51))
+    vendor_meta = [(i + 1, cuisine, area) for i, (_, cuisine, area) in enumerate(vendor_names())]
+
+    start = time.perf_counter()
+    legacy_orders(args.legacy_orders, customer_ids, driver_ids, vendor_meta)
+    legacy = args.legacy_orders / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    rows = sum(len(b) for b in generate_orders(args.orders, customer_ids, driver_ids, vendor_meta,
+                                               block_size=args.block_size))
+    vectorized = rows / (time.perf_counter() - start)
+
+    print(f"legacy loop: {legacy:>14,.0f} rows/sec ({args.legacy_orders:,} orders)")
+    print(f"vectorized:  {vectorized:>14,.0f} rows/sec ({rows:,} orders)")
+    print(f"speedup:     {vectorized / legacy:>14.1f}x")
+
+
+if __name__ == "__main__":
+    main()
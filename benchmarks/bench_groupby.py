@@ -0,0 +1,107 @@
+"""
+bench_groupby.py
+Benchmark: lambda-based pandas aggregations (the original analysis.py
+sections) vs the single-pass KpiEngine, on synthetic delivered orders.
+
+    python -m benchmarks.bench_groupby --sizes 1000000 10000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from groupby_engine import SLA_THRESHOLDS, KpiEngine
+
+AREAS = ["Mansour", "Karada", "Adhamiyah", "Kadhimiya", "Jadriyah", "Zayouna", "Palestine Street",
+         "Dora", "Sadr City", "Yarmouk", "Bab Al Sharqi", "Karradat Mariam"]
+CUISINES = ["Burger", "Pizza", "Iraqi", "Dessert", "Fried Chicken", "Kebab", "Shawarma",
+            "BBQ", "Sushi", "Seafood", "Cafe", "Turkish"]
+
+
+def make_delivered(n: int, n_vendors: int = 66, n_drivers: int = 50, seed: int = 101):
+    rng = np.random.default_rng(seed)
+    vendors = pd.DataFrame({
+        "vendor_id": np.arange(1, n_vendors + 1),
+        "vendor_name": [f"Vendor {i}" for i in range(1, n_vendors + 1)],
+        "cuisine": rng.choice(CUISINES, n_vendors),
+        "area": [AREAS[i % len(AREAS)] for i in range(n_vendors)],
+    })
+    dist = rng.uniform(0.8, 10.0, n).round(2)
+    dt = pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 120 * 1440, n), unit="min")
+    deliv = pd.DataFrame({
+        "order_id": np.arange(1, n + 1),
+        "vendor_id": rng.integers(1, n_vendors + 1, n),
+        "driver_id": rng.integers(1, n_drivers + 1, n),
+        "dropoff_area": rng.choice(AREAS, n),
+        "order_datetime": dt,
+        "distance_km": dist,
+        "delivery_minutes": np.maximum(10, (dist * rng.uniform(4.2, 7.2, n) + rng.integers(-3, 8, n)).astype(int)),
+        "driver_rating": np.clip(rng.normal(4.4, 0.5, n), 1, 5).round(2),
+        "revenue": rng.uniform(6, 40, n).round(2),
+    })
+    deliv["date"] = deliv["order_datetime"].dt.date
+    deliv["hour"] = deliv["order_datetime"].dt.hour
+    deliv["dow"] = deliv["order_datetime"].dt.day_name()
+    return deliv, vendors
+
+
+def legacy(deliv, vendors):
+    deliv_v = deliv.merge(vendors, on="vendor_id", how="left")
+    for sla in SLA_THRESHOLDS:
+        (deliv["delivery_minutes"] <= sla).mean()
+    deliv.groupby("date").agg(orders=("order_id", "count"), revenue=("revenue", "sum"),
+                              avg_minutes=("delivery_minutes", "mean"))
+    deliv.groupby("hour").size()
+    deliv["dow"].value_counts()
+    deliv.groupby("dropoff_area").agg(orders=("order_id", "count"), avg_minutes=("delivery_minutes", "mean"),
+                                      sla30=("delivery_minutes", lambda s: (s <= 30).mean()),
+                                      revenue=("revenue", "sum"))
+    deliv_v.groupby(["vendor_id", "vendor_name", "area", "cuisine"]).agg(
+        orders=("order_id", "count"), revenue=("revenue", "sum"), avg_minutes=("delivery_minutes", "mean"),
+        sla30=("delivery_minutes", lambda s: (s <= 30).mean()))
+    deliv_v.groupby("cuisine").agg(
+        orders=("order_id", "count"), revenue=("revenue", "sum"), avg_minutes=("delivery_minutes", "mean"),
+        sla30=("delivery_minutes", lambda s: (s <= 30).mean()))
+    deliv.groupby("driver_id").agg(orders=("order_id", "count"), avg_rating=("driver_rating", "mean"),
+                                   avg_minutes=("delivery_minutes", "mean"), avg_distance=("distance_km", "mean"))
+
+
+def engine(deliv, vendors):
+    kpi = KpiEngine(deliv["delivery_minutes"], deliv["revenue"])
+    kpi.totals()
+    kpi.by(deliv["order_datetime"].values.astype("datetime64[D]"))
+    kpi.by(deliv["hour"])
+    kpi.by(deliv["dow"])
+    kpi.by(deliv["dropoff_area"])
+    vend = vendors.merge(kpi.by(deliv["vendor_id"]).reset_index(), on="vendor_id")
+    KpiEngine.rollup(vend.drop(columns=["vendor_id", "vendor_name", "area", "cuisine"]), vend["cuisine"].values)
+    kpi.by(deliv["driver_id"], sums={"rating": deliv["driver_rating"], "distance": deliv["distance_km"]})
+
+
+def timed(fn, *args, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[2])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'orders':>12} {'legacy s':>10} {'engine s':>10} {'speedup':>8}")
+    for n in args.sizes:
+        deliv, vendors = make_delivered(n)
+        t_legacy = timed(legacy, deliv, vendors, repeat=args.repeat)
+        t_engine = timed(engine, deliv, vendors, repeat=args.repeat)
+        print(f"{n:>12,} {t_legacy:>10.3f} {t_engine:>10.3f} {t_legacy / t_engine:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
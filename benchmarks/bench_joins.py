@@ -0,0 +1,116 @@
+"""
+bench_joins.py
+Benchmark: peak memory of the original full-width joins (deliv.merge(vendors),
+the outlier copy + full sort, merges on drivers) vs DimensionLookup
+attaching attributes after aggregation. Each variant runs in a fresh
+process; we report how far peak RSS rises above the RSS with the
+delivered orders already built (Linux /proc peak reset), and the wall time.
+
+    python -m benchmarks.bench_joins --sizes 10000000
+"""
+
+import argparse
+import multiprocessing
+import resource
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_groupby import make_delivered
+from dimensions import DimensionLookup
+
+
+def make_drivers(n_drivers: int = 50) -> pd.DataFrame:
+    return pd.DataFrame({
+        "driver_id": np.arange(1, n_drivers + 1),
+        "driver_name": [f"Driver {i}" for i in range(1, n_drivers + 1)],
+        "rating": np.linspace(3.5, 4.9, n_drivers).round(2),
+    })
+
+
+def _residual_z(deliv) -> np.ndarray:
+    x = deliv["distance_km"].to_numpy("float64")
+    y = deliv["delivery_minutes"].to_numpy("float64")
+    slope, intercept = np.polyfit(x, y, 1)
+    res = y - (slope * x + intercept)
+    return (res - res.mean()) / res.std()
+
+
+def legacy(deliv, vendors, drivers):
+    deliv_v = deliv.merge(vendors, on="vendor_id", how="left", suffixes=("", "_vendor"))
+    tmp = deliv_v.copy()
+    tmp["residual_z"] = _residual_z(deliv)
+    tmp.sort_values("residual_z", ascending=False).head(15)
+    deliv_v.groupby(["area", "hour"])["order_id"].count()
+    deliv_v.groupby(["area", "vendor_name"])["order_id"].count()
+    drv = deliv.groupby("driver_id").agg(orders=("order_id", "count")).reset_index()
+    drv.merge(drivers, on="driver_id", how="left")
+
+
+def lookup(deliv, vendors, drivers):
+    v, d = DimensionLookup(vendors, "vendor_id"), DimensionLookup(drivers, "driver_id")
+    z = _residual_z(deliv)
+    top = pd.Series(z).nlargest(15).index
+    v.attach(deliv.iloc[top].reset_index(drop=True).assign(residual_z=z[top]), columns=["vendor_name", "area"])
+    vh = v.attach(deliv.groupby(["vendor_id", "hour"]).size().reset_index(name="orders"), columns=["area"])
+    vh.groupby(["area", "hour"])["orders"].sum()
+    va = v.attach(deliv.groupby("vendor_id").size().reset_index(name="orders"), columns=["area", "vendor_name"])
+    va.groupby(["area", "vendor_name"])["orders"].sum()
+    d.attach(deliv.groupby("driver_id").agg(orders=("order_id", "count")).reset_index())
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+
+
+def _reset_peak():
+    # Linux: writing 5 to clear_refs resets the peak RSS (VmHWM) to the current RSS.
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+
+def _peak_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(name, n, out):
+    deliv, vendors = make_delivered(n)
+    drivers = make_drivers()
+    _reset_peak()
+    base = _rss_mb()
+    start = time.perf_counter()
+    {"legacy": legacy, "lookup": lookup}[name](deliv, vendors, drivers)
+    seconds = time.perf_counter() - start
+    out.put((seconds, _peak_mb() - base))
+
+
+def measure(name: str, n: int):
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(target=_measure, args=(name, n, out))
+    proc.start()
+    result = out.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[2])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000_000])
+    args = parser.parse_args()
+
+    print(f"{'orders':>12} {'legacy MB':>10} {'lookup MB':>10} {'legacy s':>9} {'lookup s':>9}")
+    for n in args.sizes:
+        t_legacy, mb_legacy = measure("legacy", n)
+        t_lookup, mb_lookup = measure("lookup", n)
+        print(f"{n:>12,} {mb_legacy:>10.0f} {mb_lookup:>10.0f} {t_legacy:>9.2f} {t_lookup:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+bench_suite.py
+Benchmark suite: analysis.py end to end and per section on synthetic data.
+Datasets of each size are generated with order_generator (the seeding
+script's generator, same seed and distributions) into SQLite files, so no
+MySQL is needed; they are built once and reused. Every (size, mode) run
+happens in a fresh process with a RunReport attached, so each section's
+wall/CPU/DB time, memory growth and rows are recorded along with the
+end-to-end time and peak RSS. Results are written as JSON; --compare
+checks them against an earlier results file and exits non-zero on a
+regression.
+
+    python -m benchmarks.bench_suite --sizes 10000 1000000 10000000 --modes memory stream sql
+    python -m benchmarks.bench_suite --sizes 10000 --compare benchmarks/results/baseline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import sqlite3
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from order_generator import BAGHDAD_AREAS, HISTORY_DAYS, ORDER_COLUMNS, order_blocks, vendor_names
+
+SUITE_VERSION = 1
+DEFAULT_SIZES = (10_000, 1_000_000, 10_000_000)
+DEFAULT_MODES = ("memory", "stream", "sql")
+DEFAULT_DATA_DIR = os.path.join("benchmarks", "data")
+DEFAULT_RESULTS_DIR = os.path.join("benchmarks", "results")
+BASE_DATE = datetime(2025, 1, 1)   # fixed, so a dataset is the same whatever day it is built
+DEFAULT_TOLERANCE = 0.25           # a stage is a regression when it gets 25% slower ...
+MIN_SECONDS = 0.05                 # ... and took at least this long in the baseline
+# Mirrors schema_baghdad.sql (bulk_load.ORDER_INDEXES, which needs mysql.connector to import).
+ORDER_INDEXES = {
+    "idx_orders_datetime": "order_datetime",
+    "idx_orders_driver": "driver_id",
+    "idx_orders_vendor": "vendor_id",
+    "idx_orders_droparea": "dropoff_area",
+}
+
+
+# --------------------------
+# Datasets
+# --------------------------
+def dataset_path(data_dir: str, n: int, seed: int) -> str:
+    return os.path.join(data_dir, f"orders_{n}_seed{seed}.db")
+
+
+def _dimensions(rng: np.random.Generator, n_customers: int, n_drivers: int) -> dict:
+    def days_before(n, span):
+        return (np.datetime64(BASE_DATE.date()) - rng.integers(0, span, n).astype("timedelta64[D]")).astype(str)
+
+    vendors = vendor_names()
+    return {
+        "drivers": pd.DataFrame({
+            "driver_id": np.arange(1, n_drivers + 1),
+            "driver_name": [f"Driver {i}" for i in range(1, n_drivers + 1)],
+            "rating": rng.uniform(3.5, 4.9, n_drivers).round(2),
+            "start_date": days_before(n_drivers, 730),
+        }),
+        "customers": pd.DataFrame({
+            "customer_id": np.arange(1, n_customers + 1),
+            "customer_name": [f"Customer {i}" for i in range(1, n_customers + 1)],
+            "city": "Baghdad",
+            "signup_date": days_before(n_customers, 1095),
+        }),
+        "vendors": pd.DataFrame({
+            "vendor_id": np.arange(1, len(vendors) + 1),
+            "vendor_name": [name for name, _, _ in vendors],
+            "cuisine": [cuisine for _, cuisine, _ in vendors],
+            "area": [area for _, _, area in vendors],
+            "rating": rng.uniform(3.6, 4.9, len(vendors)).round(2),
+            "join_date": days_before(len(vendors), 730),
+        }),
+    }
+
+
+def build_dataset(path: str, n: int, seed: int = 101, customers: int = None, drivers: int = 50) -> float:
+    """Write an n-order SQLite dataset to `path` unless a complete one is there; returns build seconds."""
+    if os.path.exists(path):
+        with contextlib.closing(sqlite3.connect(path)) as conn:
+            done = conn.execute("SELECT name FROM sqlite_master WHERE name = 'bench_meta'").fetchone()
+            if done and conn.execute("SELECT orders FROM bench_meta").fetchone()[0] == n:
+                return 0.0
+        os.remove(path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    start = time.perf_counter()
+    customers = customers or max(500, n // 20)
+    dims = _dimensions(np.random.default_rng(seed), customers, drivers)
+    vendor_meta = list(dims["vendors"][["vendor_id", "cuisine", "area"]].itertuples(index=False, name=None))
+    with contextlib.closing(sqlite3.connect(path)) as conn:
+        for table, frame in dims.items():
+            frame.to_sql(table, conn, index=False)
+        conn.execute(f"CREATE TABLE orders (order_id INTEGER PRIMARY KEY, {', '.join(ORDER_COLUMNS)})")
+        insert = f"INSERT INTO orders VALUES ({', '.join('?' * (len(ORDER_COLUMNS) + 1))})"
+        next_id = 1
+        for _, block in order_blocks(n, dims["customers"]["customer_id"].to_numpy(),
+                                     dims["drivers"]["driver_id"].to_numpy(), vendor_meta, seed=seed,
+                                     base_date=BASE_DATE, areas=BAGHDAD_AREAS, days=HISTORY_DAYS):
+            block.insert(0, "order_id", np.arange(next_id, next_id + len(block)))
+            block["order_datetime"] = block["order_datetime"].dt.strftime("%Y-%m-%d %H:%M:%S")
+            block["driver_rating"] = block["driver_rating"].astype(object).where(block["driver_rating"].notna(), None)
+            conn.executemany(insert, block.itertuples(index=False, name=None))
+            conn.commit()
+            next_id += len(block)
+        for name, column in ORDER_INDEXES.items():
+            conn.execute(f"CREATE INDEX {name} ON orders({column})")
+        conn.execute("CREATE TABLE bench_meta (orders INTEGER, seed INTEGER, built TEXT)")
+        conn.execute("INSERT INTO bench_meta VALUES (?, ?, ?)", (n, seed, datetime.now().isoformat(timespec="seconds")))
+        conn.commit()
+    return time.perf_counter() - start
+
+
+# --------------------------
+# Runs
+# --------------------------
+def _run(path: str, mode: str, outputs, chunksize: int, workers: int, out):
+    from sqlalchemy import create_engine
+
+    from analysis import Analysis
+    from run_report import RunReport
+
+    engine = create_engine(f"sqlite:///{os.path.abspath(path)}")
+    report = RunReport(engine)
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        analysis = Analysis(engine, mode=mode, outputs=outputs, chunksize=chunksize, workers=workers,
+                            state_path=os.path.join(tmp, "kpi_state.pkl"),
+                            cohort_state_path=os.path.join(tmp, "cohort_state.pkl"),
+                            report=report, out_dir=tmp, fig_dir=tmp)
+        analysis.run(figures=False)
+        report.finish()
+    out.put(report.as_dict())
+
+
+def run_once(path: str, mode: str, outputs=None, chunksize: int = None, workers: int = None) -> dict:
+    """One analysis run in a fresh process: its RunReport as a dict."""
+    from streaming import DEFAULT_CHUNKSIZE
+
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(target=_run, args=(path, mode, outputs, chunksize or DEFAULT_CHUNKSIZE, workers, out))
+    proc.start()
+    result = out.get()
+    proc.join()
+    return result
+
+
+def _summarize(n: int, mode: str, report: dict) -> dict:
+    keep = ("name", "wall_seconds", "cpu_seconds", "db_seconds", "db_queries", "rss_delta_mb",
+            "peak_rss_growth_mb", "rows_in", "rows_out")
+    return {
+        "orders": n, "mode": mode,
+        "wall_seconds": report["wall_seconds"], "cpu_seconds": report["cpu_seconds"],
+        "db_seconds": report["db_seconds"], "peak_rss_mb": report["peak_rss_mb"],
+        "stages": [{k: s[k] for k in keep} for s in report["stages"]],
+    }
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes=DEFAULT_SIZES, modes=DEFAULT_MODES, outputs=None, repeat: int = 1, seed: int = 101,
+              data_dir: str = DEFAULT_DATA_DIR, chunksize: int = None, workers: int = None) -> dict:
+    """Build (or reuse) the datasets and run every mode on every size; the best of `repeat` runs is kept."""
+    results = {
+        "suite_version": SUITE_VERSION,
+        "meta": {
+            "started": datetime.now().isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "machine": platform.machine(), "cpus": os.cpu_count(),
+            "seed": seed, "outputs": outputs,
+        },
+        "datasets": {},
+        "runs": [],
+    }
+    for n in sizes:
+        path = dataset_path(data_dir, n, seed)
+        results["datasets"][str(n)] = {"path": path, "build_seconds": build_dataset(path, n, seed)}
+        for mode in modes:
+            reports = [run_once(path, mode, outputs, chunksize, workers) for _ in range(repeat)]
+            run = _summarize(n, mode, min(reports, key=lambda r: r["wall_seconds"]))
+            results["runs"].append(run)
+            print(f"{n:>12,} {mode:<12} {run['wall_seconds']:>9.2f}s  peak {run['peak_rss_mb']:>8.0f} MB")
+    return results
+
+
+# --------------------------
+# Comparison
+# --------------------------
+def compare(baseline: dict, current: dict, tolerance: float = DEFAULT_TOLERANCE) -> list:
+    """Print stage/total ratios for the runs both files have; return the regressions found."""
+    base_runs = {(r["orders"], r["mode"]): r for r in baseline["runs"]}
+    regressions = []
+    print(f"\n{'orders':>12} {'mode':<12} {'stage':<36} {'base s':>9} {'new s':>9} {'ratio':>7}")
+    for run in current["runs"]:
+        base = base_runs.get((run["orders"], run["mode"]))
+        if base is None:
+            continue
+        base_stages = {s["name"]: s["wall_seconds"] for s in base["stages"]}
+        rows = [(s["name"], base_stages.get(s["name"]), s["wall_seconds"]) for s in run["stages"]]
+        rows.append(("total", base["wall_seconds"], run["wall_seconds"]))
+        rows.append(("peak RSS (MB)", base["peak_rss_mb"], run["peak_rss_mb"]))
+        for name, old, new in rows:
+            if old is None:
+                continue
+            ratio = new / old if old else float("inf")
+            slower = ratio > 1 + tolerance and (old >= MIN_SECONDS or name == "peak RSS (MB)")
+            if slower:
+                regressions.append({"orders": run["orders"], "mode": run["mode"], "stage": name,
+                                    "baseline": old, "current": new, "ratio": ratio})
+            print(f"{run['orders']:>12,} {run['mode']:<12} {name[:35]:<36} {old:>9.3f} {new:>9.3f} "
+                  f"{ratio:>6.2f}x{'  REGRESSION' if slower else ''}")
+    return regressions
+
+
+def main():
+    from analysis import MODES, OUTPUTS
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[2])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(DEFAULT_MODES))
+    parser.add_argument("--outputs", nargs="+", choices=list(OUTPUTS), default=None,
+                        help="only run these analysis outputs (default: all)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per (size, mode); the fastest is kept")
+    parser.add_argument("--seed", type=int, default=101)
+    parser.add_argument("--chunksize", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="processes for --modes parallel")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="where generated datasets are kept")
+    parser.add_argument("--out", default=None,
+                        help=f"results file (default: {DEFAULT_RESULTS_DIR}/<revision or time>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", default=None,
+                        help="compare with an earlier results file; exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown (and peak RSS growth) before a stage counts as a regression")
+    args = parser.parse_args()
+
+    print(f"{'orders':>12} {'mode':<12} {'wall':>10}")
+    results = run_suite(args.sizes, args.modes, args.outputs, args.repeat, args.seed, args.data_dir,
+                        args.chunksize, args.workers)
+    path = args.out or os.path.join(
+        DEFAULT_RESULTS_DIR, f"{results['meta']['revision'] or datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results: {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        if regressions:
+            raise SystemExit(f"{len(regressions)} regression(s) against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+bench_topk.py
+Benchmark: top-K per group by full sort (sort_values + groupby().head(k), as
+the original peak-hour / top-vendor tables did) vs ranking.top_k, on
+per-group order counts at increasing group cardinality (driver x area
+with many drivers). Both sides break ties the same way and the rows they
+pick are checked to be identical.
+
+    python -m benchmarks.bench_topk --groups 10000 100000 1000000 --k 1 3 10
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_groupby import AREAS, timed
+from ranking import top_k
+
+
+def make_counts(n_groups: int, per_group: int = 24, seed: int = 101) -> pd.DataFrame:
+    """Order counts per (driver, area, hour): `n_groups` driver x area groups of `per_group` rows."""
+    rng = np.random.default_rng(seed)
+    n_drivers = max(1, n_groups // len(AREAS))
+    group = np.repeat(np.arange(n_drivers * len(AREAS)), per_group)
+    return pd.DataFrame({
+        "driver_id": group // len(AREAS) + 1,
+        "area": pd.Categorical(np.asarray(AREAS)[group % len(AREAS)]),
+        "hour": np.tile(np.arange(per_group) % 24, n_drivers * len(AREAS)),
+        "orders": rng.poisson(20, len(group)),   # small counts: plenty of ties
+    }).sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+def legacy(counts, k):
+    return (counts.sort_values(["driver_id", "area", "orders", "hour"], ascending=[True, True, False, True],
+                               kind="stable")
+            .groupby(["driver_id", "area"], observed=True).head(k))
+
+
+def engine(counts, k):
+    return top_k(counts, ["orders", "hour"], k=k, by=["driver_id", "area"], ascending=[False, True])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[2])
+    parser.add_argument("--groups", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 10])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'groups':>12} {'rows':>12} {'k':>4} {'sort s':>9} {'top_k s':>9} {'speedup':>8}")
+    for n_groups in args.groups:
+        counts = make_counts(n_groups)
+        for k in args.k:
+            if not legacy(counts, k).index.equals(engine(counts, k).index):
+                raise AssertionError(f"top_k disagrees with the sort at groups={n_groups}, k={k}")
+            t_legacy = timed(legacy, counts, k, repeat=args.repeat)
+            t_engine = timed(engine, counts, k, repeat=args.repeat)
+            print(f"{n_groups:>12,} {len(counts):>12,} {k:>4} {t_legacy:>9.3f} {t_engine:>9.3f} "
+                  f"{t_legacy / t_engine:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+bulk_load.py
+Bulk loading of generated orders into MySQL.
+Each generated block is written either as a TSV file loaded with
+LOAD DATA LOCAL INFILE (when the server allows it) or as multi-row INSERT
+statements of `batch_rows` rows, and committed once per block. Blocks can
+be spread over several writer connections. The secondary idx_orders_*
+indexes are dropped before the load and rebuilt once at the end, and
+unique/foreign key checks are off in the writer sessions.
+
+Every committed block is recorded in `seed_progress` in the same
+transaction as its rows. A later `--resume` reads the run's parameters
+from that table and regenerates only the missing blocks; the generator
+is block-deterministic, so the finished table is the same as an
+uninterrupted load.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import mysql.connector
+
+from order_generator import BAGHDAD_AREAS, HISTORY_DAYS, ORDER_COLUMNS, block_seeds, order_block
+
+DEFAULT_BATCH_ROWS = 5_000
+# Mirrors schema_baghdad.sql; rebuilt after the load.
+ORDER_INDEXES = {
+    "idx_orders_datetime": "order_datetime",
+    "idx_orders_driver": "driver_id",
+    "idx_orders_vendor": "vendor_id",
+    "idx_orders_droparea": "dropoff_area",
+}
+ER_DROP_INDEX_FK = 1553  # index still needed by a foreign key
+
+PROGRESS_DDL = """
+CREATE TABLE IF NOT EXISTS seed_progress (
+  block INT PRIMARY KEY,
+  rows_loaded INT NOT NULL,
+  orders INT NOT NULL,
+  seed INT NOT NULL,
+  block_size INT NOT NULL,
+  base_date DATETIME NOT NULL,
+  loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+PROGRESS_INSERT = """
+INSERT INTO seed_progress (block, rows_loaded, orders, seed, block_size, base_date)
+VALUES (%s,%s,%s,%s,%s,%s)
+"""
+
+LOAD_DATA = f"""
+LOAD DATA LOCAL INFILE %s INTO TABLE orders
+CHARACTER SET utf8mb4
+FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n'
+({", ".join(ORDER_COLUMNS)})
+"""
+
+
+# -----------------------------
+# Indexes and progress
+# -----------------------------
+def _existing_indexes(cur) -> set:
+    cur.execute(
+        "SELECT DISTINCT index_name FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = 'orders'"
+    )
+    return {r[0] for r in cur.fetchall()}
+
+
+def drop_order_indexes(cur) -> list:
+    """Drop the secondary order indexes; returns the ones dropped.
+
+    An index MySQL needs for a foreign key cannot be dropped and is kept.
+    """
+    dropped = []
+    for name in ORDER_INDEXES:
+        if name not in _existing_indexes(cur):
+            continue
+        try:
+            cur.execute(f"DROP INDEX {name} ON orders")
+            dropped.append(name)
+        except mysql.connector.Error as e:
+            if e.errno != ER_DROP_INDEX_FK:
+                raise
+    return dropped
+
+
+def create_order_indexes(cur) -> list:
+    """Create whichever secondary order indexes are missing; returns them."""
+    missing = [n for n in ORDER_INDEXES if n not in _existing_indexes(cur)]
+    for name in missing:
+        cur.execute(f"CREATE INDEX {name} ON orders({ORDER_INDEXES[name]})")
+    return missing
+
+
+def load_progress(cur) -> tuple:
+    """(run parameters, set of finished blocks) from seed_progress; (None, set()) if empty."""
+    cur.execute(PROGRESS_DDL)
+    cur.execute("SELECT block, rows_loaded, orders, seed, block_size, base_date FROM seed_progress")
+    rows = cur.fetchall()
+    if not rows:
+        return None, set()
+    params = {(r[2], r[3], r[4], r[5]) for r in rows}
+    if len(params) > 1:
+        raise RuntimeError("seed_progress mixes several runs; clear it before resuming")
+    orders, seed, block_size, base_date = params.pop()
+    return dict(orders=orders, seed=seed, block_size=block_size, base_date=base_date), {r[0] for r in rows}
+
+
+def reset_progress(cur):
+    cur.execute(PROGRESS_DDL)
+    cur.execute("DELETE FROM seed_progress")
+
+
+# -----------------------------
+# Writers
+# -----------------------------
+def local_infile_enabled(cur) -> bool:
+    cur.execute("SHOW VARIABLES LIKE 'local_infile'")
+    row = cur.fetchone()
+    return bool(row) and str(row[1]).upper() in ("ON", "1")
+
+
+def write_tsv(block, path: str):
+    """One block as a LOAD DATA file: tab separated, NULL as \\N."""
+    block.to_csv(path, sep="\t", header=False, index=False, na_rep="\\N",
+                 date_format="%Y-%m-%d %H:%M:%S", lineterminator="\n", columns=ORDER_COLUMNS)
+
+
+def _load_data(cur, block, tmp_dir: str, index: int):
+    path = os.path.join(tmp_dir, f"orders-{index:06d}.tsv")
+    write_tsv(block, path)
+    try:
+        cur.execute(LOAD_DATA, (path,))
+    finally:
+        os.remove(path)
+
+
+def order_rows(block):
+    """Python-native row tuples for the driver (NaN ratings become NULL)."""
+    stamps = block["order_datetime"].dt.to_pydatetime()
+    block = block[ORDER_COLUMNS].astype(object).where(block[ORDER_COLUMNS].notna(), None)
+    block["order_datetime"] = stamps
+    return list(block.itertuples(index=False, name=None))
+
+
+def _multi_insert(cur, block, batch_rows: int):
+    rows = order_rows(block)
+    row_sql = "(" + ",".join(["%s"] * len(ORDER_COLUMNS)) + ")"
+    head = f"INSERT INTO orders ({', '.join(ORDER_COLUMNS)}) VALUES "
+    for start in range(0, len(rows), batch_rows):
+        batch = rows[start:start + batch_rows]
+        cur.execute(head + ",".join([row_sql] * len(batch)), [v for row in batch for v in row])
+
+
+def _bulk_session(cur):
+    cur.execute("SET SESSION unique_checks = 0")
+    cur.execute("SET SESSION foreign_key_checks = 0")
+
+
+# -----------------------------
+# Load
+# -----------------------------
+def load_orders(connect, n: int, customer_ids, driver_ids, vendor_meta, seed: int, base_date,
+                block_size: int, method: str = "auto", batch_rows: int = DEFAULT_BATCH_ROWS,
+                workers: int = 1, resume: bool = False, defer_indexes: bool = True, areas=BAGHDAD_AREAS) -> dict:
+    """Generate and load `n` orders; returns a summary (rows, seconds, rows/sec, method).
+
+    `connect(**kwargs)` opens a mysql.connector connection. `method` is
+    "load-data", "insert" or "auto" (LOAD DATA if the server enables
+    local_infile). With `resume`, the run parameters stored in
+    seed_progress override n/seed/block_size/base_date.
+    """
+    conn = connect(allow_local_infile=True)
+    cur = conn.cursor()
+    if resume:
+        params, done_blocks = load_progress(cur)
+        if params is None:
+            print("resume: no progress recorded, starting a fresh load")
+        else:
+            n, seed, block_size, base_date = params["orders"], params["seed"], params["block_size"], params["base_date"]
+            print(f"resume: {len(done_blocks)} blocks already loaded")
+    else:
+        reset_progress(cur)
+        done_blocks = set()
+    conn.commit()
+    if base_date is None:
+        base_date = datetime.now() - timedelta(days=HISTORY_DAYS)
+
+    if method == "auto":
+        method = "load-data" if local_infile_enabled(cur) else "insert"
+    dropped = drop_order_indexes(cur) if defer_indexes else []
+    if dropped:
+        print(f"deferred indexes: {', '.join(dropped)}")
+
+    seeds = block_seeds(n, seed, block_size)
+    pending = iter([i for i in range(len(seeds)) if i not in done_blocks])
+    lock = threading.Lock()
+    state = {"rows": 0, "start": time.perf_counter()}
+    remaining = n - sum(min(block_size, n - b * block_size) for b in done_blocks)
+
+    def write(worker_conn, worker_cur, tmp_dir, index, block):
+        if method == "load-data":
+            _load_data(worker_cur, block, tmp_dir, index)
+        else:
+            _multi_insert(worker_cur, block, batch_rows)
+        worker_cur.execute(PROGRESS_INSERT, (index, len(block), n, seed, block_size, base_date))
+        worker_conn.commit()
+        with lock:
+            state["rows"] += len(block)
+            elapsed = time.perf_counter() - state["start"]
+            print(f"orders: {state['rows']}/{remaining} ({state['rows'] / elapsed:,.0f} rows/sec, {method})")
+
+    def worker():
+        worker_conn = connect(allow_local_infile=True)
+        worker_cur = worker_conn.cursor()
+        _bulk_session(worker_cur)
+        try:
+            with tempfile.TemporaryDirectory(prefix="orders-load-") as tmp_dir:
+                while True:
+                    # only the block index is handed out under the lock; each block is
+                    # seeded by its own SeedSequence child, so generation runs in parallel
+                    with lock:
+                        index = next(pending, None)
+                    if index is None:
+                        return
+                    block = order_block(index, seeds, n, customer_ids, driver_ids, vendor_meta, base_date,
+                                        block_size, areas)
+                    write(worker_conn, worker_cur, tmp_dir, index, block)
+        finally:
+            worker_cur.close()
+            worker_conn.close()
+
+    if workers <= 1:
+        worker()
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for f in [pool.submit(worker) for _ in range(workers)]:
+                f.result()
+    load_seconds = time.perf_counter() - state["start"]
+
+    created = create_order_indexes(cur)
+    if created:
+        print(f"indexes rebuilt in {time.perf_counter() - state['start'] - load_seconds:,.1f}s")
+    conn.commit()
+    cur.close()
+    conn.close()
+    return {
+        "rows": state["rows"],
+        "seconds": load_seconds,
+        "rows_per_sec": state["rows"] / load_seconds if load_seconds else 0.0,
+        "method": method,
+    }
@@ -0,0 +1,82 @@
+"""
+calendar_dim.py
+Calendar dimension for order feature engineering.
+Every order_datetime becomes an integer day number (days since
+1970-01-01) and an hour with two integer ops; date, day of week, ISO week,
+month and the weekend flag are then looked up by position in a small
+calendar table with one row per day, built once per date range and
+weekend definition. Day names and months come back as categoricals, so no
+per-order Python strings are created.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+DOW_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+# Iraq's official weekend; pass another tuple of day names to change it.
+IRAQ_WEEKEND = ("Friday", "Saturday")
+FEATURES = ("day", "date", "hour", "dow", "week", "month", "is_weekend")
+
+
+@lru_cache(maxsize=8)
+def build_calendar(first_day: int, last_day: int, weekend=IRAQ_WEEKEND) -> pd.DataFrame:
+    """One row per day number in [first_day, last_day], in order.
+
+    Columns: date, dow (0 = Monday), dow_name, iso_year, week, month
+    ("YYYY-MM", categorical) and is_weekend.
+    """
+    unknown = set(weekend) - set(DOW_NAMES)
+    if unknown:
+        raise ValueError(f"unknown weekend day names: {sorted(unknown)}")
+    days = np.arange(first_day, last_day + 1)
+    dates = pd.DatetimeIndex(days.astype("datetime64[D]"))
+    iso = dates.isocalendar()
+    dow = dates.dayofweek.to_numpy().astype("int8")
+    weekend_codes = [DOW_NAMES.index(d) for d in weekend]
+    return pd.DataFrame({
+        "date": dates,
+        "dow": dow,
+        "dow_name": pd.Categorical.from_codes(dow, categories=DOW_NAMES),
+        "iso_year": iso["year"].to_numpy().astype("int16"),
+        "week": iso["week"].to_numpy().astype("int8"),
+        "month": pd.Categorical(dates.strftime("%Y-%m")),
+        "is_weekend": np.isin(dow, weekend_codes),
+    }, index=pd.Index(days, name="day"))
+
+
+def day_numbers(values) -> tuple:
+    """(day number int32, hour int8) for datetime-like `values`."""
+    seconds = np.asarray(values, dtype="datetime64[s]").astype("int64")
+    day = np.floor_divide(seconds, 86_400)
+    return day.astype("int32"), ((seconds - day * 86_400) // 3_600).astype("int8")
+
+
+def add_calendar_features(frame: pd.DataFrame, column: str = "order_datetime",
+                          weekend=IRAQ_WEEKEND, features=FEATURES) -> pd.DataFrame:
+    """Add the requested calendar `features` of `column` to `frame` in place.
+
+    day (int32), date (datetime64), hour (int8), dow (day-name categorical),
+    week (ISO week, int8), month (categorical "YYYY-MM"), is_weekend (bool).
+    """
+    day, hour = day_numbers(frame[column])
+    if not len(day):
+        first = last = 0
+    else:
+        first, last = int(day.min()), int(day.max())
+    cal = build_calendar(first, last, tuple(weekend))
+    pos = day - first
+    lookups = {
+        "day": lambda: day,
+        "date": lambda: cal["date"].to_numpy()[pos],
+        "hour": lambda: hour,
+        "dow": lambda: pd.Categorical.from_codes(cal["dow"].to_numpy()[pos], categories=DOW_NAMES),
+        "week": lambda: cal["week"].to_numpy()[pos],
+        "month": lambda: pd.Categorical.from_codes(cal["month"].cat.codes.to_numpy()[pos],
+                                                   categories=cal["month"].cat.categories),
+        "is_weekend": lambda: cal["is_weekend"].to_numpy()[pos],
+    }
+    for name in features:
+        frame[name] = lookups[name]()
+    return frame
@@ -0,0 +1,361 @@
+"""
+cohorts.py
+Customer cohorts, retention, time between orders and RFM scores.
+Per-customer state (first-order month, last order time, order count,
+revenue) lives in plain arrays indexed by customer_id, so it costs a few
+bytes per customer and every update is vectorized: a chunk is sorted
+once by (customer, time) and reduced per customer segment. Retention is
+counted as it streams, as distinct active customers per (cohort month,
+activity month), for first-order cohorts and for signup-month cohorts.
+
+Orders must be folded in time order across updates (the rows inside one
+chunk may come in any order), which is what an ordered scan or an
+incremental refresh past a watermark gives. A chunk that reaches back
+before a customer's last folded order raises ValueError: rebuild the
+state from scratch instead. The same state can also be built in one step
+from per-(customer, month) aggregates and a gap histogram
+(`from_customer_months`), which is how sql_backend.py pushes it down.
+
+    cohorts = CohortEngine(customers)
+    for chunk in chunks: cohorts.update(chunk)
+    cohorts.retention()          # cohort x months-since-first-order, share of the cohort active
+    cohorts.rfm_segments()
+"""
+
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from streaming import DEFAULT_CHUNKSIZE, REVENUE_COLUMNS, as_float64, iter_orders
+
+COHORT_COLUMNS = ["order_id", "customer_id", "order_datetime", *REVENUE_COLUMNS]
+DEFAULT_COHORT_STATE_PATH = os.path.join("state", "cohort_state.pkl")
+COHORT_STATE_VERSION = 1
+CUSTOMER_MONTH_COLUMNS = ["customer_id", "month", "orders", "revenue", "first_order", "last_order"]
+GAP_MAX_DAYS = 90      # gaps of 90+ days share the last histogram bin
+RFM_BINS = 5           # quintile scores 1..5
+# (segment, R scores, F scores): the first match wins, anything else "Needs attention"
+RFM_SEGMENTS = [
+    ("Champions",   (4, 5), (4, 5)),
+    ("Loyal",       (3, 5), (3, 5)),
+    ("New",         (4, 5), (1, 1)),
+    ("Promising",   (4, 5), (2, 2)),
+    ("At risk",     (1, 2), (3, 5)),
+    ("Hibernating", (1, 2), (1, 2)),
+]
+SEGMENT_NAMES = [name for name, _, _ in RFM_SEGMENTS] + ["Needs attention"]
+_NONE = -1
+_SECONDS_PER_DAY = 86_400
+
+
+def _months(seconds: np.ndarray) -> np.ndarray:
+    """Months since 1970-01 for epoch seconds, looked up per day like calendar_dim does."""
+    day = seconds // _SECONDS_PER_DAY
+    if not len(day):
+        return day
+    first = int(day.min())
+    table = np.arange(first, int(day.max()) + 1).astype("datetime64[D]").astype("datetime64[M]").astype("int64")
+    return table[day - first]
+
+
+def _month_labels(months) -> list:
+    return [str(np.datetime64(int(m), "M")) for m in months]
+
+
+def _score(values: np.ndarray, higher_is_better: bool = True) -> np.ndarray:
+    """Quantile score 1..RFM_BINS from one sort; equal values share a score."""
+    values = values if higher_is_better else -values
+    order = np.argsort(values, kind="stable")
+    ranked = values[order]
+    # rows below each value = position of the first of its run of equal values
+    starts = np.flatnonzero(np.r_[True, ranked[1:] != ranked[:-1]]) if len(ranked) else np.empty(0, dtype="int64")
+    below = np.empty(len(values), dtype="int64")
+    below[order] = np.repeat(starts, np.diff(np.r_[starts, len(ranked)]))
+    return (1 + below * RFM_BINS // max(len(values), 1)).astype("int8")
+
+
+class CohortEngine:
+    """Cohort, retention, order-gap and RFM state folded over delivered orders in time order."""
+
+    def __init__(self, customers: pd.DataFrame = None):
+        self.first_month = np.empty(0, dtype="int32")
+        self.last_seen = np.empty(0, dtype="int64")   # epoch seconds of the latest order
+        self.orders = np.empty(0, dtype="int32")
+        self.revenue = np.empty(0, dtype="float64")
+        self.signup_month = np.empty(0, dtype="int32")
+        self.cells = pd.DataFrame(columns=["customers", "orders", "revenue"],
+                                  index=pd.MultiIndex.from_arrays([[], []], names=["cohort", "month"]))
+        self.signup_cells = pd.Series(dtype="int64", name="customers",
+                                      index=pd.MultiIndex.from_arrays([[], []], names=["cohort", "month"]))
+        self.gap_hist = np.zeros(GAP_MAX_DAYS + 1, dtype="int64")
+        self.watermark = None
+        self.watermark_ids = set()  # order_ids already folded at exactly `watermark`
+        if customers is not None:
+            self.set_signups(customers)
+
+    def _grow(self, size: int):
+        if size <= len(self.orders):
+            return
+        grow = size - len(self.orders)
+        self.first_month = np.concatenate([self.first_month, np.full(grow, _NONE, dtype="int32")])
+        self.last_seen = np.concatenate([self.last_seen, np.full(grow, _NONE, dtype="int64")])
+        self.orders = np.concatenate([self.orders, np.zeros(grow, dtype="int32")])
+        self.revenue = np.concatenate([self.revenue, np.zeros(grow)])
+        self.signup_month = np.concatenate([self.signup_month, np.full(grow, _NONE, dtype="int32")])
+
+    def set_signups(self, customers: pd.DataFrame):
+        """Take (or refresh) each customer's signup month from the customers dimension."""
+        ids = customers["customer_id"].to_numpy("int64")
+        if not len(ids):
+            return
+        self._grow(int(ids.max()) + 1)
+        signup = pd.to_datetime(customers["signup_date"]).to_numpy("datetime64[s]").astype("int64")
+        self.signup_month[ids] = _months(signup)
+
+    # ---- folding orders ----
+    def update(self, chunk: pd.DataFrame):
+        """Fold a chunk of orders (delivered ones count) that is not older than what was folded so far."""
+        if "status" in chunk:
+            chunk = chunk[chunk["status"] == "delivered"]
+        if not len(chunk):
+            return
+        revenue = chunk["revenue"] if "revenue" in chunk else sum(as_float64(chunk[c]) for c in REVENUE_COLUMNS)
+        cust = chunk["customer_id"].to_numpy("int64")
+        ts = chunk["order_datetime"].to_numpy("datetime64[s]").astype("int64")
+        self._grow(int(cust.max()) + 1)
+
+        # sort once by (customer, time); every per-customer step is then a segment reduction.
+        # Ordered scans deliver time-sorted chunks, where a stable sort on the customer is enough.
+        order = np.argsort(cust, kind="stable") if (np.diff(ts) >= 0).all() else np.lexsort((ts, cust))
+        cust, ts, revenue = cust[order], ts[order], np.asarray(revenue, dtype="float64")[order]
+        starts = np.flatnonzero(np.r_[True, cust[1:] != cust[:-1]])
+        seg_cust = cust[starts]
+        lengths = np.diff(np.r_[starts, len(cust)])
+
+        prev = np.r_[_NONE, ts[:-1]]
+        prev[starts] = self.last_seen[seg_cust]
+        known = prev != _NONE
+        if (ts[known] < prev[known]).any():
+            raise ValueError("orders folded out of time order; rebuild the cohort state from scratch")
+        gaps = (ts[known] - prev[known]) // _SECONDS_PER_DAY
+        self.gap_hist += np.bincount(np.minimum(gaps, GAP_MAX_DAYS), minlength=GAP_MAX_DAYS + 1)
+
+        month = _months(ts)
+        active = ~known | (month != _months(np.where(known, prev, 0)))  # first order of the customer this month
+        first = self.first_month[seg_cust]
+        first = np.where(first == _NONE, month[starts], first)
+        self.first_month[seg_cust] = first
+        cohort = np.repeat(first, lengths)
+
+        part = (pd.DataFrame({"cohort": cohort, "month": month, "customers": active, "orders": 1, "revenue": revenue})
+                .groupby(["cohort", "month"]).sum())
+        self.cells = part if self.cells.empty else self.cells.add(part, fill_value=0)
+        signup = self.signup_month[cust]
+        hit = active & (signup != _NONE)
+        part = pd.Series(1, index=pd.MultiIndex.from_arrays([signup[hit], month[hit]], names=["cohort", "month"]))
+        part = part.groupby(level=[0, 1]).sum()
+        self.signup_cells = part if self.signup_cells.empty else self.signup_cells.add(part, fill_value=0)
+
+        self.orders[seg_cust] += lengths.astype("int32")
+        self.revenue[seg_cust] += np.add.reduceat(revenue, starts)
+        self.last_seen[seg_cust] = ts[starts + lengths - 1]
+        self._advance_watermark(chunk)
+
+    @classmethod
+    def from_customer_months(cls, frame: pd.DataFrame, gap_hist, customers: pd.DataFrame = None,
+                             watermark_ids=()) -> "CohortEngine":
+        """State for the delivered orders summarized by `frame`, one row per
+        (customer_id, month "YYYY-MM") with orders, revenue, first_order and
+        last_order, and `gap_hist`, the orders per whole day since the customer's
+        previous order (GAP_MAX_DAYS and longer in the last bin)."""
+        cohorts = cls(customers)
+        gap_hist = np.asarray(gap_hist, dtype="int64")
+        cohorts.gap_hist[:len(gap_hist)] += gap_hist
+        if not len(frame):
+            return cohorts
+        cust = frame["customer_id"].to_numpy("int64")
+        period = pd.PeriodIndex(frame["month"].astype(str), freq="M")
+        month = (period.year.to_numpy() - 1970) * 12 + period.month.to_numpy() - 1
+        cohorts._grow(int(cust.max()) + 1)
+        first = np.full(len(cohorts.orders), np.iinfo("int32").max, dtype="int64")
+        np.minimum.at(first, cust, month)
+        seen = first != np.iinfo("int32").max
+        cohorts.first_month[seen] = first[seen]
+        cohort = cohorts.first_month[cust]
+        revenue = pd.to_numeric(frame["revenue"]).to_numpy("float64")
+        orders = frame["orders"].to_numpy("int64")
+        cohorts.cells = (pd.DataFrame({"cohort": cohort, "month": month, "customers": 1,
+                                       "orders": orders, "revenue": revenue})
+                         .groupby(["cohort", "month"]).sum())
+        signup = cohorts.signup_month[cust]
+        hit = signup != _NONE
+        cohorts.signup_cells = (pd.Series(1, index=pd.MultiIndex.from_arrays([signup[hit], month[hit]],
+                                                                             names=["cohort", "month"]))
+                                .groupby(level=[0, 1]).sum())
+        np.add.at(cohorts.orders, cust, orders.astype("int32"))
+        np.add.at(cohorts.revenue, cust, revenue)
+        last = pd.to_datetime(frame["last_order"]).to_numpy("datetime64[s]").astype("int64")
+        np.maximum.at(cohorts.last_seen, cust, last)
+        cohorts.watermark = pd.to_datetime(frame["last_order"]).max()
+        cohorts.watermark_ids = set(watermark_ids)
+        return cohorts
+
+    def _advance_watermark(self, chunk: pd.DataFrame):
+        latest = chunk["order_datetime"].max()
+        if self.watermark is None or latest > self.watermark:
+            self.watermark, self.watermark_ids = latest, set()
+        if "order_id" in chunk and latest == self.watermark:
+            self.watermark_ids.update(chunk.loc[chunk["order_datetime"] == latest, "order_id"].tolist())
+
+    # ---- results ----
+    def _matrix(self, cells: pd.Series, sizes: pd.Series, rate: bool) -> pd.DataFrame:
+        if cells.empty:
+            return pd.DataFrame()
+        cohort = cells.index.get_level_values("cohort").to_numpy()
+        offset = cells.index.get_level_values("month").to_numpy() - cohort
+        table = pd.Series(cells.to_numpy(), index=pd.MultiIndex.from_arrays([cohort, offset])).unstack(fill_value=0)
+        table = table.loc[:, table.columns >= 0]
+        if rate:
+            table = table.div(sizes.reindex(table.index), axis=0).round(4)
+        table.insert(0, "cohort_size", sizes.reindex(table.index).fillna(0).astype("int64"))
+        table.index = pd.Index(_month_labels(table.index), name="cohort")
+        table.columns = ["cohort_size"] + [f"m{int(c)}" for c in table.columns[1:]]
+        return table
+
+    def _first_order_sizes(self) -> pd.Series:
+        # customers active in their cohort month = customers whose first order fell in it
+        cells = self.cells["customers"]
+        at_start = cells.index.get_level_values("cohort") == cells.index.get_level_values("month")
+        return cells[at_start].droplevel("month").astype("int64")
+
+    def retention(self, by: str = "first_order", rate: bool = True) -> pd.DataFrame:
+        """Cohort month x months since the cohort month: the share (or count) of the cohort active.
+
+        `by="first_order"` groups customers by the month of their first delivered order;
+        `by="signup"` by signup month, with every signed-up customer in the cohort size.
+        """
+        if by == "first_order":
+            cells, sizes = self.cells["customers"], self._first_order_sizes()
+        elif by == "signup":
+            cells = self.signup_cells
+            sizes = pd.Series(self.signup_month[self.signup_month != _NONE]).value_counts()
+        else:
+            raise ValueError(f"by must be 'first_order' or 'signup', got {by!r}")
+        return self._matrix(cells.astype("int64"), sizes, rate)
+
+    def cohort_revenue(self) -> pd.DataFrame:
+        """Revenue per first-order cohort and months since the first order."""
+        return self._matrix(self.cells["revenue"].round(2), self._first_order_sizes(), rate=False)
+
+    def order_gaps(self) -> pd.DataFrame:
+        """Distribution of whole days between a customer's consecutive orders."""
+        total = self.gap_hist.sum()
+        gaps = pd.DataFrame({"days": np.arange(GAP_MAX_DAYS + 1), "orders": self.gap_hist})
+        gaps["share"] = (gaps["orders"] / total).round(4) if total else 0.0
+        gaps["cumulative_share"] = (gaps["orders"].cumsum() / total).round(4) if total else 0.0
+        return gaps
+
+    def gap_quantile(self, q: float) -> float:
+        """Days between consecutive orders at quantile `q` (whole days; NaN without repeat orders)."""
+        cum = np.cumsum(self.gap_hist)
+        return float(np.searchsorted(cum, q * cum[-1], side="left")) if cum[-1] else np.nan
+
+    def rfm(self, as_of=None) -> pd.DataFrame:
+        """Recency/frequency/monetary values, 1-5 quantile scores and segment per ordering customer.
+
+        Recency is in days before `as_of` (default: the latest folded order).
+        """
+        ids = np.flatnonzero(self.orders > 0)
+        as_of = pd.Timestamp(as_of if as_of is not None else self.watermark)
+        recency = (as_of.to_datetime64().astype("datetime64[s]").astype("int64") - self.last_seen[ids]) \
+            // _SECONDS_PER_DAY
+        out = pd.DataFrame({
+            "customer_id": ids,
+            "recency_days": recency,
+            "frequency": self.orders[ids],
+            "monetary": self.revenue[ids].round(2),
+        })
+        out["r"] = _score(out["recency_days"].to_numpy(), higher_is_better=False)
+        out["f"] = _score(out["frequency"].to_numpy())
+        out["m"] = _score(out["monetary"].to_numpy())
+        r, f = out["r"].to_numpy(), out["f"].to_numpy()
+        codes = np.select([(r >= r_lo) & (r <= r_hi) & (f >= f_lo) & (f <= f_hi)
+                           for _, (r_lo, r_hi), (f_lo, f_hi) in RFM_SEGMENTS],
+                          np.arange(len(RFM_SEGMENTS)), default=len(RFM_SEGMENTS))
+        out["segment"] = pd.Categorical.from_codes(codes, categories=SEGMENT_NAMES)
+        return out
+
+    def rfm_segments(self, as_of=None) -> pd.DataFrame:
+        """Customers, share and average R/F/M values per RFM segment."""
+        rfm = self.rfm(as_of)
+        seg = rfm.groupby("segment", observed=True).agg(customers=("customer_id", "size"),
+                                         avg_recency_days=("recency_days", "mean"),
+                                         avg_frequency=("frequency", "mean"),
+                                         avg_monetary=("monetary", "mean"),
+                                         revenue=("monetary", "sum"))
+        seg.insert(1, "share", (seg["customers"] / max(len(rfm), 1)).round(4))
+        return seg.round(2).sort_values("customers", ascending=False)
+
+
+# --------------------------
+# Scans
+# --------------------------
+def _ordered_chunks(engine, chunksize: int, where: str = None, params: dict = None):
+    # idx_orders_datetime serves both the range and the ordering
+    clause = "status = 'delivered'" + (f" AND {where}" if where else "")
+    return iter_orders(engine, COHORT_COLUMNS, chunksize, where=clause, params=params, order_by="order_datetime")
+
+
+def scan_cohorts(engine, customers: pd.DataFrame, chunksize: int = DEFAULT_CHUNKSIZE) -> CohortEngine:
+    """Cohort state from one narrow, time-ordered streaming pass over delivered orders."""
+    cohorts = CohortEngine(customers)
+    for chunk in _ordered_chunks(engine, chunksize):
+        cohorts.update(chunk)
+    return cohorts
+
+
+def load_cohort_state(path: str = DEFAULT_COHORT_STATE_PATH):
+    """The persisted CohortEngine, or None if there is no usable state."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        saved = pickle.load(f)
+    if not isinstance(saved, dict) or saved.get("version") != COHORT_STATE_VERSION:
+        return None
+    return saved["cohorts"]
+
+
+def save_cohort_state(cohorts: CohortEngine, path: str = DEFAULT_COHORT_STATE_PATH):
+    """Write the state atomically, so an interrupted run keeps the previous one."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump({"version": COHORT_STATE_VERSION, "cohorts": cohorts}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def refresh_cohorts(engine, customers: pd.DataFrame, path: str = DEFAULT_COHORT_STATE_PATH,
+                    chunksize: int = DEFAULT_CHUNKSIZE, full: bool = False) -> CohortEngine:
+    """Fold delivered orders past the stored watermark into the persisted cohort state.
+
+    Same contract as incremental.refresh: orders behind the watermark are immutable.
+    """
+    cohorts = None if full else load_cohort_state(path)
+    if cohorts is None:
+        cohorts = CohortEngine()
+    cohorts.set_signups(customers)
+    where, params = None, None
+    if cohorts.watermark is not None:
+        where, params = "order_datetime >= :since", {"since": cohorts.watermark.to_pydatetime()}
+    since, seen = cohorts.watermark, set(cohorts.watermark_ids)
+    new_rows = 0
+    for chunk in _ordered_chunks(engine, chunksize, where, params):
+        if seen:
+            chunk = chunk[~((chunk["order_datetime"] == since) & chunk["order_id"].isin(seen))]
+        cohorts.update(chunk)
+        new_rows += len(chunk)
+    save_cohort_state(cohorts, path)
+    print(f"cohorts: folded {new_rows} new delivered orders, watermark {cohorts.watermark}")
+    return cohorts
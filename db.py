@@ -0,0 +1,150 @@
+"""
+db.py
+Database access for the analysis and the seeder.
+Connection settings come from a config file and the environment instead of
+constants in the scripts, in this order (later wins): built-in defaults
+(no password), the [database] section of db.ini (or the file named by
+FOOD_DB_CONFIG), then FOOD_DB_* environment variables. FOOD_DB_URL, if
+set, is used as the SQLAlchemy URL as is (e.g. sqlite:///demo.db).
+
+The SQLAlchemy engine gets an explicit connection pool sized for
+concurrent reads. `read_concurrently` runs several queries at once, each
+on its own pooled connection, so loading the tables takes about as long
+as the largest one rather than their sum, and `order_queries` splits the
+`orders` read into primary-key ranges that load in parallel too.
+
+    FOOD_DB_PASSWORD=... python analysis.py
+    engine = make_engine()
+    frames = read_concurrently(engine, {"vendors": "SELECT * FROM vendors", **order_queries(engine, cols, 4)})
+"""
+
+import configparser
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import URL, create_engine, text
+
+DEFAULT_CONFIG_PATH = "db.ini"
+ENV_PREFIX = "FOOD_DB_"
+DEFAULTS = {
+    "user": "root",
+    "password": "",
+    "host": "127.0.0.1",
+    "port": "3307",
+    "database": "food_delivery",
+    "driver": "mysql+mysqlconnector",
+    "url": "",
+    "pool_size": "8",       # connections kept open; also the default read concurrency
+    "max_overflow": "4",
+    "pool_timeout": "30",
+    "pool_recycle": "3600",  # seconds; below MySQL's wait_timeout
+}
+CONNECTOR_KEYS = ("user", "password", "host", "port", "database")
+
+
+def db_settings(config_path: str = None) -> dict:
+    """Connection and pool settings: defaults < config file [database] < FOOD_DB_* variables."""
+    settings = dict(DEFAULTS)
+    path = config_path or os.environ.get(ENV_PREFIX + "CONFIG", DEFAULT_CONFIG_PATH)
+    if os.path.exists(path):
+        parser = configparser.ConfigParser()
+        parser.read(path)
+        if parser.has_section("database"):
+            settings.update({k: v for k, v in parser.items("database") if k in DEFAULTS})
+    elif config_path:
+        raise FileNotFoundError(f"database config not found: {config_path}")
+    for key in DEFAULTS:
+        value = os.environ.get(ENV_PREFIX + key.upper())
+        if value is not None:
+            settings[key] = value
+    return settings
+
+
+def connector_kwargs(settings: dict = None) -> dict:
+    """mysql.connector.connect() arguments from the settings."""
+    settings = settings or db_settings()
+    kwargs = {k: settings[k] for k in CONNECTOR_KEYS}
+    kwargs["port"] = int(kwargs["port"])
+    return kwargs
+
+
+def database_url(settings: dict = None):
+    settings = settings or db_settings()
+    if settings["url"]:
+        return settings["url"]
+    return URL.create(settings["driver"], username=settings["user"], password=settings["password"] or None,
+                      host=settings["host"], port=int(settings["port"]), database=settings["database"])
+
+
+def make_engine(settings: dict = None, **engine_kwargs):
+    """SQLAlchemy engine with a pool sized for concurrent reads (see DEFAULTS)."""
+    settings = settings or db_settings()
+    url = database_url(settings)
+    pool = dict(pool_size=int(settings["pool_size"]), max_overflow=int(settings["max_overflow"]),
+                pool_timeout=float(settings["pool_timeout"]), pool_recycle=int(settings["pool_recycle"]),
+                pool_pre_ping=True)
+    if str(url).startswith("sqlite"):
+        pool = dict(pool_pre_ping=True)  # SQLite picks its own pool class
+    return create_engine(url, **{**pool, **engine_kwargs})
+
+
+def pool_size(engine) -> int:
+    size = getattr(engine.pool, "size", None)
+    return size() if callable(size) else 1
+
+
+# --------------------------
+# Concurrent reads
+# --------------------------
+def read_concurrently(engine, queries: dict, workers: int = None) -> dict:
+    """{name: DataFrame} for {name: SQL}, with up to `workers` (default: the pool size) queries at a time.
+
+    Each query checks out its own pooled connection; the drivers release the GIL
+    while waiting on the server, so threads overlap the round trips.
+    """
+    if not queries:
+        return {}
+    workers = max(1, min(len(queries), workers or pool_size(engine)))
+
+    def read(sql):
+        return pd.read_sql(text(sql), engine)
+
+    if workers == 1:
+        return {name: read(sql) for name, sql in queries.items()}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db-read") as pool:
+        futures = {name: pool.submit(read, sql) for name, sql in queries.items()}
+        return {name: f.result() for name, f in futures.items()}
+
+
+def key_ranges(engine, table: str, key: str, partitions: int) -> list:
+    """Up to `partitions` half-open [lo, hi) ranges of `key` covering `table`, by value."""
+    with engine.connect() as conn:
+        lo, hi = conn.execute(text(f"SELECT MIN({key}), MAX({key}) FROM {table}")).one()
+    if lo is None:
+        return []
+    bounds = np.unique(np.linspace(int(lo), int(hi) + 1, max(1, partitions) + 1).astype("int64"))
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+
+def order_queries(engine, columns, partitions: int = 1) -> dict:
+    """{("orders", i): SQL} reading `columns` of orders; with partitions > 1, one query per order_id range."""
+    select = f"SELECT {', '.join(columns)} FROM orders"
+    if partitions <= 1:
+        return {("orders", 0): select}
+    return {("orders", i): f"{select} WHERE order_id >= {lo} AND order_id < {hi}"
+            for i, (lo, hi) in enumerate(key_ranges(engine, "orders", "order_id", partitions))}
+
+
+def concat_orders(frames: dict, columns) -> pd.DataFrame:
+    """Pop the ("orders", i) parts from `frames` and stitch them back in range order."""
+    parts = [frames.pop(k) for k in sorted(k for k in frames if isinstance(k, tuple) and k[0] == "orders")]
+    if not parts:
+        return pd.DataFrame(columns=list(columns))
+    return parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+
+
+def read_orders(engine, columns, partitions: int = 1, workers: int = None) -> pd.DataFrame:
+    """`columns` of orders, read as `partitions` primary-key ranges in parallel."""
+    return concat_orders(read_concurrently(engine, order_queries(engine, columns, partitions), workers), columns)
@@ -0,0 +1,60 @@
+"""
+dimensions.py
+Id-indexed lookups for the vendors/drivers/customers dimensions.
+Instead of merging a dimension into every order row, a lookup keeps a
+position array indexed by id and attaches only the attributes a table
+needs, by `np.take`, after aggregation, i.e. to a few dozen or a few
+thousand group rows rather than millions of orders. Ids missing from
+the dimension get NaN/None, like a left merge.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class DimensionLookup:
+    """Attribute lookup by integer id for one dimension table.
+
+    vendors = DimensionLookup(vendors_df, "vendor_id")
+    stats = vendors.attach(stats, "vendor_id", ["vendor_name", "area"])
+    """
+
+    def __init__(self, frame: pd.DataFrame, key: str):
+        self.frame = frame.reset_index(drop=True)
+        self.key = key
+        ids = self.frame[key].to_numpy("int64")
+        if len(ids) and ids.min() < 0:
+            raise ValueError(f"{key} must be non-negative to index a lookup")
+        self._pos = np.full(int(ids.max()) + 1 if len(ids) else 0, -1, dtype="int64")
+        self._pos[ids] = np.arange(len(ids))
+        self.attributes = [c for c in self.frame.columns if c != key]
+
+    def positions(self, ids) -> np.ndarray:
+        """Row of each id in the dimension, -1 where it is absent."""
+        ids = np.asarray(ids, dtype="int64")
+        inside = (ids >= 0) & (ids < len(self._pos))
+        return np.where(inside, self._pos[np.where(inside, ids, 0)], -1)
+
+    def take(self, ids, columns=None) -> pd.DataFrame:
+        """The dimension `columns` (default: all attributes) for each id, in order."""
+        pos = self.positions(ids)
+        missing = pos < 0
+        out = {}
+        for col in columns or self.attributes:
+            values = self.frame[col]
+            if not len(values):
+                out[col] = pd.Series(np.nan, index=range(len(pos)))
+                continue
+            taken = values.take(np.where(missing, 0, pos)).reset_index(drop=True)
+            out[col] = taken.where(~missing) if missing.any() else taken
+        return pd.DataFrame(out, index=pd.RangeIndex(len(pos)))
+
+    def attach(self, frame: pd.DataFrame, key: str = None, columns=None) -> pd.DataFrame:
+        """`frame` with the dimension columns for frame[key] appended (left-merge semantics)."""
+        attrs = self.take(frame[key or self.key], columns)
+        attrs.index = frame.index
+        return pd.concat([frame, attrs], axis=1)
+
+    def mask(self, ids) -> np.ndarray:
+        """True where the id exists in the dimension (inner-merge filter)."""
+        return self.positions(ids) >= 0
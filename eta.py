@@ -0,0 +1,343 @@
+"""
+eta.py
+Area-pair ETA model: expected delivery minutes ~ distance, fitted per
+pickup area x dropoff area x hour bucket.
+The six least-squares sums (n, x, y, x², xy, y²) of every cell are filled
+by one bincount pass per chunk (or taken from a GROUP BY in the database),
+so the model is folded into the streaming aggregates, merged across
+partitions, persisted with the incremental state and refitted without
+touching orders again. The
+fit is vectorized over the whole matrix; a cell with too few orders falls
+back to its area pair over all hours, then to its hour bucket over all
+pairs, then to the global line. Unknown areas get the hour-bucket line.
+
+The fitted slope / intercept / residual scale are kept as flat lookup
+tables, so predicting or scoring millions of orders is a few array takes.
+analysis.py saves the fitted model (pickle, like the incremental state);
+running this module loads it and predicts batches of orders without
+refitting.
+
+    model = EtaModel()
+    for chunk in chunks: model.update(chunk)       # delivered orders
+    model.fit(); model.save()
+    model = EtaModel.load()
+    expected = model.predict(orders)               # minutes
+    z = model.score(orders)                        # late vs expected, in residual std
+
+    python eta.py --since 2025-04-01 --out outputs/eta_predictions.csv
+"""
+
+import argparse
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from calendar_dim import day_numbers
+from db import db_settings, make_engine
+from streaming import DEFAULT_CHUNKSIZE, as_float64, iter_orders
+
+ETA_COLUMNS = ["pickup_area", "dropoff_area", "order_datetime", "distance_km", "delivery_minutes"]
+# hour bucket name -> first hour; each bucket runs to the next one's first hour
+HOUR_BUCKETS = {"night": 0, "morning": 6, "lunch": 11, "afternoon": 15, "dinner": 18, "late": 22}
+MIN_CELL_ORDERS = 30     # smaller cells fall back to a coarser level
+LEVELS = ("cell", "pair", "hour", "global")
+REFERENCE_KM = 5.0       # distance of the pickup x dropoff matrix in the report
+DEFAULT_ETA_MODEL_PATH = os.path.join("state", "eta_model.pkl")
+DEFAULT_PREDICTIONS_PATH = os.path.join("outputs", "eta_predictions.csv")
+MODEL_VERSION = 1
+_SUMS = ("n", "sx", "sy", "sxx", "sxy", "syy")
+
+
+def fit_lines(sums: np.ndarray) -> tuple:
+    """Vectorized least squares over the last axis of `sums` (n, sx, sy, sxx, sxy, syy).
+
+    Returns (slope, intercept, scale, ok); `scale` is the residual std (1.0 if zero) and
+    `ok` marks groups with more than 5 points and some spread in x.
+    """
+    n, sx, sy, sxx, sxy, syy = np.moveaxis(sums, -1, 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        den = n * sxx - sx * sx
+        ok = (n > 5) & (den > 1e-9 * n * sxx)
+        slope = np.where(ok, (n * sxy - sx * sy) / den, np.nan)
+        intercept = np.where(ok, (sy - slope * sx) / n, np.nan)
+        res_mean = (sy - slope * sx - intercept * n) / n
+        res_sq = sse(sums, slope, intercept) / n
+        scale = np.sqrt(np.maximum(res_sq - res_mean ** 2, 0.0))
+    scale = np.where(ok & (scale > 0), scale, 1.0)
+    return slope, intercept, scale, ok
+
+
+def sse(sums: np.ndarray, slope, intercept) -> np.ndarray:
+    """Sum of squared residuals of each group's points around the line (slope, intercept)."""
+    n, sx, sy, sxx, sxy, syy = np.moveaxis(sums, -1, 0)
+    return (syy - 2 * slope * sxy - 2 * intercept * sy + slope ** 2 * sxx
+            + 2 * slope * intercept * sx + n * intercept ** 2)
+
+
+def _factorize(values) -> tuple:
+    values = pd.Series(values) if not isinstance(values, pd.Series) else values
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+    return pd.factorize(values)
+
+
+class EtaModel:
+    """Delivery minutes ~ distance per (pickup area, dropoff area, hour bucket)."""
+
+    def __init__(self, areas=(), hour_buckets: dict = None, min_cell_orders: int = MIN_CELL_ORDERS):
+        buckets = HOUR_BUCKETS if hour_buckets is None else hour_buckets
+        starts = np.asarray(list(buckets.values()))
+        if starts[0] != 0 or np.any(np.diff(starts) <= 0):
+            raise ValueError("hour buckets must start at hour 0 and increase")
+        self.bucket_names = list(buckets)
+        self.bucket_of_hour = (np.searchsorted(starts, np.arange(24), side="right") - 1).astype("int64")
+        self.min_cell_orders = min_cell_orders
+        self.areas = []
+        self.area_index = {}
+        self.sums = np.zeros((0, 0, len(self.bucket_names), len(_SUMS)))
+        self._add_areas(areas)
+        self.params = None  # fitted lookup tables, see fit()
+
+    # ---- keys ----
+    def _add_areas(self, names):
+        new = [str(a) for a in names if str(a) not in self.area_index]
+        if not new:
+            return
+        for name in new:
+            self.area_index[name] = len(self.areas)
+            self.areas.append(name)
+        old, a = self.sums, len(self.areas)
+        self.sums = np.zeros((a, a, *old.shape[2:]))
+        self.sums[:old.shape[0], :old.shape[1]] = old
+        self.params = None
+
+    def _area_codes(self, values, grow: bool) -> np.ndarray:
+        """Area index per row; len(areas) (the "unknown" slot of the fitted tables) when unseen."""
+        codes, uniques = _factorize(values)
+        names = [str(u) for u in uniques.tolist()]
+        if grow:
+            self._add_areas(names)
+        lookup = np.asarray([self.area_index.get(u, len(self.areas)) for u in names] + [len(self.areas)],
+                            dtype="int64")
+        return lookup[codes]  # code -1 (missing) takes the trailing unknown entry
+
+    def _buckets(self, frame: pd.DataFrame) -> np.ndarray:
+        hour = frame["hour"].to_numpy() if "hour" in frame else day_numbers(frame["order_datetime"])[1]
+        return self.bucket_of_hour[np.asarray(hour, dtype="int64")]
+
+    # ---- building ----
+    def update(self, frame: pd.DataFrame):
+        """Fold delivered orders (ETA_COLUMNS, or `hour` instead of order_datetime) into the cell sums.
+
+        Rows with another `status`, if the column is present, are skipped.
+        """
+        if "status" in frame:
+            frame = frame[frame["status"] == "delivered"]
+        if not len(frame):
+            return
+        p = self._area_codes(frame["pickup_area"], grow=True)
+        d = self._area_codes(frame["dropoff_area"], grow=True)
+        b = self._buckets(frame)
+        a, h = len(self.areas), len(self.bucket_names)
+        cell = (p * a + d) * h + b
+        x = as_float64(frame["distance_km"])
+        y = frame["delivery_minutes"].to_numpy("float64")
+        flat = self.sums.reshape(-1, len(_SUMS))
+        for j, w in enumerate((None, x, y, x * x, x * y, y * y)):
+            flat[:, j] += np.bincount(cell, weights=w, minlength=len(flat))
+        self.params = None
+
+    def add_sums(self, pickup, dropoff, buckets, sums):
+        """Fold per-cell sums computed elsewhere (e.g. a GROUP BY in the database):
+        `buckets` are hour bucket indexes and `sums` has the _SUMS columns."""
+        p = self._area_codes(pickup, grow=True)
+        d = self._area_codes(dropoff, grow=True)
+        a, h = len(self.areas), len(self.bucket_names)
+        cell = (p * a + d) * h + np.asarray(buckets, dtype="int64")
+        flat = self.sums.reshape(-1, len(_SUMS))
+        np.add.at(flat, cell, np.asarray(sums, dtype="float64"))
+        self.params = None
+
+    def merge(self, other: "EtaModel"):
+        """Add another model's sums (same hour buckets), e.g. from another partition."""
+        if other.bucket_names != self.bucket_names or not np.array_equal(other.bucket_of_hour, self.bucket_of_hour):
+            raise ValueError("cannot merge models with different hour buckets")
+        self._add_areas(other.areas)
+        idx = np.asarray([self.area_index[a] for a in other.areas], dtype="int64")
+        self.sums[np.ix_(idx, idx)] += other.sums
+        self.params = None
+
+    # ---- fitting ----
+    def fit(self) -> "EtaModel":
+        """Fit every cell at once and build the lookup tables; a no-op when already fitted.
+
+        Tables are (areas + 1) x (areas + 1) x hour buckets, the extra row/column being
+        unknown areas. Each cell uses the finest level (LEVELS) with at least
+        `min_cell_orders` orders and a well-defined line.
+        """
+        if self.params is not None:
+            return self
+        # pad an empty "unknown area" row/column: its cells fall through to the hour level
+        cells = np.pad(self.sums, ((0, 1), (0, 1), (0, 0), (0, 0)))
+        levels = [
+            cells,
+            np.broadcast_to(cells.sum(axis=2, keepdims=True), cells.shape),
+            np.broadcast_to(cells.sum(axis=(0, 1), keepdims=True), cells.shape),
+            np.broadcast_to(cells.sum(axis=(0, 1, 2), keepdims=True), cells.shape),
+        ]
+        shape = cells.shape[:3]
+        slope, intercept, scale = np.full(shape, np.nan), np.full(shape, np.nan), np.ones(shape)
+        source = np.full(shape, -1, dtype="int8")
+        for i, sums in enumerate(levels):
+            s, c, sc, ok = fit_lines(sums)
+            use = (source < 0) & ok & ((sums[..., 0] >= self.min_cell_orders) | (i == len(levels) - 1))
+            slope[use], intercept[use], scale[use], source[use] = s[use], c[use], sc[use], i
+        self.params = {"slope": slope, "intercept": intercept, "scale": scale, "source": source,
+                       "n": cells[..., 0].astype("int64")}
+        return self
+
+    @property
+    def fitted(self) -> bool:
+        """Whether there were enough orders for at least the global line."""
+        return bool((self.fit().params["source"] >= 0).any())
+
+    # ---- batch prediction ----
+    def _cells(self, frame: pd.DataFrame) -> np.ndarray:
+        """Flat index into the fitted tables for every row."""
+        p = self._area_codes(frame["pickup_area"], grow=False)
+        d = self._area_codes(frame["dropoff_area"], grow=False)
+        a, h = len(self.areas) + 1, len(self.bucket_names)
+        return (p * a + d) * h + self._buckets(frame)
+
+    def predict(self, frame: pd.DataFrame) -> np.ndarray:
+        """Expected delivery minutes for each row (pickup_area, dropoff_area, distance_km and
+        order_datetime or hour); NaN before the model has any usable fit."""
+        params = self.fit().params
+        cells = self._cells(frame)
+        x = as_float64(frame["distance_km"])
+        return params["slope"].ravel().take(cells) * x + params["intercept"].ravel().take(cells)
+
+    def residuals(self, frame: pd.DataFrame) -> np.ndarray:
+        """Minutes later (positive) or earlier than expected."""
+        return frame["delivery_minutes"].to_numpy("float64") - self.predict(frame)
+
+    def score(self, frame: pd.DataFrame) -> np.ndarray:
+        """Late vs expected in units of the cell's residual std."""
+        params = self.fit().params
+        return self.residuals(frame) / params["scale"].ravel().take(self._cells(frame))
+
+    # ---- tables ----
+    def table(self) -> pd.DataFrame:
+        """One row per (pickup, dropoff, hour bucket) with orders: the fitted line and its source level."""
+        params = self.fit().params
+        a, h = len(self.areas), len(self.bucket_names)
+        p, d, b = np.meshgrid(np.arange(a), np.arange(a), np.arange(h), indexing="ij")
+        n = params["n"][:a, :a]
+        keep = n.ravel() > 0
+        areas, names = np.asarray(self.areas, dtype=object), np.asarray(self.bucket_names, dtype=object)
+        source = params["source"][:a, :a].ravel()[keep]
+        return pd.DataFrame({
+            "pickup_area": areas[p.ravel()[keep]],
+            "dropoff_area": areas[d.ravel()[keep]],
+            "hour_bucket": names[b.ravel()[keep]],
+            "orders": n.ravel()[keep],
+            "slope": params["slope"][:a, :a].ravel()[keep],
+            "intercept": params["intercept"][:a, :a].ravel()[keep],
+            "scale": params["scale"][:a, :a].ravel()[keep],
+            "source": np.asarray([*LEVELS, "none"], dtype=object)[source],  # -1: no usable fit
+        }).sort_values(["pickup_area", "dropoff_area"], kind="stable", ignore_index=True)
+
+    def matrix(self, distance_km: float, hour_bucket: str = None) -> pd.DataFrame:
+        """Expected minutes at `distance_km`, pickup x dropoff, for one hour bucket
+        (default: the order-weighted mean over buckets)."""
+        params = self.fit().params
+        a = len(self.areas)
+        minutes = params["slope"][:a, :a] * distance_km + params["intercept"][:a, :a]
+        if hour_bucket is not None:
+            minutes = minutes[:, :, self.bucket_names.index(hour_bucket)]
+        else:
+            w = params["n"][:a, :a].astype("float64")
+            total = w.sum(axis=2)
+            minutes = np.where(total > 0, (minutes * w).sum(axis=2) / np.where(total > 0, total, 1),
+                               minutes.mean(axis=2))
+        out = pd.DataFrame(minutes, index=pd.Index(self.areas, name="pickup_area"),
+                           columns=pd.Index(self.areas, name="dropoff_area"))
+        return out.sort_index().sort_index(axis=1)
+
+    def rmse(self) -> dict:
+        """In-sample RMSE of the fitted tables vs one global line, from the sums alone."""
+        params = self.fit().params
+        cells = np.pad(self.sums, ((0, 1), (0, 1), (0, 0), (0, 0)))
+        n = cells[..., 0].sum()
+        if not n:
+            return {"global": np.nan, "area_pair": np.nan}
+        g_slope, g_intercept, _, _ = fit_lines(cells.sum(axis=(0, 1, 2)))
+        return {
+            "global": float(np.sqrt(sse(cells, g_slope, g_intercept).sum() / n)),
+            "area_pair": float(np.sqrt(np.nansum(sse(cells, params["slope"], params["intercept"])) / n)),
+        }
+
+    # ---- persistence ----
+    def save(self, path: str = DEFAULT_ETA_MODEL_PATH) -> str:
+        """Fit and write the model atomically (sums and lookup tables)."""
+        self.fit()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({"version": MODEL_VERSION, "model": self}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_ETA_MODEL_PATH):
+        """The persisted model, or None if there is no usable one."""
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            saved = pickle.load(f)
+        if saved.get("version") != MODEL_VERSION:
+            return None
+        return saved["model"]
+
+
+def predict_orders(model: EtaModel, engine, out: str = DEFAULT_PREDICTIONS_PATH, since=None,
+                   chunksize: int = DEFAULT_CHUNKSIZE) -> int:
+    """Write expected minutes (and, for delivered orders, the z-score of the actual
+    minutes) for every order, or those from `since` on, to `out`; returns the rows written."""
+    where, params = ("order_datetime >= :since", {"since": pd.Timestamp(since).to_pydatetime()}) \
+        if since is not None else (None, None)
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    rows = 0
+    with open(out, "w", newline="") as f:
+        for chunk in iter_orders(engine, ["order_id", "status", *ETA_COLUMNS], chunksize, where=where, params=params):
+            delivered = (chunk["status"] == "delivered").to_numpy()
+            pd.DataFrame({
+                "order_id": chunk["order_id"],
+                "expected_minutes": model.predict(chunk).round(2),
+                "late_z": np.where(delivered, model.score(chunk), np.nan).round(3),
+            }).to_csv(f, index=False, header=rows == 0)
+            rows += len(chunk)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch delivery-time predictions from the saved ETA model")
+    parser.add_argument("--model", default=DEFAULT_ETA_MODEL_PATH, help="model written by analysis.py")
+    parser.add_argument("--since", default=None, metavar="DATETIME", help="only orders from this time on")
+    parser.add_argument("--out", default=DEFAULT_PREDICTIONS_PATH)
+    parser.add_argument("--db-config", default=None, metavar="INI",
+                        help="database settings file (default: db.ini or $FOOD_DB_CONFIG)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args(argv)
+
+    model = EtaModel.load(args.model)
+    if model is None or not model.fitted:
+        raise SystemExit(f"no usable ETA model at {args.model}; run analysis.py --outputs eta_area_pairs first")
+    rows = predict_orders(model, make_engine(db_settings(args.db_config)), args.out, args.since, args.chunksize)
+    print(f"saved: {args.out} ({rows} orders)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+figures.py
+Figure rendering stage for analysis.py.
+Sections only queue the small precomputed tables each figure needs;
+`render_all` draws them afterwards, concurrently in a process pool, with
+the Agg backend and matplotlib's object API (no pyplot global state).
+Large distance/minutes clouds are pre-binned into a 2-D histogram before
+they are shipped to a worker, so the scatter no longer dominates.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+import pandas as pd
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
+
+SCATTER_MAX_POINTS = 50_000
+DENSITY_BINS = (120, 80)
+
+
+def _line(ax, x, y):
+    ax.plot(pd.to_datetime(x), y)
+
+
+def _bar(ax, series):
+    series.plot(kind="bar", ax=ax)
+
+
+def _fit(ax, slope, intercept, x=None, y=None, density=None):
+    if density is not None:
+        counts, xedges, yedges = density
+        mesh = ax.pcolormesh(xedges, yedges, np.ma.masked_equal(counts.T, 0), norm=LogNorm(), cmap="viridis")
+        ax.figure.colorbar(mesh, ax=ax, label="Orders")
+        lo, hi = xedges[0], xedges[-1]
+    else:
+        ax.scatter(x, y, s=8, alpha=0.4)
+        lo, hi = x.min(), x.max()
+    xs = np.linspace(lo, hi, 100)
+    ax.plot(xs, slope * xs + intercept, color="tab:orange")
+
+
+def _heatmap(ax, frame, label=None):
+    image = ax.imshow(frame.to_numpy("float64"), cmap="viridis", aspect="auto")
+    ax.figure.colorbar(image, ax=ax, label=label)
+    ax.set_xticks(range(frame.shape[1]), [str(c) for c in frame.columns], rotation=90)
+    ax.set_yticks(range(frame.shape[0]), [str(i) for i in frame.index])
+
+
+RENDERERS = {"line": _line, "bar": _bar, "fit": _fit, "heatmap": _heatmap}
+
+
+class FigureQueue:
+    """Figures requested by the sections, rendered later by `render_all`."""
+
+    def __init__(self, out_dir: str = "figures"):
+        self.out_dir = out_dir
+        self.jobs = []
+
+    def add(self, name: str, kind: str, title: str, xlabel: str, ylabel: str,
+            figsize=(8, 4), **data):
+        self.jobs.append(dict(path=os.path.join(self.out_dir, f"{name}.png"), kind=kind, title=title,
+                              xlabel=xlabel, ylabel=ylabel, figsize=figsize, data=data))
+
+    def add_fit(self, name: str, x, y, slope: float, intercept: float, **labels):
+        """Scatter + fitted line; above SCATTER_MAX_POINTS the points become a density plot."""
+        x, y = np.asarray(x, dtype="float64"), np.asarray(y, dtype="float64")
+        if len(x) > SCATTER_MAX_POINTS:
+            counts, xedges, yedges = np.histogram2d(x, y, bins=DENSITY_BINS)
+            data = dict(density=(counts, xedges, yedges))
+        else:
+            data = dict(x=x, y=y)
+        self.add(name, "fit", slope=slope, intercept=intercept, **labels, **data)
+
+
+def render(job: dict) -> str:
+    fig = Figure(figsize=job["figsize"])
+    ax = fig.add_subplot()
+    RENDERERS[job["kind"]](ax, **job["data"])
+    ax.set_title(job["title"]); ax.set_xlabel(job["xlabel"]); ax.set_ylabel(job["ylabel"])
+    fig.tight_layout()
+    fig.savefig(job["path"])
+    return job["path"]
+
+
+def render_all(queue: FigureQueue, workers: int = None) -> list:
+    """Render every queued figure; `workers=1` renders in-process.
+
+    Workers start from a forkserver (spawn where that is unavailable), not a
+    fork of the caller: importing analysis.py has no side effects, and a
+    fork would copy the parent's loaded tables and its db.py thread pool.
+    """
+    if not queue.jobs:
+        return []
+    os.makedirs(queue.out_dir, exist_ok=True)
+    workers = workers or min(len(queue.jobs), os.cpu_count() or 1)
+    if workers == 1:
+        return [render(job) for job in queue.jobs]
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method)) as pool:
+        return list(pool.map(render, queue.jobs))
@@ -0,0 +1,105 @@
+"""
+groupby_engine.py
+Single-pass vectorized group-by for the delivered-order KPIs.
+Each group key is factorized once into integer codes; every per-group
+statistic (orders, minute and revenue sums, SLA hits at all thresholds,
+any extra weighted sums) is then a `np.bincount` over those codes. SLA
+hits come from one `searchsorted` of the minutes against the sorted
+thresholds plus one 2-D bincount, instead of one comparison per threshold.
+"""
+
+import numpy as np
+import pandas as pd
+
+SLA_THRESHOLDS = (25, 30, 35, 40)
+
+
+def factorize(values, sort: bool = True):
+    """(codes, uniques) for a key column; `sort` orders uniques like groupby does."""
+    if isinstance(values, pd.Series) and isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = pd.factorize(values, sort=sort)
+        return codes, pd.Index(np.asarray(uniques))
+    codes, uniques = pd.factorize(np.asarray(values), sort=sort)
+    return codes, pd.Index(uniques)
+
+
+def combine_codes(*parts):
+    """Codes for a composite key from (codes, n_uniques) pairs, without re-factorizing."""
+    codes = np.zeros(len(parts[0][0]), dtype="int64")
+    for c, n in parts:
+        codes = codes * n + c
+    return codes
+
+
+class KpiEngine:
+    """Per-group delivered-order KPIs over shared minute/revenue arrays.
+
+    engine = KpiEngine(deliv["delivery_minutes"], deliv["revenue"])
+    area = engine.by(deliv["dropoff_area"])
+    vend = engine.by(deliv["vendor_id"], sums={"distance_sum": deliv["distance_km"]})
+    """
+
+    def __init__(self, minutes, revenue, thresholds=SLA_THRESHOLDS):
+        self.minutes = np.asarray(minutes, dtype="float64")
+        self.revenue = np.asarray(revenue, dtype="float64")
+        self.thresholds = tuple(sorted(thresholds))
+        # bin i: minutes <= thresholds[i] (and > thresholds[i-1]); last bin: over every threshold
+        self._sla_bin = np.searchsorted(np.asarray(self.thresholds, dtype="float64"), self.minutes, side="left")
+
+    def __len__(self):
+        return len(self.minutes)
+
+    def totals(self, sums: dict = None) -> pd.Series:
+        """The same statistics with every row in one group."""
+        return self.from_codes(np.zeros(len(self), dtype="int64"), 1, sums=sums).iloc[0]
+
+    def by(self, keys, sums: dict = None) -> pd.DataFrame:
+        """Statistics per distinct value of `keys`, indexed by the sorted keys."""
+        codes, uniques = factorize(keys)
+        out = self.from_codes(codes, len(uniques), sums=sums)
+        out.index = uniques.rename(getattr(keys, "name", None))
+        return out
+
+    def from_codes(self, codes, n_groups: int, sums: dict = None) -> pd.DataFrame:
+        """Statistics for precomputed integer `codes` in [0, n_groups)."""
+        codes = np.asarray(codes, dtype="int64")
+        orders = np.bincount(codes, minlength=n_groups)
+        out = {
+            "orders": orders,
+            "minutes_sum": np.bincount(codes, weights=self.minutes, minlength=n_groups),
+            "revenue": np.bincount(codes, weights=self.revenue, minlength=n_groups),
+        }
+        n_bins = len(self.thresholds) + 1
+        hits = np.bincount(codes * n_bins + self._sla_bin, minlength=n_groups * n_bins)
+        hits = hits.reshape(n_groups, n_bins).cumsum(axis=1)
+        for i, t in enumerate(self.thresholds):
+            out[f"sla{t}_hits"] = hits[:, i]
+        for name, values in (sums or {}).items():
+            values = np.asarray(values, dtype="float64")
+            present = ~np.isnan(values)
+            out[name] = np.bincount(codes[present], weights=values[present], minlength=n_groups)
+            out[name + "_n"] = np.bincount(codes[present], minlength=n_groups)
+        out = pd.DataFrame(out)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out["avg_minutes"] = out["minutes_sum"] / out["orders"]
+            for t in self.thresholds:
+                out[f"sla{t}"] = out[f"sla{t}_hits"] / out["orders"]
+        return out
+
+    @staticmethod
+    def rollup(stats: pd.DataFrame, groups) -> pd.DataFrame:
+        """Re-aggregate additive per-group statistics to a coarser key.
+
+        `groups` maps each row of `stats` to its parent (e.g. vendor -> cuisine);
+        averages and rates are recomputed from the summed columns.
+        """
+        additive = [c for c in stats.columns
+                    if c in ("orders", "minutes_sum", "revenue") or c.endswith("_hits") or c.endswith("_n")
+                    or (c + "_n") in stats.columns]
+        out = stats[additive].groupby(np.asarray(groups), sort=True).sum()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out["avg_minutes"] = out["minutes_sum"] / out["orders"]
+            for c in additive:
+                if c.startswith("sla") and c.endswith("_hits"):
+                    out[c[:-len("_hits")]] = out[c] / out["orders"]
+        return out
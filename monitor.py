@@ -0,0 +1,469 @@
+"""
+monitor.py
+Live rolling-window KPI monitor over the stream of new orders.
+New orders are read by tailing the `orders` table on its primary key,
+re-reading a short trailing id range for rows committed out of order (or
+by replaying a CSV/Parquet/JSON-lines file in event-time steps, as a
+stand-in for a queue) and folded into rolling 15-minute, 1-hour and
+24-hour windows per dropoff area, per vendor and overall: order count,
+cancel and return rate, SLA <= 30 min and average / p95 delivery minutes.
+
+Each window is a ring of time buckets holding counters and a histogram of
+delivery minutes per key, next to running totals over the live buckets.
+An order touches one bucket and one totals row per key; moving the window
+forward subtracts and clears only the buckets that fall out, so the cost
+does not depend on the window length or the history behind it. Time is
+event time (the latest `order_datetime` seen) unless --wall-clock is set.
+After every batch the window KPIs are checked against threshold rules and
+an alert is emitted when a (window, key, metric) starts or stops breaching.
+
+    python monitor.py                                  # tail orders, alerts to outputs/monitor_alerts.jsonl
+    python monitor.py --replay orders.csv --step-minutes 5
+    mon = KpiMonitor(); mon.update(chunk); mon.check(); mon.kpis()
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from db import db_settings, make_engine
+from streaming import DEFAULT_CHUNKSIZE, compact_orders, iter_orders
+
+MONITOR_COLUMNS = ["order_id", "vendor_id", "order_datetime", "dropoff_area", "delivery_minutes", "status"]
+WINDOWS = {"15m": (15, 15), "1h": (60, 12), "24h": (1440, 24)}  # name -> (minutes, ring buckets)
+DIMENSIONS = ("dropoff_area", "vendor_id")
+COUNTERS = ("orders", "delivered", "canceled", "returned", "sla30", "minutes_sum")
+MAX_MINUTES = 240  # histogram range; longer deliveries count as MAX_MINUTES in the p95
+SLA_MINUTES = 30
+
+# metric -> (comparison, threshold); a breach needs `min_orders` behind the metric's denominator
+DEFAULT_RULES = {
+    "cancel_rate": (">", 0.12),
+    "return_rate": (">", 0.06),
+    "sla30": ("<", 0.35),
+    "p95_minutes": (">", 70.0),
+}
+RULE_BASIS = {"cancel_rate": "orders", "return_rate": "orders", "sla30": "delivered",
+              "avg_minutes": "delivered", "p95_minutes": "delivered"}
+OPS = {">": np.greater, "<": np.less}
+DEFAULT_MIN_ORDERS = 50
+DEFAULT_CLEAR_MARGIN = 0.1  # an alert closes once the metric is 10% back inside its threshold
+DEFAULT_POLL_SECONDS = 5.0
+DEFAULT_STEP_MINUTES = 15
+DEFAULT_ALERTS_PATH = os.path.join("outputs", "monitor_alerts.jsonl")
+DEFAULT_KPIS_PATH = os.path.join("outputs", "monitor_kpis.csv")
+KPI_WRITE_SECONDS = 10.0
+TAIL_OVERLAP_IDS = 1000  # order_ids below the highest seen that every poll re-reads
+
+
+def quantile_from_hist(hist: np.ndarray, q: float) -> np.ndarray:
+    """Per-row `Series.quantile(q)` of the integers 0..len-1 given their counts; NaN for empty rows."""
+    cum = hist.cumsum(axis=1)
+    n = cum[:, -1]
+    h = (n - 1) * q
+    lo, hi = np.floor(h), np.ceil(h)
+    # the value at sorted position p is the number of values whose cumulative count is <= p
+    v_lo = (cum <= lo[:, None]).sum(axis=1)
+    v_hi = (cum <= hi[:, None]).sum(axis=1)
+    return np.where(n > 0, v_lo + (h - lo) * (v_hi - v_lo), np.nan)
+
+
+def _factorize(values: pd.Series) -> tuple:
+    """(codes, uniques); categorical columns (as streamed by iter_orders) reuse their codes."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+    return pd.factorize(values)
+
+
+def _status_flags(status: pd.Series) -> dict:
+    """{status: boolean array} from the codes of the status column."""
+    codes, uniques = _factorize(status)
+    flags = {str(name): codes == i for i, name in enumerate(uniques.tolist())}
+    return {name: flags.get(name, np.zeros(len(codes), dtype=bool)) for name in ("delivered", "canceled", "returned")}
+
+
+# --------------------------
+# Rolling windows
+# --------------------------
+class RollingWindow:
+    """COUNTERS and a delivery-minutes histogram per key over the last `minutes`, in `buckets` ring slots.
+
+    Slot b % buckets holds absolute bucket b (minutes / buckets wide), laid out slot-major
+    so expiring one is a contiguous block; `totals` and `hist_totals` are the sums over
+    the live slots. Orders that are out of the window once the batch is in are dropped
+    and counted in `late`, including those the batch's own newer orders pushed out.
+    """
+
+    def __init__(self, minutes: int, buckets: int, n_keys: int = 1):
+        if minutes % buckets:
+            raise ValueError("window minutes must be a multiple of its bucket count")
+        self.minutes, self.buckets = minutes, buckets
+        self.width = int(np.timedelta64(minutes // buckets, "m") / np.timedelta64(1, "ns"))
+        self.head = None  # newest absolute bucket
+        self.late = 0
+        self.slots = np.zeros((buckets, n_keys, len(COUNTERS)), dtype="int64")
+        self.hist = np.zeros((buckets, n_keys, MAX_MINUTES + 1), dtype="int32")
+        self.totals = np.zeros((n_keys, len(COUNTERS)), dtype="int64")
+        self.hist_totals = np.zeros((n_keys, MAX_MINUTES + 1), dtype="int64")
+        self.filled = np.zeros(buckets, dtype=bool)  # slots holding any orders
+
+    def grow(self, n_keys: int):
+        """Make room for `n_keys` keys (capacity doubles, so new keys are amortized O(1))."""
+        if n_keys <= len(self.totals):
+            return
+        rows = max(n_keys, 2 * len(self.totals))
+        for name in ("totals", "hist_totals"):
+            old = getattr(self, name)
+            new = np.zeros((rows, *old.shape[1:]), dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        for name in ("slots", "hist"):
+            old = getattr(self, name)
+            new = np.zeros((self.buckets, rows, old.shape[2]), dtype=old.dtype)
+            new[:, :old.shape[1]] = old
+            setattr(self, name, new)
+
+    def advance(self, bucket: int):
+        """Move the head to absolute `bucket`, expiring the slots it passes over."""
+        if self.head is None:
+            self.head = bucket
+            return
+        if bucket <= self.head:
+            return
+        for b in range(max(self.head + 1, bucket - self.buckets + 1), bucket + 1):
+            slot = b % self.buckets
+            if not self.filled[slot]:
+                continue
+            self.filled[slot] = False
+            self.totals -= self.slots[slot]
+            self.hist_totals -= self.hist[slot]
+            self.slots[slot] = 0
+            self.hist[slot] = 0
+        self.head = bucket
+
+    def advance_to(self, ns: int):
+        self.advance(ns // self.width)
+
+    def add(self, codes: np.ndarray, ns: np.ndarray, counters: np.ndarray, bins: np.ndarray):
+        """Fold orders in: `codes` is (orders, keys per order), `ns` the event times in
+        ns, `counters` (orders, COUNTERS), `bins` the minutes bin or -1 if not delivered."""
+        bucket = ns // self.width
+        self.advance(int(bucket.max()))
+        live = bucket > self.head - self.buckets
+        self.late += int((~live).sum())
+        codes, counters, bins = codes[live], counters[live], bins[live]
+        slot = (bucket[live] % self.buckets)[:, None]
+        self.filled[slot] = True
+        np.add.at(self.slots, (slot, codes), counters[:, None, :])
+        np.add.at(self.totals, codes, counters[:, None, :])
+        d = bins >= 0
+        np.add.at(self.hist, (slot[d], codes[d], bins[d, None]), 1)
+        np.add.at(self.hist_totals, (codes[d], bins[d, None]), 1)
+
+    def metrics(self, n_keys: int) -> dict:
+        """{metric: array over the first `n_keys` keys} for the current window."""
+        t = self.totals[:n_keys].astype("float64")
+        orders, delivered = t[:, 0], t[:, 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return {
+                "orders": t[:, 0].astype("int64"),
+                "delivered": t[:, 1].astype("int64"),
+                "cancel_rate": t[:, 2] / orders,
+                "return_rate": t[:, 3] / orders,
+                "sla30": t[:, 4] / delivered,
+                "avg_minutes": t[:, 5] / delivered,
+                "p95_minutes": quantile_from_hist(self.hist_totals[:n_keys], 0.95),
+            }
+
+
+# --------------------------
+# Monitor
+# --------------------------
+class KpiMonitor:
+    """Rolling KPIs per dropoff area, per vendor and overall, with threshold alerts.
+
+    mon = KpiMonitor(rules={"sla30": ("<", 0.4)}, min_orders=20)
+    mon.update(new_orders)     # any batch size, roughly in time order
+    alerts = mon.check()       # breaches that started or ended since the last check
+    mon.kpis()                 # DataFrame: window x key
+    """
+
+    def __init__(self, windows: dict = None, rules: dict = None, min_orders: int = DEFAULT_MIN_ORDERS,
+                 clear_margin: float = DEFAULT_CLEAR_MARGIN):
+        windows = WINDOWS if windows is None else windows
+        self.windows = {name: RollingWindow(minutes, buckets) for name, (minutes, buckets) in windows.items()}
+        self.rules = dict(DEFAULT_RULES if rules is None else rules)
+        for metric, (op, _) in self.rules.items():
+            if metric not in RULE_BASIS or op not in OPS:
+                raise ValueError(f"unsupported rule {metric} {op}")
+        self.min_orders = min_orders
+        self.clear_margin = clear_margin
+        self.keys = {("all", "all"): 0}  # (dimension, value) -> row
+        self.labels = [("all", "all")]
+        self.active = {}  # (window, row, metric) -> breach alert
+        self.watermark = None
+        self.last_order_id = None
+        self.orders_seen = 0
+
+    def _codes(self, chunk: pd.DataFrame) -> np.ndarray:
+        """(orders, 1 + len(DIMENSIONS)) rows: overall, then one per dimension."""
+        out = np.zeros((len(chunk), 1 + len(DIMENSIONS)), dtype="int64")
+        for j, dim in enumerate(DIMENSIONS, start=1):
+            codes, uniques = _factorize(chunk[dim])
+            lookup = np.empty(len(uniques), dtype="int64")
+            for i, value in enumerate(uniques.tolist()):
+                value = str(value) if dim == "dropoff_area" else value
+                row = self.keys.get((dim, value))
+                if row is None:
+                    row = self.keys[(dim, value)] = len(self.labels)
+                    self.labels.append((dim, value))
+                lookup[i] = row
+            out[:, j] = lookup[codes]
+        return out
+
+    def update(self, chunk: pd.DataFrame):
+        """Fold a batch of orders (MONITOR_COLUMNS) into every window."""
+        if not len(chunk):
+            return
+        when = chunk["order_datetime"]
+        if not pd.api.types.is_datetime64_any_dtype(when):
+            when = pd.to_datetime(when)
+        ns = when.to_numpy("datetime64[ns]").astype("int64")
+        status = _status_flags(chunk["status"])
+        delivered = status["delivered"]
+        minutes = chunk["delivery_minutes"].to_numpy("float64")
+        counters = np.column_stack([
+            np.ones(len(chunk), dtype="int64"), delivered, status["canceled"], status["returned"],
+            delivered & (minutes <= SLA_MINUTES), np.where(delivered, minutes, 0),
+        ]).astype("int64")
+        bins = np.where(delivered, np.clip(minutes, 0, MAX_MINUTES), -1).astype("int64")
+        codes = self._codes(chunk)
+        for window in self.windows.values():
+            window.grow(len(self.labels))
+            window.add(codes, ns, counters, bins)
+        latest = pd.Timestamp(ns.max())
+        self.watermark = latest if self.watermark is None else max(self.watermark, latest)
+        if "order_id" in chunk:
+            last = int(chunk["order_id"].max())
+            self.last_order_id = last if self.last_order_id is None else max(self.last_order_id, last)
+        self.orders_seen += len(chunk)
+
+    def advance(self, now):
+        """Move every window to `now` (wall-clock monitoring with no new orders)."""
+        ns = pd.Timestamp(now).value
+        for window in self.windows.values():
+            window.advance_to(ns)
+
+    def check(self) -> list:
+        """Alerts (dicts) for every (window, key, metric) that started or stopped breaching its rule.
+
+        An alert opens when the metric crosses its threshold on at least `min_orders` orders and
+        closes once it is back past the threshold by `clear_margin` (relative) on as many orders,
+        or the window has emptied, so a metric hovering at the threshold does not flap.
+        """
+        alerts = []
+        n = len(self.labels)
+        for name, window in self.windows.items():
+            m = window.metrics(n)
+            for metric, (op, threshold) in self.rules.items():
+                basis, value = m[RULE_BASIS[metric]], m[metric]
+                enough = basis >= self.min_orders
+                for row in np.flatnonzero(enough & OPS[op](value, threshold)).tolist():
+                    if (name, row, metric) not in self.active:
+                        alert = self._alert("breach", name, row, metric, m, op, threshold)
+                        self.active[(name, row, metric)] = alert
+                        alerts.append(alert)
+                clear = threshold * (1 - self.clear_margin if op == ">" else 1 + self.clear_margin)
+                cleared = (enough & ~OPS[op](value, clear)) | (basis == 0)
+                for key in [k for k in self.active if k[0] == name and k[2] == metric and cleared[k[1]]]:
+                    del self.active[key]
+                    alerts.append(self._alert("resolved", name, key[1], metric, m, op, threshold))
+        return alerts
+
+    def _alert(self, state, window, row, metric, m, op, threshold) -> dict:
+        dim, key = self.labels[row]
+        value = m[metric][row]
+        return {
+            "time": None if self.watermark is None else self.watermark.isoformat(),
+            "state": state, "window": window, "dimension": dim, "key": key, "metric": metric,
+            "value": None if np.isnan(value) else round(float(value), 4), "op": op, "threshold": threshold,
+            "orders": int(m[RULE_BASIS[metric]][row]),
+        }
+
+    def kpis(self) -> pd.DataFrame:
+        """Current KPIs of every window and key with orders in it."""
+        frames = []
+        for name, window in self.windows.items():
+            m = window.metrics(len(self.labels))
+            frame = pd.DataFrame({"window": name, "dimension": [d for d, _ in self.labels],
+                                  "key": [k for _, k in self.labels], **m})
+            frames.append(frame[frame["orders"] > 0])
+        return pd.concat(frames, ignore_index=True)
+
+    def late_orders(self) -> dict:
+        """Orders dropped per window because they were older than the window once their batch was in."""
+        return {name: window.late for name, window in self.windows.items()}
+
+
+def format_alert(alert: dict) -> str:
+    value = "n/a" if alert["value"] is None else f"{alert['value']:g}"
+    return (f"[{alert['time']}] {alert['state'].upper():8} {alert['window']:>3} "
+            f"{alert['dimension']}={alert['key']} {alert['metric']}={value} "
+            f"({alert['op']} {alert['threshold']:g}) over {alert['orders']} orders")
+
+
+# --------------------------
+# Sources
+# --------------------------
+def tail_orders(engine, lookback_minutes: int = None, poll_seconds: float = DEFAULT_POLL_SECONDS,
+                chunksize: int = DEFAULT_CHUNKSIZE, polls: int = None, overlap_ids: int = TAIL_OVERLAP_IDS):
+    """Yield orders chunks: the last `lookback_minutes` of history (so the windows start
+    full, default the longest window), then every new order, polled every `poll_seconds`,
+    `polls` times (default: forever); an idle poll yields an empty frame.
+
+    order_ids are not committed in order, so a poll re-reads the `overlap_ids` ids below
+    the highest one seen and skips those already yielded; an order committed after
+    ids more than `overlap_ids` above it were read is missed.
+    """
+    lookback_minutes = lookback_minutes or max(m for m, _ in WINDOWS.values())
+    with engine.connect() as conn:
+        last_id, latest = conn.execute(text("SELECT MAX(order_id), MAX(order_datetime) FROM orders")).one()
+        after = int(last_id) if last_id is not None else 0
+        seen = set(conn.execute(text("SELECT order_id FROM orders WHERE order_id > :floor AND order_id <= :last"),
+                                {"floor": after - overlap_ids, "last": after}).scalars())
+    if last_id is not None:
+        since = (pd.Timestamp(latest) - pd.Timedelta(minutes=lookback_minutes)).to_pydatetime()
+        for chunk in iter_orders(engine, MONITOR_COLUMNS, chunksize,
+                                 where="order_datetime >= :since AND order_id <= :last",
+                                 params={"since": since, "last": after}, order_by="order_datetime"):
+            seen.update(chunk["order_id"].tolist())
+            yield chunk
+    done = 0
+    while polls is None or done < polls:
+        time.sleep(poll_seconds)
+        new = 0
+        for chunk in iter_orders(engine, MONITOR_COLUMNS, chunksize, where="order_id > :floor",
+                                 params={"floor": after - overlap_ids}, order_by="order_id"):
+            ids = chunk["order_id"].to_numpy("int64")
+            fresh = ~np.isin(ids, np.fromiter(seen, dtype="int64", count=len(seen)))
+            if fresh.any():
+                seen.update(ids[fresh].tolist())
+                after = max(after, int(ids.max()))
+                new += int(fresh.sum())
+                yield chunk[fresh]
+        seen = {i for i in seen if i > after - overlap_ids}
+        if not new:
+            yield pd.DataFrame(columns=MONITOR_COLUMNS)  # idle poll: lets a wall-clock caller move on
+        done += 1
+
+
+def read_orders_file(path: str) -> pd.DataFrame:
+    if path.endswith(".parquet"):
+        frame = pd.read_parquet(path)
+    elif path.endswith((".jsonl", ".json")):
+        frame = pd.read_json(path, lines=True)
+    else:
+        frame = pd.read_csv(path)
+    missing = [c for c in MONITOR_COLUMNS if c not in frame and c != "order_id"]
+    if missing:
+        raise ValueError(f"{path} lacks order columns: {', '.join(missing)}")
+    return compact_orders(frame[[c for c in MONITOR_COLUMNS if c in frame]].copy())
+
+
+def replay_orders(path: str, step_minutes: int = DEFAULT_STEP_MINUTES):
+    """Yield the orders in a file oldest first, one batch per `step_minutes` of event time."""
+    frame = read_orders_file(path).sort_values("order_datetime", kind="stable")
+    step = frame["order_datetime"].dt.floor(f"{step_minutes}min")
+    for _, batch in frame.groupby(step, sort=True):
+        yield batch
+
+
+# --------------------------
+# Run
+# --------------------------
+def write_kpis(monitor: KpiMonitor, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    monitor.kpis().round(4).to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def run(monitor: KpiMonitor, batches, alerts_path: str = DEFAULT_ALERTS_PATH, kpis_path: str = DEFAULT_KPIS_PATH,
+        wall_clock: bool = False, quiet: bool = False) -> int:
+    """Feed `batches` to the monitor, checking the rules after each; returns the number of alerts."""
+    n_alerts = 0
+    written = time.monotonic()
+    os.makedirs(os.path.dirname(alerts_path) or ".", exist_ok=True)
+    with open(alerts_path, "a", encoding="utf-8") as sink:
+        try:
+            for batch in batches:
+                monitor.update(batch)
+                if wall_clock:
+                    monitor.advance(pd.Timestamp.now())
+                for alert in monitor.check():
+                    sink.write(json.dumps(alert) + "\n")
+                    n_alerts += 1
+                    if not quiet:
+                        print(format_alert(alert))
+                sink.flush()
+                if kpis_path and time.monotonic() - written >= KPI_WRITE_SECONDS:
+                    write_kpis(monitor, kpis_path)
+                    written = time.monotonic()
+        except KeyboardInterrupt:
+            print("\nstopped")
+    if kpis_path:
+        write_kpis(monitor, kpis_path)
+    return n_alerts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rolling-window KPI monitor for new orders")
+    parser.add_argument("--replay", metavar="FILE", default=None,
+                        help="replay orders from a CSV/Parquet/JSON-lines file instead of tailing the database")
+    parser.add_argument("--step-minutes", type=int, default=DEFAULT_STEP_MINUTES,
+                        help="event time per batch in --replay mode")
+    parser.add_argument("--db-config", default=None, metavar="INI",
+                        help="database settings file (default: db.ini or $FOOD_DB_CONFIG)")
+    parser.add_argument("--lookback-minutes", type=int, default=None,
+                        help="history read before tailing (default: the longest window)")
+    parser.add_argument("--poll-seconds", type=float, default=DEFAULT_POLL_SECONDS)
+    parser.add_argument("--polls", type=int, default=None, help="stop after this many polls (default: run until ^C)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--wall-clock", action="store_true",
+                        help="advance the windows with the wall clock, not only with order times")
+    parser.add_argument("--min-orders", type=int, default=DEFAULT_MIN_ORDERS,
+                        help="orders (delivered orders for SLA/minutes rules) a key needs in a window to alert")
+    parser.add_argument("--clear-margin", type=float, default=DEFAULT_CLEAR_MARGIN,
+                        help="relative distance back inside a threshold before its alert resolves")
+    parser.add_argument("--max-cancel-rate", type=float, default=DEFAULT_RULES["cancel_rate"][1])
+    parser.add_argument("--max-return-rate", type=float, default=DEFAULT_RULES["return_rate"][1])
+    parser.add_argument("--min-sla30", type=float, default=DEFAULT_RULES["sla30"][1])
+    parser.add_argument("--max-p95", type=float, default=DEFAULT_RULES["p95_minutes"][1],
+                        help="p95 delivery minutes threshold")
+    parser.add_argument("--alerts", default=DEFAULT_ALERTS_PATH, help="JSON-lines file the alerts are appended to")
+    parser.add_argument("--kpis", default=DEFAULT_KPIS_PATH, help="CSV snapshot of the current window KPIs")
+    parser.add_argument("--quiet", action="store_true", help="do not print alerts")
+    args = parser.parse_args(argv)
+
+    rules = {"cancel_rate": (">", args.max_cancel_rate), "return_rate": (">", args.max_return_rate),
+             "sla30": ("<", args.min_sla30), "p95_minutes": (">", args.max_p95)}
+    monitor = KpiMonitor(rules=rules, min_orders=args.min_orders, clear_margin=args.clear_margin)
+    if args.replay:
+        batches = replay_orders(args.replay, args.step_minutes)
+    else:
+        engine = make_engine(db_settings(args.db_config))
+        batches = tail_orders(engine, args.lookback_minutes, args.poll_seconds, args.chunksize, args.polls)
+    n_alerts = run(monitor, batches, args.alerts, args.kpis, wall_clock=args.wall_clock, quiet=args.quiet)
+    late = ", ".join(f"{name} {n}" for name, n in monitor.late_orders().items())
+    print(f"\n{monitor.orders_seen} orders up to {monitor.watermark} (last order_id {monitor.last_order_id}), "
+          f"{n_alerts} alerts, {len(monitor.active)} open; late orders dropped: {late}")
+    print(f"alerts: {args.alerts}, window KPIs: {args.kpis}")
+
+
+if __name__ == "__main__":
+    main()
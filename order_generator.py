@@ -0,0 +1,244 @@
+"""
+order_generator.py
+Vectorized synthetic data for the Baghdad demo schema.
+Orders are generated with NumPy in fixed-size blocks, each block drawing
+from its own child of one SeedSequence, so the output is reproducible from
+the seed at any volume (and blocks can be generated independently). The
+distributions match the original per-row seeding loop: peak-hour weights,
+distance-driven delivery minutes and fees, the 92/6/2 status mix and a
+dropoff area that always differs from the vendor's area.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# ---- Fixed Baghdad areas (no airport) ----
+BAGHDAD_AREAS = [
+    "Mansour", "Karada", "Adhamiyah", "Kadhimiya", "Jadriyah",
+    "Zayouna", "Palestine Street", "Dora", "Sadr City",
+    "Yarmouk", "Bab Al Sharqi", "Karradat Mariam"
+]
+
+# ---- Vendors (restaurants) pinned to areas, with cuisine labels ----
+AREA_VENDORS = {
+    "Mansour": [
+        ("Route 99", "Burger"),
+        ("Pizza Roma", "Pizza"),
+        ("Samad Baghdad", "Iraqi"),
+        ("Cinnabon", "Dessert"),
+        ("Texas Chicken", "Fried Chicken"),
+        ("DipnDip", "Dessert"),
+        ("Kabab Al Baghdadi", "Kebab"),
+    ],
+    "Karada": [
+        ("Shawarma Al Reem", "Shawarma"),
+        ("Pizza Hut", "Pizza"),
+        ("Saj Al Reef", "Iraqi"),
+        ("MADO Café", "Dessert"),
+        ("Johnny Rockets", "Burger"),
+        ("KFC", "Fried Chicken"),
+        ("Masgouf House", "BBQ"),
+    ],
+    "Adhamiyah": [
+        ("Shawarma Time", "Shawarma"),
+        ("Little Italy Pizza", "Pizza"),
+        ("Al Samadi Sweets", "Dessert"),
+        ("Al Baghdadi Restaurant", "Iraqi"),
+        ("Crunchy Bite", "Fried Chicken"),
+        ("Wok Station", "Sushi"),
+    ],
+    "Kadhimiya": [
+        ("Kabab Abu Ali", "Kebab"),
+        ("Dough House", "Pizza"),
+        ("Blue Wave", "Seafood"),
+        ("Sushi House", "Sushi"),
+        ("Al Reef Grill", "BBQ"),
+        ("Café La Roche", "Cafe"),
+    ],
+    "Jadriyah": [
+        ("Route 99", "Burger"),
+        ("Cinnabon", "Dessert"),
+        ("Pizza Roma", "Pizza"),
+        ("Saj Al Reef", "Iraqi"),
+        ("Shawarma Al Reem", "Shawarma"),
+        ("Khan Murjan", "Iraqi"),
+    ],
+    "Zayouna": [
+        ("Shawarma Time", "Shawarma"),
+        ("Domino's Pizza", "Pizza"),
+        ("Texas Chicken", "Fried Chicken"),
+        ("DipnDip", "Dessert"),
+        ("Istanbul Shawarma", "Turkish"),
+        ("Ocean Fish", "Seafood"),
+    ],
+    "Palestine Street": [
+        ("Shawarma Palace", "Shawarma"),
+        ("Little Italy Pizza", "Pizza"),
+        ("Big Bite", "Burger"),
+        ("Kabab Al Baghdadi", "Kebab"),
+        ("Sushi House", "Sushi"),
+        ("Cinnabon", "Dessert"),
+    ],
+    "Dora": [
+        ("Chicken Time", "Fried Chicken"),
+        ("Pizza Hut", "Pizza"),
+        ("Al Baghdadi Restaurant", "Iraqi"),
+        ("BBQ Nation", "BBQ"),
+        ("Blue Wave", "Seafood"),
+    ],
+    "Sadr City": [
+        ("Shawarma Time", "Shawarma"),
+        ("Kabab Abu Ali", "Kebab"),
+        ("Route 99", "Burger"),
+        ("Dough House", "Pizza"),
+        ("KFC", "Fried Chicken"),
+    ],
+    "Yarmouk": [
+        ("Johnny Rockets", "Burger"),
+        ("Pizza Roma", "Pizza"),
+        ("Saj Al Reef", "Iraqi"),
+        ("Al Samadi Sweets", "Dessert"),
+        ("Wok Station", "Sushi"),
+    ],
+    "Bab Al Sharqi": [
+        ("Shawarma Palace", "Shawarma"),
+        ("Slice & Bake", "Pizza"),
+        ("Khan Murjan", "Iraqi"),
+        ("DipnDip", "Dessert"),
+        ("Ocean Fish", "Seafood"),
+    ],
+    "Karradat Mariam": [
+        ("MADO Café", "Dessert"),
+        ("Istanbul Shawarma", "Turkish"),
+        ("Al Reef Grill", "BBQ"),
+        ("Little Italy Pizza", "Pizza"),
+        ("Big Bite", "Burger"),
+    ],
+}
+
+# Slight peak around lunch/dinner
+HOUR_WEIGHTS = [2,2,2,2,3,4,6,7,8,9,10,10,9,8,7,7,7,9,10,10,9,6,4,3]
+STATUSES = ["delivered", "canceled", "returned"]
+STATUS_WEIGHTS = [92, 6, 2]
+HISTORY_DAYS = 120
+DEFAULT_BLOCK_SIZE = 1_000_000
+
+ORDER_COLUMNS = [
+    "customer_id", "driver_id", "vendor_id", "food_category", "order_datetime", "pickup_area",
+    "dropoff_area", "distance_km", "delivery_minutes", "subtotal", "delivery_fee", "tip",
+    "driver_rating", "status",
+]
+
+
+def vendor_names():
+    """(unique_name, cuisine, area) per vendor; brands in several areas get an area suffix."""
+    name_counts = {}
+    for area, items in AREA_VENDORS.items():
+        for name, cuisine in items:
+            name_counts[name] = name_counts.get(name, 0) + 1
+    return [(f"{name} - {area}" if name_counts[name] > 1 else name, cuisine, area)
+            for area, items in AREA_VENDORS.items() for name, cuisine in items]
+
+
+def _probabilities(weights) -> np.ndarray:
+    w = np.asarray(weights, dtype="float64")
+    return w / w.sum()
+
+
+def generate_block(rng: np.random.Generator, n: int, customer_ids, driver_ids, vendor_meta,
+                   base_date: datetime, areas=BAGHDAD_AREAS, days: int = HISTORY_DAYS) -> pd.DataFrame:
+    """`n` orders as a DataFrame with the orders table columns (minus order_id)."""
+    customer_ids = np.asarray(customer_ids)
+    driver_ids = np.asarray(driver_ids)
+    v_ids = np.asarray([m[0] for m in vendor_meta])
+    v_cuisine = np.asarray([m[1] for m in vendor_meta], dtype=object)
+    v_area = np.asarray([m[2] for m in vendor_meta], dtype=object)
+    area_arr = np.asarray(areas, dtype=object)
+    area_pos = {a: i for i, a in enumerate(areas)}
+    v_area_idx = np.asarray([area_pos.get(a, -1) for a in v_area])
+
+    cust = customer_ids[rng.integers(0, len(customer_ids), n)]
+    drv = driver_ids[rng.integers(0, len(driver_ids), n)]
+    v = rng.integers(0, len(v_ids), n)
+
+    hour = rng.choice(24, size=n, p=_probabilities(HOUR_WEIGHTS))
+    day = rng.integers(0, days, n)
+    minute = rng.integers(0, 60, n)
+    base = np.datetime64(base_date.date(), "m")
+    order_dt = base + (day * 1440 + hour * 60 + minute).astype("timedelta64[m]")
+
+    # dropoff != pickup: draw from the other areas and skip over the pickup's slot
+    pickup_idx = v_area_idx[v]
+    drop = rng.integers(0, len(areas) - 1, n)
+    drop = np.where(pickup_idx < 0, rng.integers(0, len(areas), n), drop + (drop >= pickup_idx))
+
+    distance = np.round(rng.uniform(0.8, 10.0, n), 2)
+    delivery_min = np.maximum(10, np.trunc(distance * rng.uniform(4.2, 7.2, n) + rng.integers(-3, 8, n))).astype("int32")
+    subtotal = np.round(rng.uniform(4.0, 30.0, n), 2)
+    delivery_fee = np.round(np.maximum(1.0, distance * rng.uniform(0.2, 0.8, n)), 2)
+    tip = np.round(np.maximum(0.0, rng.normal(1.0, 1.0, n)), 2)
+
+    status = rng.choice(len(STATUSES), size=n, p=_probabilities(STATUS_WEIGHTS))
+    rating = np.round(np.clip(rng.normal(4.4, 0.5, n), 1.0, 5.0), 2)
+    rating = np.where(status == 0, rating, np.nan)
+
+    return pd.DataFrame({
+        "customer_id": cust,
+        "driver_id": drv,
+        "vendor_id": v_ids[v],
+        "food_category": v_cuisine[v],
+        "order_datetime": order_dt.astype("datetime64[s]"),
+        "pickup_area": v_area[v],
+        "dropoff_area": area_arr[drop],
+        "distance_km": distance,
+        "delivery_minutes": delivery_min,
+        "subtotal": subtotal,
+        "delivery_fee": delivery_fee,
+        "tip": tip,
+        "driver_rating": rating,
+        "status": np.asarray(STATUSES, dtype=object)[status],
+    })
+
+
+def block_seeds(n: int, seed: int = 101, block_size: int = DEFAULT_BLOCK_SIZE) -> list:
+    """One SeedSequence child per block of `n` orders; block i is always seeded by child i."""
+    return np.random.SeedSequence(seed).spawn(-(-n // block_size))
+
+
+def order_block(i: int, seeds, n: int, customer_ids, driver_ids, vendor_meta, base_date: datetime,
+                block_size: int = DEFAULT_BLOCK_SIZE, areas=BAGHDAD_AREAS, days: int = HISTORY_DAYS) -> pd.DataFrame:
+    """Block `i` of `n` orders, generated independently of every other block."""
+    rows = min(block_size, n - i * block_size)
+    return generate_block(np.random.default_rng(seeds[i]), rows, customer_ids, driver_ids,
+                          vendor_meta, base_date, areas, days)
+
+
+def order_blocks(n: int, customer_ids, driver_ids, vendor_meta, seed: int = 101,
+                 base_date: datetime = None, block_size: int = DEFAULT_BLOCK_SIZE,
+                 areas=BAGHDAD_AREAS, days: int = HISTORY_DAYS, skip=()):
+    """Yield (block index, DataFrame) for `n` orders in blocks of at most `block_size` rows.
+
+    Block i always uses the i-th child of SeedSequence(seed), so the same
+    (seed, block_size, base_date) reproduces the same rows; blocks listed
+    in `skip` are not generated at all (used to resume a partial load).
+    """
+    if base_date is None:
+        base_date = datetime.now() - timedelta(days=days)
+    seeds = block_seeds(n, seed, block_size)
+    skip = set(skip)
+    for i in range(len(seeds)):
+        if i in skip:
+            continue
+        yield i, order_block(i, seeds, n, customer_ids, driver_ids, vendor_meta, base_date,
+                             block_size, areas, days)
+
+
+def generate_orders(n: int, customer_ids, driver_ids, vendor_meta, seed: int = 101,
+                    base_date: datetime = None, block_size: int = DEFAULT_BLOCK_SIZE,
+                    areas=BAGHDAD_AREAS, days: int = HISTORY_DAYS):
+    """Yield `n` orders as DataFrame blocks (see `order_blocks`)."""
+    for _, block in order_blocks(n, customer_ids, driver_ids, vendor_meta, seed, base_date,
+                                 block_size, areas, days):
+        yield block
@@ -0,0 +1,308 @@
+"""
+outliers.py
+Slow-delivery outliers: delivery minutes far above what the distance predicts.
+The model keeps one mergeable histogram of (group, distance, minutes)
+pairs, where distance is in cents of a km and minutes are whole. Orders
+are counted into it chunk by chunk, and the counts can be merged across
+partitions, persisted for incremental runs or pushed down to the database
+as a GROUP BY. The minutes ~ distance line is fitted from sums taken over
+the histogram (n, sums of x, y, x², xy, y²), globally or per group
+(dropoff area or hour). Residuals are scaled either by their standard
+deviation or robustly, by the median and MAD of a fixed-resolution residual
+histogram. That histogram is also computed from the pairs, so neither scale
+needs another pass over the orders. The same pairs give the z-score of the
+N-th slowest order, and `worst_bound` turns it into a
+`delivery_minutes >= a * distance_km + b` predicate. The one pass that
+picks the worst orders (`scan_slowest`) therefore only reads candidates.
+They are kept with a partial selection (np.partition), never a full sort,
+and `flag` scores newly arrived orders against a fitted model.
+
+    model = SlowDeliveryModel(by="dropoff_area", robust=True)
+    for chunk in chunks: model.update(chunk)      # or model.merge(...), model.add_counts(...)
+    worst = scan_slowest(engine, model)            # one pass over candidate orders
+"""
+
+import numpy as np
+import pandas as pd
+
+from streaming import (DEFAULT_CHUNKSIZE, OUTLIER_COLUMNS, OUTLIER_TOP_N, as_float64, fit_from_sums,
+                       iter_orders, top_slowest)
+
+MIN_GROUP_ORDERS = 30   # smaller groups are scored with the global model
+RESIDUAL_RANGE = 240.0  # minutes; residuals beyond +-range land in the edge bins
+RESIDUAL_RESOLUTION = 0.1
+MAD_TO_STD = 1.4826
+GROUP_KEYS = (None, "dropoff_area", "hour")
+GROUP_COLUMNS = {None: [], "dropoff_area": ["dropoff_area"], "hour": ["order_datetime"]}
+_SUMS = ("n", "sx", "sy", "sxx", "sxy", "syy")
+# pair keys: group code << 40 | distance in cents << 20 | minutes
+_FIELD_BITS = 20
+_FIELD_MASK = (1 << _FIELD_BITS) - 1
+COMPACT_EVERY = 8
+BOUND_MARGIN = 1e-6  # minutes of slack on the pushed-down candidate predicate
+
+
+def _xy(frame: pd.DataFrame):
+    return as_float64(frame["distance_km"]), frame["delivery_minutes"].to_numpy("float64")
+
+
+def _hist_quantile(counts: np.ndarray, centers: np.ndarray, q: float) -> float:
+    cum = np.cumsum(counts)
+    return float(centers[np.searchsorted(cum, q * cum[-1], side="left")])
+
+
+def _pack(codes, cents, minutes) -> np.ndarray:
+    return (np.asarray(codes, dtype="int64") << (2 * _FIELD_BITS)) | (cents << _FIELD_BITS) | minutes
+
+
+def _unpack(keys: np.ndarray):
+    """(group codes, distance km, minutes) of packed pair keys."""
+    cents = (keys >> _FIELD_BITS) & _FIELD_MASK
+    return keys >> (2 * _FIELD_BITS), cents / 100.0, (keys & _FIELD_MASK).astype("float64")
+
+
+def _count_keys(keys: np.ndarray, weights=None):
+    uniques, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse.ravel(), weights=weights, minlength=len(uniques))
+    return uniques, np.rint(counts).astype("int64")
+
+
+class SlowDeliveryModel:
+    """Linear minutes ~ distance model with residual z-scores, optionally per group."""
+
+    def __init__(self, by: str = None, robust: bool = False):
+        if by not in GROUP_KEYS:
+            raise ValueError(f"by must be one of {GROUP_KEYS}, got {by!r}")
+        self.by = by
+        self.robust = robust
+        self.groups = {}  # group value -> code; code 0 is the global model
+        n_bins = int(2 * RESIDUAL_RANGE / RESIDUAL_RESOLUTION) + 1
+        self.centers = np.linspace(-RESIDUAL_RANGE, RESIDUAL_RANGE, n_bins)
+        self._parts = []  # (sorted pair keys, counts)
+        self._lines = self._params = None
+
+    def __getstate__(self):
+        # persisted without the cached fits, which depend on `robust`
+        self._compact()
+        return {**self.__dict__, "_lines": None, "_params": None}
+
+    # ---- groups ----
+    def _group_values(self, frame: pd.DataFrame) -> np.ndarray:
+        if self.by == "hour" and "hour" not in frame:
+            return frame["order_datetime"].dt.hour.to_numpy()
+        return np.asarray(frame[self.by].astype(str) if self.by == "dropoff_area" else frame[self.by])
+
+    def _codes(self, frame: pd.DataFrame, grow: bool) -> np.ndarray:
+        """Model row per order: 1.. for groups (0 for unknown groups), 0 without grouping."""
+        if self.by is None:
+            return np.zeros(len(frame), dtype="int64")
+        return self._value_codes(self._group_values(frame), grow)
+
+    def _value_codes(self, values, grow: bool) -> np.ndarray:
+        codes, uniques = pd.factorize(np.asarray(values))
+        if grow:
+            for u in uniques:
+                if u not in self.groups:
+                    self.groups[u] = len(self.groups) + 1
+        lookup = np.asarray([self.groups.get(u, 0) for u in uniques], dtype="int64")
+        return lookup[codes] if len(codes) else codes.astype("int64")
+
+    # ---- the (group, distance, minutes) histogram ----
+    def _add(self, codes, x, y, counts=None):
+        if not len(codes):
+            return
+        cents = np.rint(np.asarray(x, dtype="float64") * 100).astype("int64")
+        minutes = np.rint(np.asarray(y, dtype="float64")).astype("int64")
+        self._parts.append(_count_keys(_pack(codes, cents, minutes), counts))
+        if len(self._parts) >= COMPACT_EVERY:
+            self._compact()
+        self._lines = self._params = None
+
+    def _compact(self):
+        if len(self._parts) > 1:
+            keys = np.concatenate([k for k, _ in self._parts])
+            counts = np.concatenate([c for _, c in self._parts])
+            self._parts = [_count_keys(keys, counts.astype("float64"))]
+
+    def pairs(self):
+        """(group codes, distance km, minutes, orders) of every distinct pair, in key order."""
+        self._compact()
+        if not self._parts:
+            return np.zeros(0, dtype="int64"), np.zeros(0), np.zeros(0), np.zeros(0, dtype="int64")
+        keys, counts = self._parts[0]
+        return (*_unpack(keys), counts)
+
+    def update(self, frame: pd.DataFrame):
+        """Count delivered orders into the pair histogram."""
+        if not len(frame):
+            return
+        x, y = _xy(frame)
+        self._add(self._codes(frame, grow=True), x, y)
+
+    def add_counts(self, groups, distance_km, minutes, counts):
+        """Fold pre-counted pairs, e.g. from a GROUP BY pushed down to the database;
+        `groups` is ignored without grouping."""
+        codes = (np.zeros(len(counts), dtype="int64") if self.by is None
+                 else self._value_codes(groups, grow=True))
+        self._add(codes, distance_km, minutes, np.asarray(counts, dtype="float64"))
+
+    def merge(self, other: "SlowDeliveryModel"):
+        """Add another model's pairs (same `by`), e.g. from another partition."""
+        if other.by != self.by:
+            raise ValueError("cannot merge models grouped by different keys")
+        mapping = np.zeros(len(other.groups) + 1, dtype="int64")
+        for value, code in other.groups.items():
+            if value not in self.groups:
+                self.groups[value] = len(self.groups) + 1
+            mapping[code] = self.groups[value]
+        for keys, counts in other._parts:
+            low = keys & ((1 << (2 * _FIELD_BITS)) - 1)
+            self._parts.append(_count_keys((mapping[keys >> (2 * _FIELD_BITS)] << (2 * _FIELD_BITS)) | low,
+                                           counts.astype("float64")))
+        self._compact()
+        self._lines = self._params = None
+
+    @property
+    def sums(self) -> np.ndarray:
+        """n, sx, sy, sxx, sxy, syy per model row (row 0 = every order), from the pairs."""
+        codes, x, y, c = self.pairs()
+        rows = len(self.groups) + 1
+        sums = np.stack([np.bincount(codes, weights=w, minlength=rows)
+                         for w in (c, c * x, c * y, c * x * x, c * x * y, c * y * y)], axis=1)
+        sums[0] = sums.sum(axis=0)
+        return sums
+
+    def lines(self) -> pd.DataFrame:
+        """slope, intercept and the classical residual mean/std per model row (row 0 = global)."""
+        if self._lines is None:
+            all_sums = self.sums
+            glob = fit_from_sums(*all_sums[0])
+            if glob is None:
+                return None
+            rows = []
+            for i, sums in enumerate(all_sums):
+                fit = fit_from_sums(*sums) if i == 0 or sums[0] >= MIN_GROUP_ORDERS else None
+                rows.append(fit if fit is not None else glob)
+            self._lines = pd.DataFrame(rows, columns=["slope", "intercept", "center", "scale"])
+            self._lines["n"] = all_sums[:, 0].astype("int64")
+        return self._lines
+
+    def residual_hist(self) -> np.ndarray:
+        """Orders per residual bin (`centers`) under each row's fitted line; row 0 = every order."""
+        codes, x, y, c = self.pairs()
+        lines = self.lines()
+        res = y - (lines["slope"].to_numpy()[codes] * x + lines["intercept"].to_numpy()[codes])
+        n_bins = len(self.centers)
+        bins = np.clip(np.rint((res + RESIDUAL_RANGE) / RESIDUAL_RESOLUTION), 0, n_bins - 1).astype("int64")
+        rows = len(self.groups) + 1
+        hist = np.bincount(codes * n_bins + bins, weights=c, minlength=rows * n_bins).reshape(rows, n_bins)
+        hist[0] = hist.sum(axis=0)
+        return np.rint(hist).astype("int64")
+
+    def fit(self) -> pd.DataFrame:
+        """`lines()` with center/scale replaced by the residual median and scaled MAD when robust;
+        None if too few orders."""
+        if self._params is not None:
+            return self._params
+        if self.lines() is None:
+            return None
+        params = self.lines().copy()
+        if self.robust:
+            hist = self.residual_hist()
+            for i, counts in enumerate(hist):
+                counts = counts if counts.sum() >= MIN_GROUP_ORDERS else hist[0]
+                median = _hist_quantile(counts, self.centers, 0.5)
+                order = np.argsort(np.abs(self.centers - median), kind="stable")
+                mad = _hist_quantile(counts[order], np.abs(self.centers - median)[order], 0.5)
+                if mad > 0:
+                    params.loc[i, ["center", "scale"]] = median, MAD_TO_STD * mad
+        self._params = params
+        return params
+
+    def worst_bound(self, n: int = OUTLIER_TOP_N):
+        """(a, b) such that each of the `n` highest-scoring orders (and every order tied
+        with the n-th) has delivery_minutes >= a * distance_km + b; None without a fit.
+
+        The z-score of the n-th order comes from the pairs. An order with that z-score
+        under row g's line has minutes >= slope_g*x + intercept_g + center_g + z*scale_g.
+        The smallest of these lines over all rows is concave in x, so the chord
+        between its values at the shortest and longest distances lies below it.
+        """
+        params = self.fit()
+        codes, x, y, c = self.pairs()
+        if params is None or not len(c):
+            return None
+        slope, intercept = params["slope"].to_numpy(), params["intercept"].to_numpy()
+        center, scale = params["center"].to_numpy(), params["scale"].to_numpy()
+        z = (y - (slope[codes] * x + intercept[codes]) - center[codes]) / scale[codes]
+        order = np.argsort(-z, kind="stable")
+        nth = min(int(np.searchsorted(np.cumsum(c[order]), n)), len(order) - 1)
+        floor = intercept + center + z[order[nth]] * scale
+        lo, hi = x.min(), x.max()
+        at_lo, at_hi = (slope * lo + floor).min(), (slope * hi + floor).min()
+        a = (at_hi - at_lo) / (hi - lo) if hi > lo else 0.0
+        return float(a), float(at_lo - a * lo - BOUND_MARGIN)
+
+    def residuals(self, frame: pd.DataFrame) -> np.ndarray:
+        """Minutes above the fitted line for each order."""
+        x, y = _xy(frame)
+        p = self.lines().iloc[self._codes(frame, grow=False)]
+        return y - (p["slope"].to_numpy() * x + p["intercept"].to_numpy())
+
+    # ---- scoring ----
+    def score(self, frame: pd.DataFrame) -> np.ndarray:
+        """Residual z-score of every order (higher = slower than the model predicts)."""
+        p = self.fit().iloc[self._codes(frame, grow=False)]
+        return (self.residuals(frame) - p["center"].to_numpy()) / p["scale"].to_numpy()
+
+    def flag(self, frame: pd.DataFrame, threshold: float = 3.0) -> pd.DataFrame:
+        """Orders (e.g. just arrived) whose z-score exceeds `threshold`, worst first."""
+        z = self.score(frame)
+        hits = np.flatnonzero(z > threshold)
+        hits = hits[np.argsort(-z[hits], kind="stable")]
+        return frame.iloc[hits].assign(residual_z=z[hits])
+
+
+class TopN:
+    """The `n` highest-scoring rows over a stream of chunks, by partial selection.
+
+    Ties go to the lower order_id (see streaming.top_slowest).
+    """
+
+    def __init__(self, n: int = OUTLIER_TOP_N):
+        self.n = n
+        self.rows = None
+
+    def update(self, frame: pd.DataFrame, scores):
+        scores = np.asarray(scores, dtype="float64")
+        if len(scores) > self.n:
+            # kth-largest cut by partial selection; keep everything tied at the cut, order later
+            cut = np.partition(scores, len(scores) - self.n)[len(scores) - self.n]
+            keep = np.flatnonzero(scores >= cut)
+            frame, scores = frame.iloc[keep], scores[keep]
+        part = frame.reset_index(drop=True).assign(residual_z=scores)
+        both = part if self.rows is None else pd.concat([self.rows, part], ignore_index=True)
+        self.rows = top_slowest(both, self.n)
+
+    def merge(self, other: "TopN"):
+        if other.rows is not None:
+            self.update(other.rows.drop(columns="residual_z"), other.rows["residual_z"])
+
+    def result(self) -> pd.DataFrame:
+        return self.rows.reset_index(drop=True) if self.rows is not None else pd.DataFrame()
+
+
+def scan_slowest(engine, model: SlowDeliveryModel, n: int = OUTLIER_TOP_N,
+                 chunksize: int = DEFAULT_CHUNKSIZE, where: str = None, params: dict = None) -> pd.DataFrame:
+    """The worst `n` delivered orders under a fitted `model`, from one narrow pass
+    that only reads the orders `model.worst_bound(n)` leaves as candidates."""
+    bound = model.worst_bound(n)
+    if bound is None:
+        return None
+    clause = "status = 'delivered' AND delivery_minutes >= :_slope * distance_km + :_floor"
+    params = {**(params or {}), "_slope": bound[0], "_floor": bound[1]}
+    top = TopN(n)
+    for chunk in iter_orders(engine, OUTLIER_COLUMNS + GROUP_COLUMNS[model.by], chunksize,
+                             where=clause + (f" AND {where}" if where else ""), params=params):
+        top.update(chunk, model.score(chunk))
+    return top.result()
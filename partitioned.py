@@ -0,0 +1,92 @@
+"""
+partitioned.py
+Multi-process execution of the streaming scan, partitioned by date.
+`orders` is split into contiguous, day-aligned `order_datetime` ranges
+(range predicates that idx_orders_datetime serves directly). Each range is
+scanned by a worker process into its own OrderAggregates, and the
+partials are merged in date order: counts, sums, SLA hits, min/max
+first/last order, per-vendor-hour counts and quantile sketches all add up
+to the single-process result, and so does an outlier model's pair
+histogram and the ETA model's cell sums. The global-model slow-delivery outliers need the global fit,
+so they take a second, narrow parallel pass per range.
+
+Workers open their own engine from the URL; there are a few more ranges
+than workers so a busy month does not hold up the pool.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from eta import EtaModel
+from outliers import SlowDeliveryModel
+from streaming import (AGGREGATE_SECTIONS, DEFAULT_CHUNKSIZE, SCATTER_SAMPLE, OrderAggregates, columns_for,
+                       iter_orders, slowest_rows, top_slowest)
+
+PARTITIONS_PER_WORKER = 4
+RANGE_WHERE = "order_datetime >= :lo AND order_datetime < :hi"
+
+
+def date_partitions(engine, n: int) -> list:
+    """Up to `n` half-open (lo, hi) day-aligned ranges covering every order."""
+    with engine.connect() as conn:
+        lo, hi = conn.execute(text("SELECT MIN(order_datetime), MAX(order_datetime) FROM orders")).one()
+    if lo is None:
+        return []
+    first = pd.Timestamp(lo).normalize()
+    days = (pd.Timestamp(hi).normalize() - first).days + 1
+    n = max(1, min(n, days))
+    cuts = [first + pd.Timedelta(days=round(i * days / n)) for i in range(n + 1)]
+    return [(a.to_pydatetime(), b.to_pydatetime()) for a, b in zip(cuts, cuts[1:])]
+
+
+def _engine_url(engine) -> str:
+    return engine.url.render_as_string(hide_password=False)
+
+
+def _scan_range(url: str, lo, hi, chunksize: int, sample_points: int, seed: int,
+                outlier_spec=None, eta: bool = False) -> OrderAggregates:
+    engine = create_engine(url)
+    # each range counts into its own empty models; the parent's are filled by the merges
+    model = SlowDeliveryModel(*outlier_spec) if outlier_spec else None
+    aggs = OrderAggregates(sample_points, outlier_pool=0, sample_seed=seed, outlier_model=model,
+                           eta_model=EtaModel() if eta else None)
+    sections = [s for s in AGGREGATE_SECTIONS if s != "outliers"]
+    for chunk in iter_orders(engine, columns_for(sections), chunksize, where=RANGE_WHERE,
+                             params={"lo": lo, "hi": hi}):
+        aggs.update(chunk)
+    engine.dispose()
+    return aggs
+
+
+def _slowest_range(url: str, lo, hi, fit, chunksize: int) -> pd.DataFrame:
+    engine = create_engine(url)
+    best = slowest_rows(engine, fit, chunksize, where=RANGE_WHERE, params={"lo": lo, "hi": hi})
+    engine.dispose()
+    return best
+
+
+def scan_partitioned(engine, vendors: pd.DataFrame, drivers: pd.DataFrame, customers: pd.DataFrame,
+                     workers: int = None, chunksize: int = DEFAULT_CHUNKSIZE,
+                     sample_points: int = SCATTER_SAMPLE, outlier_model=None, eta_model=None) -> dict:
+    """Like streaming.scan_orders, with the date ranges scanned in `workers` processes."""
+    workers = workers or os.cpu_count() or 1
+    ranges = date_partitions(engine, workers * PARTITIONS_PER_WORKER)
+    url = _engine_url(engine)
+    aggs = OrderAggregates(sample_points, outlier_pool=0, outlier_model=outlier_model, eta_model=eta_model)
+    spec = (outlier_model.by, outlier_model.robust) if outlier_model is not None else None
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_scan_range, url, lo, hi, chunksize, sample_points, seed, spec,
+                               eta_model is not None)
+                   for seed, (lo, hi) in enumerate(ranges, start=101)]
+        for f in futures:
+            aggs.merge(f.result())
+        fit = aggs.fit()
+        worst = None
+        if fit is not None and outlier_model is None:
+            parts = list(pool.map(_slowest_range, *zip(*[(url, lo, hi, fit, chunksize) for lo, hi in ranges])))
+            best = top_slowest(pd.concat(parts, ignore_index=True))
+            worst = best.merge(vendors[["vendor_id", "vendor_name", "area"]], on="vendor_id", how="left")
+    return aggs.tables(vendors, drivers, customers, worst=worst)
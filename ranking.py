@@ -0,0 +1,142 @@
+"""
+ranking.py
+Top-K rows per group without sorting the whole table.
+Group keys are factorized into one integer code per row, and the K best
+rows of every group are picked in vectorized passes over those codes:
+groups with at most K rows are kept whole; for K = 1 one np.minimum.at
+gives each group's best value; for larger K each group's rows are split
+into K slots whose minima bound the K-th best value, which prunes most
+rows before the K-th value itself is read off one int64 sort of the
+survivors. Only the candidates (about K per group, plus ties at the cut)
+are then ordered, by group, the ranking columns and finally row position,
+so ties always resolve the same way: by the tie-break columns given, then
+by input order.
+
+    top_k(vh, by="area", columns=["orders", "hour"], ascending=[False, True], k=1)   # peak hour per area
+    top_k(cust, columns=["orders", "customer_id"], ascending=[False, True], k=15)    # top customers
+"""
+
+import numpy as np
+import pandas as pd
+
+from groupby_engine import combine_codes, factorize
+
+
+def _as_list(value) -> list:
+    return [] if value is None else [value] if isinstance(value, str) else list(value)
+
+
+def rank_key(values, ascending: bool = True) -> np.ndarray:
+    """float64 key where smaller ranks first; NaN/None rank last in either direction."""
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        key = values.to_numpy("datetime64[ns]").astype("int64").astype("float64")
+        key[values.isna().to_numpy()] = np.nan
+    elif pd.api.types.is_bool_dtype(values) or pd.api.types.is_numeric_dtype(values):
+        key = values.to_numpy("float64", na_value=np.nan)
+    else:
+        codes, _ = factorize(values)
+        key = np.where(codes < 0, np.nan, codes).astype("float64")
+    key = key if ascending else -key
+    return np.where(np.isnan(key), np.inf, key)
+
+
+def group_codes(frame: pd.DataFrame, by) -> tuple:
+    """(codes, n_groups) for one or more key columns, codes in sorted key order; -1 where a key is missing."""
+    by = _as_list(by)
+    if not by:
+        return np.zeros(len(frame), dtype="int64"), 1
+    parts = [factorize(frame[col]) for col in by]
+    missing = np.zeros(len(frame), dtype=bool)
+    for codes, _ in parts:
+        missing |= codes < 0
+    if len(parts) == 1:
+        codes, uniques = parts[0]
+        return codes.astype("int64"), len(uniques)
+    combined = combine_codes(*[(np.where(codes < 0, 0, codes), len(uniques)) for codes, uniques in parts])
+    n_combined = int(np.prod([len(uniques) for _, uniques in parts], dtype="float64"))
+    if n_combined <= 4 * len(frame):
+        # the combined codes are already in lexicographic key order; a few empty groups are cheap
+        return np.where(missing, -1, combined), n_combined
+    # sparse key space: re-densify (sorting the uniques only keeps the key order)
+    codes, uniques = pd.factorize(combined[~missing], sort=True)
+    out = np.full(len(frame), -1, dtype="int64")
+    out[~missing] = codes
+    return out, len(uniques)
+
+
+def select_top_k(codes, key, k: int, n_groups: int = None) -> np.ndarray:
+    """Boolean mask of the rows that can be among the `k` smallest `key` of their group.
+
+    Exact at the cut: every row tied with a group's k-th value is included, so the
+    caller decides ties. Rows with code -1 are never selected.
+    """
+    codes = np.asarray(codes, dtype="int64")
+    key = np.asarray(key, dtype="float64")
+    n_groups = int(codes.max()) + 1 if n_groups is None and len(codes) else (n_groups or 0)
+    keep = np.zeros(len(codes), dtype=bool)
+    if k <= 0 or not len(codes):
+        return keep
+    valid = codes >= 0
+    sizes = np.bincount(codes[valid], minlength=n_groups)
+    small = valid & (sizes[np.where(valid, codes, 0)] <= k)
+    keep[small] = True   # groups with at most k rows are kept whole
+    rest = np.flatnonzero(valid & ~small)
+    if k > 1 and len(rest):
+        # Prune first: split each group's rows into k slots (by row position); the k slot
+        # minima are k distinct rows, so the group's k-th smallest is at most their maximum.
+        c = codes[rest]
+        slot_min = np.full(n_groups * k, np.inf)
+        np.minimum.at(slot_min, c * k + rest % k, key[rest])
+        bound = slot_min.reshape(n_groups, k).max(axis=1)
+        rest = rest[key[rest] <= bound[c]]
+    if not len(rest):
+        return keep
+    c, v = codes[rest], key[rest]
+    if k == 1:
+        best = np.full(n_groups, np.inf)
+        np.minimum.at(best, c, v)
+        keep[rest[v <= best[c]]] = True
+        return keep
+    # k-th smallest per group: one sort of the survivors on a single int64 (group, dense value rank) key
+    ranks, values = pd.factorize(v, sort=True)
+    order = np.sort(c * len(values) + ranks)
+    groups = order // len(values)
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    kth = np.full(n_groups, np.inf)
+    kth[groups[starts]] = values[order[starts + k - 1] % len(values)]
+    keep[rest[v <= kth[c]]] = True
+    return keep
+
+
+def rank_order(codes, keys) -> np.ndarray:
+    """Stable ordering of rows by group code, then each key in turn (ties keep row order)."""
+    parts = [pd.factorize(np.asarray(values), sort=True) for values in [codes, *keys]]
+    if np.prod([float(len(uniques)) for _, uniques in parts]) < 2.0 ** 62:
+        # one stable int64 sort on the combined dense ranks instead of a multi-key lexsort
+        return np.argsort(combine_codes(*[(ranks, len(uniques)) for ranks, uniques in parts]), kind="stable")
+    # lexsort sorts by its last key first
+    return np.lexsort([ranks for ranks, _ in reversed(parts)])
+
+
+def top_k(frame: pd.DataFrame, columns, k: int, by=None, ascending=False) -> pd.DataFrame:
+    """The `k` first rows of each `by` group when ranked on `columns`.
+
+    `columns` rank lexicographically (the first one drives the selection, the rest
+    break its ties) and `ascending` is one flag or one per column; remaining ties keep
+    input order. Groups come out in sorted key order and rows in rank order, like
+    frame.sort_values([*by, *columns]).groupby(by).head(k), with the original index.
+    Rows with a missing group key are dropped, as groupby does.
+    """
+    columns = _as_list(columns)
+    ascending = [ascending] * len(columns) if isinstance(ascending, bool) else list(ascending)
+    if len(ascending) != len(columns):
+        raise ValueError("ascending needs one flag per ranking column")
+    codes, n_groups = group_codes(frame, by)
+    keys = [rank_key(frame[col], asc) for col, asc in zip(columns, ascending)]
+    rows = np.flatnonzero(select_top_k(codes, keys[0], k, n_groups))
+    rows = rows[rank_order(codes[rows], [key[rows] for key in keys])]
+    grp = codes[rows]
+    starts = np.flatnonzero(np.r_[True, grp[1:] != grp[:-1]]) if len(grp) else np.array([], dtype="int64")
+    rank = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+    return frame.iloc[rows[rank < k]]
@@ -0,0 +1,165 @@
+"""
+run_report.py
+Per-section instrumentation for analysis.py.
+A stage lasts from its `stage()` call to the next one. analysis.py builds
+its tables lazily, so a stage is charged for every table it is the first to
+use; tables that several requested outputs share are built in their own
+"Shared tables" stage before the output sections. For each stage we record wall and CPU time, the change in
+resident memory and in peak RSS, the tracemalloc peak (with
+--trace-memory), rows in/out as reported by the section, and the number
+and execute time of database queries issued through the SQLAlchemy engine
+(fetching streamed chunks shows up in wall time, not DB time).
+With a profile directory, every stage also gets its own cProfile dump.
+The run ends with a JSON report and a summary table.
+"""
+
+import cProfile
+import json
+import os
+import re
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy import event
+
+DEFAULT_REPORT_PATH = "outputs/run_report.json"
+
+
+def _rss_bytes() -> int:
+    """Current resident set size (0 where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+
+
+class RunReport:
+    """Timings and memory per stage of one analysis run.
+
+    report = RunReport(engine)
+    report.stage("Global KPIs", rows_in=len(deliv))
+    ...
+    report.rows(out=len(area_kpis))
+    report.finish(); report.write(); print(report.summary())
+    """
+
+    def __init__(self, engine=None, profile_dir: str = None, trace_memory: bool = False):
+        self.stages = []
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.started = datetime.now()
+        self._current = None
+        self._query_start = {}
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if engine is not None:
+            event.listen(engine, "before_cursor_execute", self._before_query)
+            event.listen(engine, "after_cursor_execute", self._after_query)
+
+    # ---- DB query time ----
+    def _before_query(self, conn, cursor, statement, parameters, context, executemany):
+        self._query_start[id(cursor)] = time.perf_counter()
+
+    def _after_query(self, conn, cursor, statement, parameters, context, executemany):
+        start = self._query_start.pop(id(cursor), None)
+        if start is not None and self._current is not None:
+            self._current["db_queries"] += 1
+            self._current["db_seconds"] += time.perf_counter() - start
+
+    # ---- stages ----
+    def stage(self, name: str, rows_in: int = None):
+        """End the running stage (if any) and start measuring `name`."""
+        self._close()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        profiler = None
+        if self.profile_dir:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        self._current = {
+            "name": name, "rows_in": rows_in, "rows_out": None, "db_queries": 0, "db_seconds": 0.0,
+            "_wall": time.perf_counter(), "_cpu": time.process_time(), "_rss": _rss_bytes(),
+            "_peak_rss": _peak_rss_bytes(),
+            "_traced": tracemalloc.get_traced_memory()[0] if self.trace_memory else 0,
+            "_profiler": profiler,
+        }
+
+    def rows(self, rows_in: int = None, out: int = None):
+        """Record the rows the running stage read and/or produced."""
+        if self._current is None:
+            return
+        if rows_in is not None:
+            self._current["rows_in"] = int(rows_in)
+        if out is not None:
+            self._current["rows_out"] = int(out)
+
+    def _close(self):
+        cur, self._current = self._current, None
+        if cur is None:
+            return
+        profiler = cur.pop("_profiler")
+        if profiler is not None:
+            profiler.disable()
+            path = os.path.join(self.profile_dir, f"{len(self.stages):02d}_{_slug(cur['name'])}.prof")
+            profiler.dump_stats(path)
+            cur["profile"] = path
+        cur["wall_seconds"] = time.perf_counter() - cur.pop("_wall")
+        cur["cpu_seconds"] = time.process_time() - cur.pop("_cpu")
+        cur["rss_delta_mb"] = (_rss_bytes() - cur.pop("_rss")) / 2**20
+        cur["peak_rss_growth_mb"] = (_peak_rss_bytes() - cur.pop("_peak_rss")) / 2**20
+        start_traced = cur.pop("_traced")
+        if self.trace_memory:
+            cur["tracemalloc_peak_mb"] = (tracemalloc.get_traced_memory()[1] - start_traced) / 2**20
+        self.stages.append(cur)
+
+    def finish(self):
+        self._close()
+        if self.trace_memory:
+            tracemalloc.stop()
+
+    # ---- output ----
+    def as_dict(self) -> dict:
+        return {
+            "started": self.started.isoformat(timespec="seconds"),
+            "argv": sys.argv[1:],
+            "wall_seconds": sum(s["wall_seconds"] for s in self.stages),
+            "cpu_seconds": sum(s["cpu_seconds"] for s in self.stages),
+            "db_seconds": sum(s["db_seconds"] for s in self.stages),
+            "peak_rss_mb": _peak_rss_bytes() / 2**20,
+            "stages": self.stages,
+        }
+
+    def write(self, path: str = DEFAULT_REPORT_PATH) -> str:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+        return path
+
+    def summary(self) -> str:
+        head = f"{'stage':<36}{'wall s':>9}{'cpu s':>9}{'db s':>9}{'queries':>9}{'rss MB':>9}{'rows in':>11}{'rows out':>10}"
+        lines = [head, "-" * len(head)]
+        fmt = lambda v: "" if v is None else str(v)
+        for s in self.stages:
+            lines.append(f"{s['name'][:35]:<36}{s['wall_seconds']:>9.3f}{s['cpu_seconds']:>9.3f}"
+                         f"{s['db_seconds']:>9.3f}{s['db_queries']:>9}{s['rss_delta_mb']:>+9.1f}"
+                         f"{fmt(s['rows_in']):>11}{fmt(s['rows_out']):>10}")
+        total = self.as_dict()
+        lines.append("-" * len(head))
+        lines.append(f"{'total':<36}{total['wall_seconds']:>9.3f}{total['cpu_seconds']:>9.3f}"
+                     f"{total['db_seconds']:>9.3f}{'':>9}{'peak ' + format(total['peak_rss_mb'], '.0f'):>9}")
+        return "\n".join(lines)
@@ -0,0 +1,144 @@
+"""
+sketches.py
+Mergeable quantile sketch for percentiles on streaming or partitioned data.
+A sketch holds counts per (group, key) and is built from whole arrays in one
+vectorized pass. Sketches built over different chunks, days or processes
+are merged by adding their counts, and can be queried for any percentile.
+
+While the number of distinct (group, value) pairs stays under `max_exact`
+the keys are the values themselves and quantiles are exact (integer
+columns such as delivery_minutes never leave this mode). Past that the
+sketch collapses into logarithmic buckets (DDSketch-style), which bounds
+its size and keeps every quantile within `relative_accuracy` of the true
+value.
+"""
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_RELATIVE_ACCURACY = 0.005
+DEFAULT_MAX_EXACT = 100_000
+_OFFSET = 1_000_000  # shifts bucket indices so keys stay monotone in value across signs
+
+
+def quantile_from_counts(values, counts, q: float) -> float:
+    """Exact `Series.quantile(q)` (linear interpolation) from a value histogram."""
+    order = np.argsort(values, kind="stable")
+    values = np.asarray(values, dtype="float64")[order]
+    cum = np.cumsum(np.asarray(counts)[order])
+    if not len(cum) or cum[-1] == 0:
+        return np.nan
+    h = (cum[-1] - 1) * q
+    lo, hi = int(np.floor(h)), int(np.ceil(h))
+    v_lo = values[np.searchsorted(cum, lo, side="right")]
+    v_hi = values[np.searchsorted(cum, hi, side="right")]
+    return v_lo + (h - lo) * (v_hi - v_lo)
+
+
+class QuantileSketch:
+    """Per-group mergeable quantile sketch.
+
+    sk = QuantileSketch()
+    sk.update(minutes, groups=areas)      # one vectorized pass per chunk
+    sk.merge(other_sketch)                # other chunks / processes / days
+    sk.quantile([0.5, 0.95, 0.99])        # DataFrame: group x percentile
+    """
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+                 max_exact: int = DEFAULT_MAX_EXACT):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.max_exact = max_exact
+        self.exact = True
+        self.counts = None  # Series indexed by (group, key)
+
+    # ---- building ----
+    def update(self, values, groups=None):
+        """Add `values` (optionally labelled by `groups`, same length)."""
+        values = np.asarray(values, dtype="float64")
+        if groups is None:
+            groups = np.zeros(len(values), dtype="int8")
+        keep = ~np.isnan(values)
+        values, groups = values[keep], np.asarray(groups)[keep]
+        if not len(values):
+            return
+        keys = values if self.exact else self._bucket(values)
+        part = pd.DataFrame({"group": groups, "key": keys}).value_counts(sort=False)
+        self._add(part)
+
+    def merge(self, other: "QuantileSketch"):
+        """Fold another sketch into this one (counts add)."""
+        if other.counts is None:
+            return
+        if other.gamma != self.gamma:
+            raise ValueError("cannot merge sketches with different relative accuracy")
+        part = other.counts
+        if self.exact and not other.exact:
+            self._collapse()
+        elif other.exact and not self.exact:
+            part = self._bucket_counts(part)
+        self._add(part)
+
+    def _add(self, part: pd.Series):
+        both = part if self.counts is None else pd.concat([self.counts, part])
+        self.counts = both.groupby(level=[0, 1], sort=False).sum().rename("count")
+        if self.exact and len(self.counts) > self.max_exact:
+            self._collapse()
+
+    def _collapse(self):
+        self.exact = False
+        if self.counts is not None:
+            self.counts = self._bucket_counts(self.counts)
+
+    def _bucket_counts(self, counts: pd.Series) -> pd.Series:
+        groups = counts.index.get_level_values(0)
+        keys = self._bucket(counts.index.get_level_values(1).to_numpy("float64"))
+        return counts.groupby([groups, keys], sort=False).sum().rename_axis(["group", "key"]).rename("count")
+
+    # ---- log buckets ----
+    def _bucket(self, values: np.ndarray) -> np.ndarray:
+        mag = np.abs(values)
+        with np.errstate(divide="ignore"):
+            idx = np.ceil(np.log(mag) / np.log(self.gamma))
+        keys = np.where(mag > 0, np.sign(values) * (idx + _OFFSET), 0.0)
+        return keys.astype("int64")
+
+    def _representative(self, keys: np.ndarray) -> np.ndarray:
+        if self.exact:
+            return keys.astype("float64")
+        keys = keys.astype("float64")
+        idx = np.abs(keys) - _OFFSET
+        mag = 2 * self.gamma ** idx / (self.gamma + 1)
+        return np.where(keys == 0, 0.0, np.sign(keys) * mag)
+
+    # ---- queries ----
+    def count(self) -> pd.Series:
+        """Number of values per group."""
+        if self.counts is None:
+            return pd.Series(dtype="int64")
+        return self.counts.groupby(level=0, sort=True).sum()
+
+    def quantile(self, q):
+        """Per-group quantile(s), interpolated like `Series.quantile`.
+
+        A scalar `q` returns a Series indexed by group; a list returns a
+        DataFrame with one column per percentile.
+        """
+        qs = [q] if np.isscalar(q) else list(q)
+        if self.counts is None:
+            out = pd.DataFrame(columns=qs, dtype="float64")
+        else:
+            rows = {}
+            for g, part in self.counts.groupby(level=0, sort=True):
+                values = self._representative(part.index.get_level_values(1).to_numpy())
+                rows[g] = [quantile_from_counts(values, part.to_numpy(), x) for x in qs]
+            out = pd.DataFrame.from_dict(rows, orient="index", columns=qs)
+        out.index.name = None
+        return out[qs[0]] if np.isscalar(q) else out
+
+    def value(self, q: float) -> float:
+        """Quantile of an ungrouped sketch (or of group 0)."""
+        s = self.quantile(q)
+        return float(s.iloc[0]) if len(s) else np.nan
@@ -0,0 +1,177 @@
+"""
+snapshot.py
+Local columnar snapshot of the four source tables.
+vendors/drivers/customers are small and stored as one Parquet file each;
+orders is stored as Parquet parts partitioned by month of order_datetime
+(snapshot/orders/month=YYYY-MM/part-<last order_id>.parquet).
+
+A manifest records each table's row count and max id. On sync, a table
+whose count/max id still match is not read at all; new orders (order_id
+past the stored max) are appended as new parts; anything else, e.g.
+deleted rows, triggers a rebuild of that table. Like the incremental
+watermark, this assumes orders are append-only. Loading memory-maps the
+files and returns Arrow-backed DataFrames.
+"""
+
+import json
+import os
+import shutil
+from decimal import Decimal
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import text
+
+DEFAULT_SNAPSHOT_DIR = "snapshot"
+MANIFEST_VERSION = 1
+SYNC_CHUNKSIZE = 500_000
+TABLE_KEYS = {
+    "orders": "order_id",
+    "vendors": "vendor_id",
+    "drivers": "driver_id",
+    "customers": "customer_id",
+}
+
+
+def _read_manifest(root: str) -> dict:
+    path = os.path.join(root, "manifest.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    return {"version": MANIFEST_VERSION, "tables": {}}
+
+
+def _write_manifest(root: str, manifest: dict):
+    path = os.path.join(root, "manifest.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _table_state(engine, table: str) -> dict:
+    key = TABLE_KEYS[table]
+    with engine.connect() as conn:
+        rows, max_id = conn.execute(text(f"SELECT COUNT(*), MAX({key}) FROM {table}")).one()
+    return {"rows": int(rows), "max_id": int(max_id) if max_id is not None else None}
+
+
+def _to_arrow(frame: pd.DataFrame) -> pa.Table:
+    # MySQL DECIMAL columns arrive as Decimal objects; store them as float64.
+    for col in frame.columns:
+        if frame[col].dtype == object:
+            first = frame[col].dropna()
+            if len(first) and isinstance(first.iloc[0], Decimal):
+                frame[col] = pd.to_numeric(frame[col]).astype("float64")
+    if "order_datetime" in frame:
+        frame["order_datetime"] = pd.to_datetime(frame["order_datetime"])
+    return pa.Table.from_pandas(frame, preserve_index=False)
+
+
+def _sync_dimension(engine, root: str, table: str, manifest: dict, state: dict):
+    frame = pd.read_sql(text(f"SELECT * FROM {table}"), engine)
+    pq.write_table(_to_arrow(frame), os.path.join(root, f"{table}.parquet"))
+    manifest["tables"][table] = {**state, "path": f"{table}.parquet"}
+
+
+def _append_orders(engine, root: str, entry: dict, after_id, chunksize: int) -> int:
+    # keyset pagination on the primary key: each query returns at most `chunksize` rows
+    sql = f"SELECT * FROM orders WHERE order_id > :after ORDER BY order_id LIMIT {int(chunksize)}"
+    after = int(after_id) if after_id is not None else -1
+    written = 0
+    with engine.connect() as conn:
+        while True:
+            chunk = pd.read_sql(text(sql), conn, params={"after": after})
+            if chunk.empty:
+                break
+            after = int(chunk["order_id"].iloc[-1])
+            table = _to_arrow(chunk)
+            month = chunk["order_datetime"].dt.strftime("%Y-%m")
+            for m, idx in chunk.groupby(month).indices.items():
+                part = table.take(idx)
+                last_id = int(chunk["order_id"].iloc[idx].max())
+                rel = os.path.join("orders", f"month={m}", f"part-{last_id:012d}.parquet")
+                os.makedirs(os.path.dirname(os.path.join(root, rel)), exist_ok=True)
+                pq.write_table(part, os.path.join(root, rel))
+                entry["files"].append({"month": m, "path": rel, "rows": len(idx)})
+                entry["max_id"] = max(entry["max_id"] or 0, last_id)
+            written += len(chunk)
+            if len(chunk) < chunksize:
+                break
+    return written
+
+
+def sync(engine, root: str = DEFAULT_SNAPSHOT_DIR, chunksize: int = SYNC_CHUNKSIZE) -> dict:
+    """Bring the snapshot up to date with the database; returns rows fetched per table."""
+    os.makedirs(root, exist_ok=True)
+    manifest = _read_manifest(root)
+    fetched = {}
+    for table in ("vendors", "drivers", "customers"):
+        state = _table_state(engine, table)
+        old = manifest["tables"].get(table)
+        if old and old["rows"] == state["rows"] and old["max_id"] == state["max_id"] \
+                and os.path.exists(os.path.join(root, old["path"])):
+            fetched[table] = 0
+            continue
+        _sync_dimension(engine, root, table, manifest, state)
+        fetched[table] = state["rows"]
+
+    state = _table_state(engine, "orders")
+    old = manifest["tables"].get("orders")
+    if old and old["rows"] == state["rows"] and old["max_id"] == state["max_id"]:
+        fetched["orders"] = 0
+    else:
+        appendable = (old is not None and old["max_id"] is not None and state["max_id"] is not None
+                      and state["max_id"] > old["max_id"] and state["rows"] > old["rows"])
+        if appendable:
+            entry, after = old, old["max_id"]
+        else:
+            shutil.rmtree(os.path.join(root, "orders"), ignore_errors=True)
+            entry, after = {"files": [], "max_id": None}, None
+        fetched["orders"] = _append_orders(engine, root, entry, after, chunksize)
+        # Record what was actually written: rows inserted while syncing are
+        # picked up by the next sync instead of being skipped.
+        entry["rows"] = sum(f["rows"] for f in entry["files"])
+        if appendable and entry["rows"] < state["rows"]:
+            # Rows also appeared below the old max id: start over.
+            manifest["tables"].pop("orders")
+            _write_manifest(root, manifest)
+            return sync(engine, root, chunksize)
+        manifest["tables"]["orders"] = entry
+    _write_manifest(root, manifest)
+    return fetched
+
+
+def _read(root: str, paths, columns=None) -> pd.DataFrame:
+    tables = [pq.read_table(os.path.join(root, p), columns=columns, memory_map=True) for p in paths]
+    table = pa.concat_tables(tables) if tables else pa.table({})
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def load(root: str = DEFAULT_SNAPSHOT_DIR, columns: dict = None, tables=TABLE_KEYS) -> dict:
+    """Arrow-backed DataFrames for `tables` (default: all four), keyed by table name.
+
+    `columns` optionally maps a table name to the subset of columns to read.
+    """
+    manifest = _read_manifest(root)
+    columns = columns or {}
+    out = {}
+    for table in tables:
+        entry = manifest["tables"].get(table)
+        if entry is None:
+            raise FileNotFoundError(f"no snapshot of {table!r} in {root}; run a sync first")
+        paths = [f["path"] for f in entry["files"]] if table == "orders" else [entry["path"]]
+        out[table] = _read(root, paths, columns.get(table))
+    return out
+
+
+def load_tables(engine, root: str = DEFAULT_SNAPSHOT_DIR, check: bool = True, columns: dict = None,
+                tables=TABLE_KEYS) -> dict:
+    """Sync (unless `check` is False) and load the snapshot (see `load`)."""
+    if check:
+        fetched = sync(engine, root)
+        changed = {t: n for t, n in fetched.items() if n}
+        print(f"snapshot: {'fetched ' + str(changed) if changed else 'up to date'}")
+    return load(root, columns, tables)
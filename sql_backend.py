@@ -0,0 +1,268 @@
+"""
+sql_backend.py
+Push the analysis.py aggregations down to the database.
+Every section becomes a GROUP BY (or ORDER BY ... LIMIT) query against the
+food_delivery schema, so only aggregated rows cross the network. The result
+has the same shape as streaming.scan_orders; analysis.py --verify-sql
+checks the reported tables against an in-memory run on the same database.
+
+Queries use portable SQL plus a few per-dialect date expressions; MySQL
+(8.0+, for window functions) and SQLite (as a local stand-in) are supported.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from cohorts import GAP_MAX_DAYS, CohortEngine
+from sketches import quantile_from_counts
+from streaming import DOW_NAMES, OUTLIER_TOP_N, SCATTER_SAMPLE, SLA_THRESHOLDS, fit_from_sums
+
+# hour / day-of-week (0 = Monday) of o.order_datetime per SQLAlchemy dialect name
+DIALECT_EXPR = {
+    "mysql": {
+        "hour": "HOUR(o.order_datetime)",
+        "dow": "WEEKDAY(o.order_datetime)",
+        "month": "DATE_FORMAT(o.order_datetime, '%Y-%m')",
+        "gap_days": "TIMESTAMPDIFF(SECOND, prev, order_datetime) DIV 86400",
+    },
+    "sqlite": {
+        "hour": "CAST(strftime('%H', o.order_datetime) AS INTEGER)",
+        "dow": "(CAST(strftime('%w', o.order_datetime) AS INTEGER) + 6) % 7",
+        "month": "strftime('%Y-%m', o.order_datetime)",
+        "gap_days": "(CAST(strftime('%s', order_datetime) AS INTEGER) - CAST(strftime('%s', prev) AS INTEGER)) / 86400",
+    },
+}
+
+REVENUE = "(o.subtotal + o.delivery_fee + o.tip)"
+DELIVERED = "o.status = 'delivered'"
+
+
+def _expr(engine, name: str) -> str:
+    try:
+        return DIALECT_EXPR[engine.dialect.name][name]
+    except KeyError:
+        raise ValueError(f"sql backend does not support the {engine.dialect.name!r} dialect") from None
+
+
+def _query(engine, sql: str, params: dict = None, numeric=()) -> pd.DataFrame:
+    with engine.connect() as conn:
+        frame = pd.read_sql(text(sql), conn, params=params)
+    for col in numeric:  # DECIMAL aggregates arrive as Decimal objects on MySQL
+        frame[col] = pd.to_numeric(frame[col]).astype("float64")
+    return frame
+
+
+def _sla_columns() -> str:
+    return ",\n".join(f"SUM(CASE WHEN o.delivery_minutes <= {t} THEN 1 ELSE 0 END) AS sla{t}_hits"
+                      for t in SLA_THRESHOLDS)
+
+
+def sql_tables(engine, vendors: pd.DataFrame, drivers: pd.DataFrame, customers: pd.DataFrame,
+               sample_points: int = SCATTER_SAMPLE, outlier_model=None, eta_model=None) -> dict:
+    """The tables analysis.py reports, computed by the database.
+
+    An `outlier_model` (outliers.SlowDeliveryModel) is filled from a pushed-down
+    (group, distance, minutes) count and returned under "outlier_model"; an
+    `eta_model` (eta.EtaModel) from pushed-down per-cell sums, fitted, under "eta".
+    """
+    hour, dow = _expr(engine, "hour"), _expr(engine, "dow")
+    out = {}
+
+    # Global KPIs + the distance fit's sufficient statistics in one scan
+    status = _query(engine, "SELECT o.status, COUNT(*) AS n FROM orders o GROUP BY o.status", numeric=["n"])
+    counts = dict(zip(status["status"], status["n"]))
+    g = _query(engine, f"""
+        SELECT COUNT(*) AS n,
+               SUM(o.delivery_minutes) AS minutes,
+               SUM({REVENUE}) AS revenue,
+               SUM(o.distance_km) AS distance,
+               SUM(o.distance_km * o.distance_km) AS sxx,
+               SUM(o.distance_km * o.delivery_minutes) AS sxy,
+               SUM(o.delivery_minutes * o.delivery_minutes) AS syy,
+               {_sla_columns()}
+        FROM orders o WHERE {DELIVERED}""").iloc[0]
+    g = pd.to_numeric(g).fillna(0)
+    n = int(g["n"])
+    hist = _query(engine, f"""
+        SELECT o.dropoff_area, o.delivery_minutes, COUNT(*) AS n
+        FROM orders o WHERE {DELIVERED}
+        GROUP BY o.dropoff_area, o.delivery_minutes""", numeric=["delivery_minutes", "n"])
+    overall = hist.groupby("delivery_minutes")["n"].sum()
+    out.update({
+        "total_orders": int(sum(counts.values())),
+        "delivered_orders": n,
+        "canceled_orders": int(counts.get("canceled", 0)),
+        "returned_orders": int(counts.get("returned", 0)),
+        "avg_delivery_min": g["minutes"] / n if n else 0,
+        "p95_delivery_min": quantile_from_counts(overall.index.values, overall.values, 0.95) if n else 0,
+        "total_revenue": float(g["revenue"]),
+        "aov": g["revenue"] / n if n else 0,
+        "avg_distance": g["distance"] / n if n else 0,
+        "sla": {t: g[f"sla{t}_hits"] / n if n else 0 for t in SLA_THRESHOLDS},
+    })
+
+    # Time series
+    daily = _query(engine, f"""
+        SELECT DATE(o.order_datetime) AS date, COUNT(*) AS orders,
+               SUM({REVENUE}) AS revenue, AVG(o.delivery_minutes) AS avg_minutes
+        FROM orders o WHERE {DELIVERED}
+        GROUP BY DATE(o.order_datetime) ORDER BY date""", numeric=["revenue", "avg_minutes"])
+    daily["date"] = pd.to_datetime(daily["date"]).dt.date
+    out["daily"] = daily
+    hourly = _query(engine, f"""
+        SELECT {hour} AS hour, COUNT(*) AS n FROM orders o WHERE {DELIVERED}
+        GROUP BY {hour} ORDER BY hour""")
+    out["hourly"] = hourly.set_index("hour")["n"]
+    dows = _query(engine, f"SELECT {dow} AS dow, COUNT(*) AS n FROM orders o WHERE {DELIVERED} GROUP BY {dow}")
+    out["dow_counts"] = pd.Series(dows["n"].values, index=[DOW_NAMES[int(i)] for i in dows["dow"]]) \
+        .sort_values(ascending=False)
+
+    # Area (p95 from the pushed-down minute histogram)
+    area = _query(engine, f"""
+        SELECT o.dropoff_area, COUNT(*) AS orders, AVG(o.delivery_minutes) AS avg_minutes,
+               AVG(CASE WHEN o.delivery_minutes <= 30 THEN 1.0 ELSE 0.0 END) AS sla30,
+               SUM({REVENUE}) AS revenue
+        FROM orders o WHERE {DELIVERED}
+        GROUP BY o.dropoff_area""", numeric=["avg_minutes", "sla30", "revenue"]).set_index("dropoff_area")
+    p95 = {a: quantile_from_counts(h["delivery_minutes"].values, h["n"].values, 0.95)
+           for a, h in hist.groupby("dropoff_area")}
+    area.insert(2, "p95_minutes", pd.Series(p95))
+    out["area_kpis"] = area.sort_index().sort_values("orders", ascending=False)
+
+    # Vendor / cuisine
+    per_group = f"""COUNT(*) AS orders, SUM({REVENUE}) AS revenue, AVG(o.delivery_minutes) AS avg_minutes,
+               AVG(CASE WHEN o.delivery_minutes <= 30 THEN 1.0 ELSE 0.0 END) AS sla30"""
+    out["vend"] = _query(engine, f"""
+        SELECT v.vendor_id, v.vendor_name, v.area, v.cuisine, {per_group}
+        FROM orders o JOIN vendors v ON v.vendor_id = o.vendor_id
+        WHERE {DELIVERED}
+        GROUP BY v.vendor_id, v.vendor_name, v.area, v.cuisine
+        ORDER BY v.vendor_id""", numeric=["revenue", "avg_minutes", "sla30"])
+    out["cui"] = _query(engine, f"""
+        SELECT v.cuisine, {per_group}
+        FROM orders o JOIN vendors v ON v.vendor_id = o.vendor_id
+        WHERE {DELIVERED}
+        GROUP BY v.cuisine""", numeric=["revenue", "avg_minutes", "sla30"]) \
+        .set_index("cuisine").sort_index().sort_values("orders", ascending=False)
+
+    # Driver
+    drv = _query(engine, f"""
+        SELECT o.driver_id, COUNT(*) AS orders, AVG(o.driver_rating) AS avg_rating,
+               AVG(o.delivery_minutes) AS avg_minutes, AVG(o.distance_km) AS avg_distance
+        FROM orders o WHERE {DELIVERED}
+        GROUP BY o.driver_id ORDER BY o.driver_id""", numeric=["avg_rating", "avg_minutes", "avg_distance"])
+    out["drv"] = drv.merge(drivers, on="driver_id", how="left")
+
+    # Customer
+    cust = _query(engine, f"""
+        SELECT o.customer_id, COUNT(*) AS orders, SUM({REVENUE}) AS revenue,
+               MIN(o.order_datetime) AS first_order, MAX(o.order_datetime) AS last_order
+        FROM orders o WHERE {DELIVERED}
+        GROUP BY o.customer_id ORDER BY o.customer_id""", numeric=["revenue"])
+    cust["first_order"] = pd.to_datetime(cust["first_order"])
+    cust["last_order"] = pd.to_datetime(cust["last_order"])
+    out["cust_orders"] = cust.merge(customers, on="customer_id", how="left")
+
+    # Distance fit, slowest deliveries and a systematic sample for the scatter
+    out["fit"] = None
+    fit = fit_from_sums(n, g["distance"], g["minutes"], g["sxx"], g["sxy"], g["syy"])
+    if fit is not None:
+        slope, intercept, res_mean, std = fit
+        worst = None if outlier_model is not None else _query(engine, f"""
+            SELECT o.order_id, v.vendor_name, v.area, o.distance_km, o.delivery_minutes,
+                   o.delivery_minutes - (:slope * o.distance_km + :intercept) AS residual
+            FROM orders o LEFT JOIN vendors v ON v.vendor_id = o.vendor_id
+            WHERE {DELIVERED}
+            ORDER BY residual DESC, o.order_id LIMIT {OUTLIER_TOP_N}""",
+                       params={"slope": float(slope), "intercept": float(intercept)},
+                       numeric=["distance_km", "residual"])
+        if worst is not None:
+            worst["residual_z"] = (worst.pop("residual") - res_mean) / std
+        pts = _query(engine, f"""
+            SELECT o.distance_km, o.delivery_minutes FROM orders o
+            WHERE {DELIVERED} AND o.order_id % :step = 0""",
+                     params={"step": max(1, math.ceil(n / sample_points))}, numeric=["distance_km"])
+        out["fit"] = {
+            "slope": slope, "intercept": intercept,
+            "x": pts["distance_km"].to_numpy("float64"), "y": pts["delivery_minutes"].to_numpy("float64"),
+            "worst": worst,
+        }
+
+    # Outlier model: its (group, distance, minutes) histogram, counted in the database
+    if outlier_model is not None:
+        group = {None: None, "dropoff_area": "o.dropoff_area", "hour": hour}[outlier_model.by]
+        pairs = _query(engine, f"""
+            SELECT {group or 0} AS grp, o.distance_km, o.delivery_minutes, COUNT(*) AS n
+            FROM orders o WHERE {DELIVERED}
+            GROUP BY {group + ', ' if group else ''}o.distance_km, o.delivery_minutes""", numeric=["distance_km"])
+        outlier_model.add_counts(pairs["grp"], pairs["distance_km"], pairs["delivery_minutes"], pairs["n"])
+    out["outlier_model"] = outlier_model
+
+    # ETA model: least-squares sums per pickup area x dropoff area x hour bucket
+    out["eta"] = None
+    if eta_model is not None:
+        first_hours = [h for h in range(24) if h == 0 or eta_model.bucket_of_hour[h] != eta_model.bucket_of_hour[h - 1]]
+        bucket = "CASE " + " ".join(f"WHEN {hour} >= {h} THEN {int(eta_model.bucket_of_hour[h])}"
+                                    for h in reversed(first_hours[1:])) + " ELSE 0 END"
+        cells = _query(engine, f"""
+            SELECT o.pickup_area, o.dropoff_area, {bucket} AS bucket, COUNT(*) AS n,
+                   SUM(o.distance_km) AS sx, SUM(o.delivery_minutes) AS sy,
+                   SUM(o.distance_km * o.distance_km) AS sxx,
+                   SUM(o.distance_km * o.delivery_minutes) AS sxy,
+                   SUM(o.delivery_minutes * o.delivery_minutes) AS syy
+            FROM orders o WHERE {DELIVERED}
+            GROUP BY o.pickup_area, o.dropoff_area, {bucket}""", numeric=["n", "sx", "sy", "sxx", "sxy", "syy"])
+        eta_model.add_sums(cells["pickup_area"], cells["dropoff_area"], cells["bucket"],
+                           cells[["n", "sx", "sy", "sxx", "sxy", "syy"]].to_numpy("float64"))
+        out["eta"] = eta_model.fit()
+
+    # Peak hour / top vendors per area: ranked in the database
+    out["peak_area"] = _query(engine, f"""
+        SELECT area, hour, orders FROM (
+            SELECT v.area, {hour} AS hour, COUNT(*) AS orders,
+                   ROW_NUMBER() OVER (PARTITION BY v.area ORDER BY COUNT(*) DESC, {hour}) AS rn
+            FROM orders o JOIN vendors v ON v.vendor_id = o.vendor_id
+            WHERE {DELIVERED}
+            GROUP BY v.area, {hour}
+        ) ranked WHERE rn = 1 ORDER BY area""")
+    out["top3"] = _query(engine, f"""
+        SELECT area, vendor_name, orders FROM (
+            SELECT v.area, v.vendor_name, COUNT(*) AS orders,
+                   ROW_NUMBER() OVER (PARTITION BY v.area ORDER BY COUNT(*) DESC, v.vendor_name) AS rn
+            FROM orders o JOIN vendors v ON v.vendor_id = o.vendor_id
+            WHERE {DELIVERED}
+            GROUP BY v.area, v.vendor_name
+        ) ranked WHERE rn <= 3 ORDER BY area, orders DESC""")
+    return out
+
+
+def sql_cohorts(engine, customers: pd.DataFrame) -> CohortEngine:
+    """Cohort state (see cohorts.py) from per-(customer, month) aggregates and a
+    histogram of days between a customer's consecutive orders, both computed by
+    the database."""
+    month, gap = _expr(engine, "month"), _expr(engine, "gap_days")
+    months = _query(engine, f"""
+        SELECT o.customer_id, {month} AS month, COUNT(*) AS orders, SUM({REVENUE}) AS revenue,
+               MIN(o.order_datetime) AS first_order, MAX(o.order_datetime) AS last_order
+        FROM orders o WHERE {DELIVERED}
+        GROUP BY o.customer_id, {month}""", numeric=["revenue"])
+    gaps = _query(engine, f"""
+        SELECT CASE WHEN {gap} > {GAP_MAX_DAYS} THEN {GAP_MAX_DAYS} ELSE {gap} END AS days, COUNT(*) AS n
+        FROM (SELECT o.order_datetime,
+                     LAG(o.order_datetime) OVER (PARTITION BY o.customer_id
+                                                 ORDER BY o.order_datetime, o.order_id) AS prev
+              FROM orders o WHERE {DELIVERED}) ordered
+        WHERE prev IS NOT NULL
+        GROUP BY CASE WHEN {gap} > {GAP_MAX_DAYS} THEN {GAP_MAX_DAYS} ELSE {gap} END""")
+    gap_hist = np.bincount(gaps["days"].to_numpy("int64"), weights=gaps["n"].to_numpy("float64"),
+                           minlength=GAP_MAX_DAYS + 1)
+    latest = _query(engine, f"""
+        SELECT o.order_id FROM orders o
+        WHERE {DELIVERED} AND o.order_datetime = (SELECT MAX(d.order_datetime) FROM orders d
+                                                  WHERE d.status = 'delivered')""")
+    return CohortEngine.from_customer_months(months, gap_hist.astype("int64"), customers,
+                                             watermark_ids=latest["order_id"].tolist())
+
@@ -0,0 +1,507 @@
+"""
+streaming.py
+Chunked, column-pruned loading of the orders table for analysis.py.
+Orders are pulled by keyset pagination in fixed-size chunks with
+compact dtypes and folded into mergeable aggregates, so peak memory depends
+on the chunk size and the number of groups, not on the size of `orders`.
+"""
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from ranking import top_k
+from sketches import QuantileSketch
+
+DEFAULT_CHUNKSIZE = 200_000
+SLA_THRESHOLDS = (25, 30, 35, 40)
+SCATTER_SAMPLE = 20_000
+OUTLIER_TOP_N = 15
+OUTLIER_POOL = 500
+DOW_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# ---- compact dtypes for the orders table ----
+ORDER_COLUMNS = [
+    "order_id", "customer_id", "driver_id", "vendor_id", "food_category",
+    "order_datetime", "pickup_area", "dropoff_area", "distance_km",
+    "delivery_minutes", "subtotal", "delivery_fee", "tip", "driver_rating", "status",
+]
+CATEGORY_COLUMNS = ("status", "dropoff_area", "pickup_area", "food_category")
+FLOAT32_COLUMNS = ("distance_km", "subtotal", "delivery_fee", "tip", "driver_rating")
+INT32_COLUMNS = ("customer_id", "driver_id", "vendor_id", "delivery_minutes")
+
+# ---- columns each analysis section reads from `orders` ----
+REVENUE_COLUMNS = ["subtotal", "delivery_fee", "tip"]
+SECTION_COLUMNS = {
+    "global":           ["status", "delivery_minutes", "distance_km", *REVENUE_COLUMNS],
+    "time_series":      ["status", "order_datetime", "delivery_minutes", *REVENUE_COLUMNS],
+    "area":             ["status", "dropoff_area", "delivery_minutes", *REVENUE_COLUMNS],
+    "vendor":           ["status", "vendor_id", "delivery_minutes", *REVENUE_COLUMNS],
+    "cuisine":          ["status", "vendor_id", "delivery_minutes", *REVENUE_COLUMNS],
+    "driver":           ["status", "driver_id", "driver_rating", "delivery_minutes", "distance_km"],
+    "customer":         ["status", "customer_id", "order_datetime", *REVENUE_COLUMNS],
+    "distance_fit":     ["status", "distance_km", "delivery_minutes"],
+    "peak_hour":        ["status", "vendor_id", "order_datetime"],
+    "top_vendors_area": ["status", "vendor_id"],
+    "outliers":         ["order_id", "status", "vendor_id", "distance_km", "delivery_minutes"],
+    "cohorts":          ["order_id", "status", "customer_id", "order_datetime", *REVENUE_COLUMNS],
+    "eta":              ["status", "order_datetime", "pickup_area", "dropoff_area", "distance_km", "delivery_minutes"],
+}
+# sections folded into OrderAggregates
+AGGREGATE_SECTIONS = list(SECTION_COLUMNS)
+OUTLIER_COLUMNS = ["order_id", "vendor_id", "distance_km", "delivery_minutes"]
+
+
+def columns_for(sections) -> list:
+    """Union of the orders columns needed by `sections`, in table order."""
+    wanted = {c for s in sections for c in SECTION_COLUMNS[s]}
+    return [c for c in ORDER_COLUMNS if c in wanted]
+
+
+def compact_orders(frame: pd.DataFrame) -> pd.DataFrame:
+    """Cast an orders chunk to compact dtypes; datetimes are parsed here, once."""
+    for col in frame.columns:
+        if col in CATEGORY_COLUMNS:
+            frame[col] = frame[col].astype("category")
+        elif col in FLOAT32_COLUMNS:
+            frame[col] = pd.to_numeric(frame[col]).astype("float32")
+        elif col in INT32_COLUMNS:
+            frame[col] = frame[col].astype("int32")
+        elif col == "order_id":
+            frame[col] = frame[col].astype("int64")
+        elif col == "order_datetime":
+            frame[col] = pd.to_datetime(frame[col])
+    return frame
+
+
+def _key_param(value):
+    # numpy scalars / pandas Timestamps -> plain Python values every DBAPI driver binds
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value.item() if hasattr(value, "item") else value
+
+
+def iter_orders(engine, columns, chunksize: int = DEFAULT_CHUNKSIZE, where: str = None, params: dict = None,
+                order_by: str = None):
+    """Yield compact chunks of `orders` restricted to `columns`.
+
+    Chunks are fetched by keyset pagination on the primary key
+    (`WHERE order_id > :last ORDER BY order_id LIMIT chunksize`), or on
+    (`order_by`, order_id) when another order is asked for, so each query
+    returns at most `chunksize` rows and memory stays bounded on any driver,
+    buffered ones such as mysql+mysqlconnector included.
+    """
+    keys = [order_by, "order_id"] if order_by and order_by != "order_id" else ["order_id"]
+    select = list(columns) + [k for k in keys if k not in columns]
+    base = f"SELECT {', '.join(select)} FROM orders"
+    if len(keys) == 1:
+        seek = "order_id > :_last_id"
+    else:
+        seek = f"({keys[0]} > :_last_key OR ({keys[0]} = :_last_key AND order_id > :_last_id))"
+    order = f" ORDER BY {', '.join(keys)} LIMIT {int(chunksize)}"
+    params = dict(params or {})
+    last = None
+    with engine.connect() as conn:
+        while True:
+            clauses = [f"({where})"] if where else []
+            if last is not None:
+                clauses.append(seek)
+                params.update(last)
+            sql = base + (f" WHERE {' AND '.join(clauses)}" if clauses else "") + order
+            chunk = pd.read_sql(text(sql), conn, params=params)
+            if chunk.empty:
+                return
+            tail = chunk.iloc[-1]
+            last = {"_last_id": _key_param(tail["order_id"])}
+            if len(keys) > 1:
+                last["_last_key"] = _key_param(tail[keys[0]])
+            full = len(chunk) == chunksize
+            yield compact_orders(chunk[list(columns)] if len(select) > len(columns) else chunk)
+            if not full:
+                return
+
+
+# --------------------------
+# Mergeable aggregates
+# --------------------------
+MERGE_OPS = {"size": "sum", "count": "sum", "sum": "sum", "min": "min", "max": "max"}
+
+
+class GroupAggregate:
+    """Per-group size/count/sum/min/max folded over a stream of chunks.
+
+    Each chunk is reduced with a regular groupby; the partial results are
+    kept and compacted every few chunks, so memory is bounded by the number
+    of distinct keys rather than the number of rows.
+    """
+
+    def __init__(self, keys, compact_every: int = 8, **aggs):
+        self.keys = list(keys)
+        self.aggs = aggs  # name -> (column, op)
+        self.compact_every = compact_every
+        self._parts = []
+
+    def update(self, frame: pd.DataFrame):
+        if len(frame):
+            self.merge(frame.groupby(self.keys, observed=True, sort=False).agg(**self.aggs))
+
+    def merge(self, part: pd.DataFrame):
+        self._parts.append(part)
+        if len(self._parts) >= self.compact_every:
+            self._compact()
+
+    def combine(self, other: "GroupAggregate"):
+        """Fold in the partials of an aggregate built the same way on other rows."""
+        for part in other._parts:
+            self.merge(part)
+
+    def _compact(self):
+        merged = pd.concat(self._parts)
+        ops = {name: MERGE_OPS[op] for name, (_, op) in self.aggs.items()}
+        self._parts = [merged.groupby(level=list(range(len(self.keys))), sort=False).agg(ops)]
+
+    def result(self) -> pd.DataFrame:
+        if not self._parts:
+            index = pd.MultiIndex.from_arrays([[]] * len(self.keys), names=self.keys) \
+                if len(self.keys) > 1 else pd.Index([], name=self.keys[0])
+            return pd.DataFrame(columns=list(self.aggs), index=index)
+        self._compact()
+        return self._parts[0].sort_index()
+
+
+class BottomKSample:
+    """Uniform sample of at most `k` rows: keep the rows with the k smallest random keys."""
+
+    def __init__(self, k: int, seed: int = 101):
+        self.k = k
+        self.rng = np.random.default_rng(seed)
+        self.rows = None
+
+    def update(self, frame: pd.DataFrame):
+        keys = self.rng.random(len(frame))
+        if self.rows is not None and len(self.rows) >= self.k:
+            keep = keys < self.rows["_key"].iat[-1]
+            frame, keys = frame[keep], keys[keep]
+        part = frame.assign(_key=keys)
+        both = part if self.rows is None else pd.concat([self.rows, part], ignore_index=True)
+        self.rows = both.nsmallest(self.k, "_key")
+
+    def merge(self, other: "BottomKSample"):
+        """Fold in a sample drawn (with an independent seed) from other rows."""
+        if other.rows is None:
+            return
+        both = other.rows if self.rows is None else pd.concat([self.rows, other.rows], ignore_index=True)
+        self.rows = both.nsmallest(self.k, "_key")
+
+    def result(self) -> pd.DataFrame:
+        return self.rows.drop(columns="_key") if self.rows is not None else pd.DataFrame()
+
+
+# --------------------------
+# Streaming scan
+# --------------------------
+def as_float64(values) -> np.ndarray:
+    """Widen a float32 DECIMAL(_,2) column for arithmetic, dropping float32 noise."""
+    return np.asarray(values, dtype="float64").round(2)
+
+
+def _delivered(chunk: pd.DataFrame) -> pd.DataFrame:
+    d = chunk[chunk["status"] == "delivered"]
+    revenue = as_float64(d["subtotal"]) + as_float64(d["delivery_fee"]) + as_float64(d["tip"])
+    return d.assign(
+        revenue=revenue,
+        date=d["order_datetime"].dt.normalize(),
+        hour=d["order_datetime"].dt.hour.astype("int8"),
+        dow=d["order_datetime"].dt.dayofweek.astype("int8"),
+        sla30=d["delivery_minutes"] <= 30,
+    )
+
+
+def fit_from_sums(n, sx, sy, sxx, sxy, syy):
+    """Least-squares minutes ~ distance from sufficient statistics.
+
+    Returns (slope, intercept, residual mean, residual std) like the
+    np.polyfit + residuals.std() in analysis.py, or None for n <= 5.
+    """
+    if n <= 5:
+        return None
+    slope = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+    intercept = (sy - slope * sx) / n
+    res_mean = (sy - slope * sx - intercept * n) / n
+    res_sq = (syy - 2 * slope * sxy - 2 * intercept * sy + slope ** 2 * sxx
+              + 2 * slope * intercept * sx + n * intercept ** 2)
+    std = np.sqrt(max(res_sq / n - res_mean ** 2, 0.0)) or 1.0
+    return slope, intercept, res_mean, std
+
+
+class OrderAggregates:
+    """Every mergeable partial behind the report, folded one orders chunk at a time.
+
+    Besides the per-group tables this keeps the running least-squares sums
+    for the distance fit, a scatter sample, a pool of slow-delivery
+    candidates and the `watermark` (latest `order_datetime` seen), which is
+    what lets incremental.py persist the state and resume from it. An
+    `outlier_model` (an outliers.SlowDeliveryModel, for per-group or robust
+    outliers) and an `eta_model` (an eta.EtaModel) are folded, merged and
+    persisted along with the rest.
+    """
+
+    def __init__(self, sample_points: int = SCATTER_SAMPLE, outlier_pool: int = OUTLIER_POOL,
+                 sample_seed: int = 101, outlier_model=None, eta_model=None):
+        self.status_counts = GroupAggregate(["status"], n=("delivery_minutes", "size"))
+        self.minutes_sketch = QuantileSketch()
+        self.daily = GroupAggregate(["date"], orders=("revenue", "size"), revenue=("revenue", "sum"),
+                                    minutes_sum=("delivery_minutes", "sum"))
+        self.hourly = GroupAggregate(["hour"], n=("revenue", "size"))
+        self.dow = GroupAggregate(["dow"], n=("revenue", "size"))
+        self.area = GroupAggregate(["dropoff_area"], orders=("revenue", "size"),
+                                   minutes_sum=("delivery_minutes", "sum"), sla30=("sla30", "sum"),
+                                   revenue=("revenue", "sum"))
+        self.area_sketch = QuantileSketch()
+        self.vendor = GroupAggregate(["vendor_id"], orders=("revenue", "size"), revenue=("revenue", "sum"),
+                                     minutes_sum=("delivery_minutes", "sum"), sla30=("sla30", "sum"))
+        self.vendor_hour = GroupAggregate(["vendor_id", "hour"], orders=("revenue", "size"))
+        self.driver = GroupAggregate(["driver_id"], orders=("revenue", "size"),
+                                     rating_sum=("driver_rating", "sum"), rating_n=("driver_rating", "count"),
+                                     minutes_sum=("delivery_minutes", "sum"), distance_sum=("distance_km", "sum"))
+        self.customer = GroupAggregate(["customer_id"], orders=("revenue", "size"), revenue=("revenue", "sum"),
+                                       first_order=("order_datetime", "min"),
+                                       last_order=("order_datetime", "max"))
+        self.sample = BottomKSample(sample_points, seed=sample_seed)
+        self.outlier_pool = outlier_pool
+        self.candidates = None
+        self.outlier_model = outlier_model
+        self.eta_model = eta_model
+        self.totals = dict(n=0, minutes=0.0, revenue=0.0, distance=0.0,
+                           sx=0.0, sy=0.0, sxx=0.0, sxy=0.0, syy=0.0)
+        self.sla_hits = dict.fromkeys(SLA_THRESHOLDS, 0)
+        self.watermark = None
+        self.watermark_ids = set()  # order_ids already folded at exactly `watermark`
+
+    def _group_aggregates(self):
+        return (self.daily, self.hourly, self.dow, self.area, self.vendor, self.vendor_hour, self.driver, self.customer)
+
+    def update(self, chunk: pd.DataFrame):
+        if not len(chunk):
+            return
+        latest = chunk["order_datetime"].max()
+        if self.watermark is None or latest >= self.watermark:
+            if self.watermark is None or latest > self.watermark:
+                self.watermark, self.watermark_ids = latest, set()
+            if "order_id" in chunk:
+                self.watermark_ids.update(chunk.loc[chunk["order_datetime"] == latest, "order_id"].tolist())
+        self.status_counts.update(chunk)
+        d = _delivered(chunk)
+        x = as_float64(d["distance_km"])
+        y = d["delivery_minutes"].to_numpy("float64")
+        t = self.totals
+        t["n"] += len(d)
+        t["minutes"] += y.sum()
+        t["revenue"] += d["revenue"].sum()
+        t["distance"] += x.sum()
+        t["sx"] += x.sum(); t["sy"] += y.sum()
+        t["sxx"] += x @ x; t["sxy"] += x @ y; t["syy"] += y @ y
+        for sla in SLA_THRESHOLDS:
+            self.sla_hits[sla] += int((y <= sla).sum())
+        for agg in self._group_aggregates():
+            agg.update(d)
+        self.minutes_sketch.update(y)
+        self.area_sketch.update(y, groups=d["dropoff_area"].astype(str))
+        self.sample.update(d[["distance_km", "delivery_minutes"]])
+        if "order_id" in d and self.outlier_pool:
+            self._update_candidates(d[OUTLIER_COLUMNS])
+        if self.outlier_model is not None:
+            self.outlier_model.update(d)
+        if self.eta_model is not None:
+            self.eta_model.update(d)
+
+    def _update_candidates(self, d: pd.DataFrame):
+        # Rank against the fit so far; a pool much larger than OUTLIER_TOP_N
+        # absorbs the small drift of the fit as more orders arrive.
+        fit = self.fit()
+        if fit is None:
+            return
+        slope, intercept, _, _ = fit
+        both = d if self.candidates is None else pd.concat([self.candidates, d], ignore_index=True)
+        res = both["delivery_minutes"].to_numpy("float64") - (slope * as_float64(both["distance_km"]) + intercept)
+        self.candidates = both.iloc[np.argsort(-res, kind="stable")[:self.outlier_pool]]
+
+    def merge(self, other: "OrderAggregates"):
+        """Fold in the aggregates of a disjoint set of orders (e.g. another date partition)."""
+        self.status_counts.combine(other.status_counts)
+        for mine, theirs in zip(self._group_aggregates(), other._group_aggregates()):
+            mine.combine(theirs)
+        self.minutes_sketch.merge(other.minutes_sketch)
+        self.area_sketch.merge(other.area_sketch)
+        self.sample.merge(other.sample)
+        for key, value in other.totals.items():
+            self.totals[key] += value
+        for sla, hits in other.sla_hits.items():
+            self.sla_hits[sla] += hits
+        if other.candidates is not None:
+            self._update_candidates(other.candidates)
+        if self.outlier_model is not None and other.outlier_model is not None:
+            self.outlier_model.merge(other.outlier_model)
+        if self.eta_model is not None and other.eta_model is not None:
+            self.eta_model.merge(other.eta_model)
+        if other.watermark is not None:
+            if self.watermark is None or other.watermark > self.watermark:
+                self.watermark, self.watermark_ids = other.watermark, set(other.watermark_ids)
+            elif other.watermark == self.watermark:
+                self.watermark_ids |= other.watermark_ids
+
+    def fit(self):
+        """(slope, intercept, residual mean, residual std) from the running sums, or None."""
+        t = self.totals
+        return fit_from_sums(t["n"], t["sx"], t["sy"], t["sxx"], t["sxy"], t["syy"])
+
+    def tables(self, vendors: pd.DataFrame, drivers: pd.DataFrame, customers: pd.DataFrame,
+               worst: pd.DataFrame = None) -> dict:
+        """The tables analysis.py reports, before display formatting.
+
+        `worst` overrides the slow-delivery table built from the candidate pool;
+        with an `outlier_model` there is no pool, and the model is returned
+        under "outlier_model" for the caller to rank the orders with.
+        """
+        t = self.totals
+        n = t["n"]
+        counts = self.status_counts.result()["n"]
+        counts.index = counts.index.astype(str)
+        out = {
+            "total_orders": int(counts.sum()),
+            "delivered_orders": n,
+            "canceled_orders": int(counts.get("canceled", 0)),
+            "returned_orders": int(counts.get("returned", 0)),
+            "avg_delivery_min": t["minutes"] / n if n else 0,
+            "p95_delivery_min": self.minutes_sketch.value(0.95) if n else 0,
+            "total_revenue": t["revenue"],
+            "aov": t["revenue"] / n if n else 0,
+            "avg_distance": t["distance"] / n if n else 0,
+            "sla": {sla: self.sla_hits[sla] / n if n else 0 for sla in SLA_THRESHOLDS},
+        }
+
+        # Time series
+        day = self.daily.result()
+        out["daily"] = pd.DataFrame({
+            "date": pd.DatetimeIndex(day.index).date,
+            "orders": day["orders"].values,
+            "revenue": day["revenue"].values,
+            "avg_minutes": (day["minutes_sum"] / day["orders"]).values,
+        })
+        out["hourly"] = self.hourly.result()["n"].rename_axis("hour")
+        dow_counts = self.dow.result()["n"]
+        dow_counts.index = [DOW_NAMES[i] for i in dow_counts.index]
+        out["dow_counts"] = dow_counts.sort_values(ascending=False)
+
+        # Area
+        a = self.area.result()
+        a.index = a.index.astype(str).rename("dropoff_area")
+        out["area_kpis"] = pd.DataFrame({
+            "orders": a["orders"],
+            "avg_minutes": a["minutes_sum"] / a["orders"],
+            "p95_minutes": self.area_sketch.quantile(0.95),
+            "sla30": a["sla30"] / a["orders"],
+            "revenue": a["revenue"],
+        }).rename_axis("dropoff_area").sort_values("orders", ascending=False)
+
+        # Vendor / cuisine
+        v = self.vendor.result().reset_index()
+        v = v.merge(vendors[["vendor_id", "vendor_name", "area", "cuisine"]], on="vendor_id", how="inner")
+        out["vend"] = pd.DataFrame({
+            "vendor_id": v["vendor_id"], "vendor_name": v["vendor_name"], "area": v["area"], "cuisine": v["cuisine"],
+            "orders": v["orders"], "revenue": v["revenue"],
+            "avg_minutes": v["minutes_sum"] / v["orders"], "sla30": v["sla30"] / v["orders"],
+        })
+        c = v.groupby("cuisine")[["orders", "revenue", "minutes_sum", "sla30"]].sum()
+        out["cui"] = pd.DataFrame({
+            "orders": c["orders"], "revenue": c["revenue"],
+            "avg_minutes": c["minutes_sum"] / c["orders"], "sla30": c["sla30"] / c["orders"],
+        }).sort_values("orders", ascending=False)
+
+        # Driver
+        dr = self.driver.result().reset_index()
+        out["drv"] = pd.DataFrame({
+            "driver_id": dr["driver_id"], "orders": dr["orders"],
+            "avg_rating": dr["rating_sum"] / dr["rating_n"].where(dr["rating_n"] > 0),
+            "avg_minutes": dr["minutes_sum"] / dr["orders"], "avg_distance": dr["distance_sum"] / dr["orders"],
+        }).merge(drivers, on="driver_id", how="left")
+
+        # Customer
+        out["cust_orders"] = self.customer.result().reset_index().merge(customers, on="customer_id", how="left")
+
+        # Distance fit (normal equations on the running sums)
+        out["fit"] = None
+        fit = self.fit()
+        if fit is not None:
+            slope, intercept, res_mean, std = fit
+            if worst is None and self.outlier_model is None:
+                pool = self.candidates if self.candidates is not None else pd.DataFrame(columns=OUTLIER_COLUMNS)
+                worst = _rank_slowest(pool, vendors, slope, intercept, res_mean, std)
+            pts = self.sample.result()
+            out["fit"] = {
+                "slope": slope, "intercept": intercept,
+                "x": as_float64(pts["distance_km"]), "y": pts["delivery_minutes"].to_numpy("float64"),
+                "worst": worst,
+            }
+
+        out["outlier_model"] = self.outlier_model
+        out["eta"] = self.eta_model.fit() if self.eta_model is not None else None
+
+        # Peak hour / top vendors per area
+        vh = self.vendor_hour.result().reset_index().merge(vendors[["vendor_id", "area"]], on="vendor_id", how="inner")
+        out["peak_area"] = top_k(vh.groupby(["area", "hour"])["orders"].sum().reset_index(),
+                                 ["orders", "hour"], k=1, by="area", ascending=[False, True])
+        out["top3"] = top_k(v.groupby(["area", "vendor_name"])["orders"].sum().reset_index(),
+                            ["orders", "vendor_name"], k=3, by="area", ascending=[False, True])
+        return out
+
+
+def top_slowest(rows: pd.DataFrame, n: int = OUTLIER_TOP_N) -> pd.DataFrame:
+    """The `n` rows with the largest residual_z in rank order; ties go to the lower order_id,
+    so every mode reports the same orders."""
+    return top_k(rows, ["residual_z", "order_id"], k=n, ascending=[False, True])
+
+
+def _rank_slowest(rows, vendors, slope, intercept, res_mean, std) -> pd.DataFrame:
+    res = rows["delivery_minutes"].to_numpy("float64") - (slope * as_float64(rows["distance_km"]) + intercept)
+    best = top_slowest(rows.assign(residual_z=(res - res_mean) / std))
+    return best.merge(vendors[["vendor_id", "vendor_name", "area"]], on="vendor_id", how="left")
+
+
+def scan_orders(engine, vendors: pd.DataFrame, drivers: pd.DataFrame, customers: pd.DataFrame,
+                chunksize: int = DEFAULT_CHUNKSIZE, sample_points: int = SCATTER_SAMPLE,
+                outlier_model=None, eta_model=None) -> dict:
+    """Stream `orders` once (plus a narrow second pass for the global-model
+    outliers) and return the tables analysis.py reports, before display
+    formatting. An `outlier_model` and an `eta_model` are folded in the
+    same pass."""
+    aggs = OrderAggregates(sample_points, outlier_pool=0, outlier_model=outlier_model, eta_model=eta_model)
+    sections = [s for s in AGGREGATE_SECTIONS if s != "outliers"]
+    for chunk in iter_orders(engine, columns_for(sections), chunksize):
+        aggs.update(chunk)
+    fit = aggs.fit()
+    worst = None
+    if fit is not None and outlier_model is None:
+        worst = _slowest(engine, vendors, *fit, chunksize)
+    return aggs.tables(vendors, drivers, customers, worst=worst)
+
+
+def _slowest(engine, vendors, slope, intercept, res_mean, std, chunksize) -> pd.DataFrame:
+    """Second, narrow pass: the OUTLIER_TOP_N largest residual z-scores."""
+    best = slowest_rows(engine, (slope, intercept, res_mean, std), chunksize)
+    return best.merge(vendors[["vendor_id", "vendor_name", "area"]], on="vendor_id", how="left")
+
+
+def slowest_rows(engine, fit, chunksize: int = DEFAULT_CHUNKSIZE, where: str = None, params: dict = None):
+    """The OUTLIER_TOP_N delivered orders with the largest residual z-score under `fit`,
+    optionally restricted by an extra `where` clause."""
+    slope, intercept, res_mean, std = fit
+    where = "status = 'delivered'" + (f" AND {where}" if where else "")
+    best = None
+    for chunk in iter_orders(engine, OUTLIER_COLUMNS, chunksize, where=where, params=params):
+        res = chunk["delivery_minutes"].to_numpy("float64") - (slope * as_float64(chunk["distance_km"]) + intercept)
+        part = top_slowest(chunk.assign(residual_z=(res - res_mean) / std))
+        best = part if best is None else top_slowest(pd.concat([best, part]))
+    if best is None:
+        best = pd.DataFrame(columns=[*OUTLIER_COLUMNS, "residual_z"])
+    return best
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_suite import build_dataset  # noqa: E402
+
+DATASET_ORDERS = 4000
+
+
+@pytest.fixture(scope="session")
+def dataset(tmp_path_factory) -> str:
+    """A small SQLite dataset built like the benchmark ones (see benchmarks/bench_suite.py)."""
+    path = str(tmp_path_factory.mktemp("data") / "orders.db")
+    build_dataset(path, DATASET_ORDERS, seed=7)
+    return path
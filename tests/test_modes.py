@@ -0,0 +1,71 @@
+"""Every analysis mode writes the same CSVs as the in-memory run."""
+
+import contextlib
+import io
+import os
+import shutil
+import sqlite3
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from analysis import Analysis
+
+MODE_ARGS = {
+    "stream": {"chunksize": 700},
+    "parallel": {"workers": 2, "chunksize": 700},
+    "sql": {},
+}
+
+
+def run_analysis(db_path: str, out_dir, mode: str = "memory", **kwargs) -> dict:
+    """Run every output of `mode` on `db_path`; returns {csv name: frame}."""
+    out_dir = str(out_dir)
+    engine = create_engine(f"sqlite:///{db_path}")
+    kwargs.setdefault("state_path", os.path.join(out_dir, "kpi_state.pkl"))
+    kwargs.setdefault("cohort_state_path", os.path.join(out_dir, "cohort_state.pkl"))
+    analysis = Analysis(engine, mode=mode, eta_model_path=os.path.join(out_dir, "eta_model.pkl"),
+                        out_dir=out_dir, fig_dir=out_dir, **kwargs)
+    with contextlib.redirect_stdout(io.StringIO()):
+        analysis.run(figures=False)
+    engine.dispose()
+    return {name: pd.read_csv(os.path.join(out_dir, name))
+            for name in sorted(os.listdir(out_dir)) if name.endswith(".csv")}
+
+
+def assert_same_csvs(got: dict, expected: dict):
+    assert sorted(got) == sorted(expected)
+    for name, frame in expected.items():
+        # sums fold in a different order per mode, so floats may differ in the last digits
+        pd.testing.assert_frame_equal(got[name], frame, check_dtype=False, rtol=1e-9, obj=name)
+
+
+@pytest.fixture(scope="module")
+def memory_csvs(dataset, tmp_path_factory) -> dict:
+    return run_analysis(dataset, tmp_path_factory.mktemp("memory"))
+
+
+@pytest.mark.parametrize("mode", sorted(MODE_ARGS))
+def test_mode_matches_memory(mode, dataset, memory_csvs, tmp_path):
+    assert_same_csvs(run_analysis(dataset, tmp_path, mode, **MODE_ARGS[mode]), memory_csvs)
+
+
+def test_incremental_split_run_matches_memory(dataset, memory_csvs, tmp_path):
+    # first run on the older half of the orders, second after the rest arrive
+    # (incremental.refresh picks new orders by their order_datetime watermark)
+    partial = str(tmp_path / "partial.db")
+    shutil.copy(dataset, partial)
+    with sqlite3.connect(partial) as conn:
+        half = conn.execute("SELECT order_datetime FROM orders ORDER BY order_datetime "
+                            "LIMIT 1 OFFSET (SELECT COUNT(*) / 2 FROM orders)").fetchone()[0]
+        conn.execute("DELETE FROM orders WHERE order_datetime > ?", (half,))
+    first = run_analysis(partial, tmp_path / "first", "incremental", state_path=str(tmp_path / "kpi_state.pkl"),
+                         cohort_state_path=str(tmp_path / "cohort_state.pkl"), chunksize=700)
+    assert len(first["daily_kpis.csv"]) < len(memory_csvs["daily_kpis.csv"])
+    with sqlite3.connect(partial) as conn:
+        conn.execute("ATTACH DATABASE ? AS full", (dataset,))
+        conn.execute("INSERT INTO orders SELECT * FROM full.orders WHERE order_datetime > ?", (half,))
+    got = run_analysis(partial, tmp_path / "second", "incremental", state_path=str(tmp_path / "kpi_state.pkl"),
+                       cohort_state_path=str(tmp_path / "cohort_state.pkl"), chunksize=700)
+    assert_same_csvs(got, memory_csvs)
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from monitor import COUNTERS, KpiMonitor, RollingWindow
+
+MINUTE = 60 * 10**9
+
+
+def add(window, minutes, minutes_taken=20):
+    n = len(minutes)
+    counters = np.zeros((n, len(COUNTERS)), dtype="int64")
+    counters[:, 0] = counters[:, 1] = 1
+    counters[:, 5] = minutes_taken
+    window.add(np.zeros((n, 1), dtype="int64"), np.asarray(minutes, dtype="int64") * MINUTE, counters,
+               np.full(n, minutes_taken, dtype="int64"))
+
+
+def test_old_buckets_are_evicted():
+    window = RollingWindow(60, 12)   # 5-minute buckets
+    add(window, [0, 1, 7])
+    assert window.totals[0, 0] == 3
+    add(window, [62])                 # the 0-4 minute bucket falls out, 5-9 stays
+    assert window.totals[0, 0] == 2
+    assert window.hist_totals[0].sum() == 2
+    window.advance_to(200 * MINUTE)
+    assert window.totals[0].sum() == 0 and window.hist_totals.sum() == 0
+    assert window.late == 0
+
+
+def test_late_orders_are_counted_and_dropped():
+    window = RollingWindow(60, 12)
+    add(window, [100])
+    add(window, [10, 99])             # 10 is an hour behind the head already
+    assert window.late == 1
+    assert window.totals[0, 0] == 2
+
+
+def test_rows_pushed_out_by_their_own_batch_count_as_late():
+    window = RollingWindow(60, 12)
+    add(window, [0])
+    add(window, [2, 130])             # 2 was live when the batch arrived, not once 130 was in
+    assert window.late == 1           # the minute-0 row was folded earlier: it expires, it is not late
+    assert window.totals[0, 0] == 1
+
+
+def test_monitor_breach_and_resolve():
+    mon = KpiMonitor(windows={"1h": (60, 12)}, rules={"cancel_rate": (">", 0.2)}, min_orders=10)
+    start = pd.Timestamp("2025-01-01 12:00")
+    batch = pd.DataFrame({
+        "order_id": range(1, 21), "vendor_id": 1, "dropoff_area": "Karada", "delivery_minutes": 25.0,
+        "order_datetime": [start + pd.Timedelta(minutes=i) for i in range(20)],
+        "status": ["canceled"] * 8 + ["delivered"] * 12,
+    })
+    mon.update(batch)
+    opened = mon.check()
+    assert {(a["dimension"], a["state"]) for a in opened} == {("all", "breach"), ("dropoff_area", "breach"),
+                                                             ("vendor_id", "breach")}
+    mon.advance(start + pd.Timedelta(hours=3))
+    assert {a["state"] for a in mon.check()} == {"resolved"}
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ranking import top_k
+
+
+def reference(frame, columns, k, by, ascending):
+    ranked = frame.sort_values([*by, *columns], ascending=[True] * len(by) + ascending, kind="stable")
+    return ranked.groupby(by).head(k)
+
+
+@pytest.mark.parametrize("k", [1, 2, 3, 5])
+def test_ties_resolve_like_a_stable_sort(k):
+    rng = np.random.default_rng(3)
+    frame = pd.DataFrame({
+        "area": rng.choice(["a", "b", "c", "d"], 400),
+        "orders": rng.integers(0, 6, 400),   # heavy ties on the ranking column
+        "hour": rng.integers(0, 3, 400),
+    })
+    for columns, ascending in [(["orders"], [False]), (["orders", "hour"], [False, True])]:
+        got = top_k(frame, columns, k=k, by="area", ascending=ascending)
+        pd.testing.assert_frame_equal(got, reference(frame, columns, k, ["area"], ascending))
+
+
+def test_ties_at_the_cut_keep_input_order():
+    frame = pd.DataFrame({"vendor": ["v1", "v2", "v3", "v4", "v5"], "orders": [7, 9, 7, 7, 3]})
+    got = top_k(frame, "orders", k=3)
+    assert got["vendor"].tolist() == ["v2", "v1", "v3"]
+    assert got.index.tolist() == [1, 0, 2]
+
+
+def test_tie_break_column_and_missing_keys():
+    frame = pd.DataFrame({"area": ["x", "x", None, "y", "y", "y"],
+                          "orders": [4, 4, 9, 2, 2, 1],
+                          "name": ["b", "a", "z", "d", "c", "e"]})
+    got = top_k(frame, ["orders", "name"], k=1, by="area", ascending=[False, True])
+    assert got["name"].tolist() == ["a", "c"]   # the missing area is dropped, as groupby does
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sketches import QuantileSketch
+
+QS = [0.01, 0.25, 0.5, 0.9, 0.95, 0.99]
+
+
+def merged(parts, **kwargs) -> QuantileSketch:
+    total = QuantileSketch(**kwargs)
+    for values, groups in parts:
+        sketch = QuantileSketch(**kwargs)
+        sketch.update(values, groups=groups)
+        total.merge(sketch)
+    return total
+
+
+def test_exact_mode_merge_matches_pandas():
+    rng = np.random.default_rng(5)
+    minutes = rng.integers(5, 90, 6000)
+    groups = rng.choice(["a", "b", "c"], 6000)
+    sketch = merged([(minutes[i:i + 1000], groups[i:i + 1000]) for i in range(0, 6000, 1000)])
+    assert sketch.exact
+    expected = pd.Series(minutes).groupby(groups).quantile(QS).unstack()
+    pd.testing.assert_frame_equal(sketch.quantile(QS), expected, check_names=False, check_column_type=False)
+
+
+@pytest.mark.parametrize("collapse_first", [True, False])
+def test_collapsed_merge_stays_within_relative_accuracy(collapse_first):
+    rng = np.random.default_rng(9)
+    values = rng.lognormal(3.0, 0.6, 20000)
+    # one part collapses into log buckets (more distinct values than max_exact), the other stays exact
+    big, small = (values[:15000], None), (values[15000:15100], None)
+    parts = [big, small] if collapse_first else [small, big]
+    sketch = merged(parts, relative_accuracy=0.01, max_exact=1000)
+    assert not sketch.exact
+    got = np.array([sketch.value(q) for q in QS])
+    want = np.quantile(np.concatenate([values[:15000], values[15000:15100]]), QS)
+    assert np.all(np.abs(got - want) <= 0.01 * want * 1.01)
+
+
+def test_counts_add_on_merge():
+    a, b = QuantileSketch(), QuantileSketch()
+    a.update([1, 2, 3], groups=["x", "x", "y"])
+    b.update([4, np.nan], groups=["y", "y"])
+    a.merge(b)
+    assert a.count().to_dict() == {"x": 2, "y": 2}